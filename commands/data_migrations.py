@@ -0,0 +1,30 @@
+"""Data migrations of the catalog, run with commands.run_data_migration."""
+from db.data_migration import Batch, DataMigration, register_data_migration
+from dependecies.session import AsyncSessionDep
+from models import Performer, Album
+from services.albums.query_builder.reconcile import AlbumDurationReconcileQueryBuilder
+from services.performers.query_builder.performer import PerformerQueryBuilder
+
+
+@register_data_migration
+class PerformerCountersMigration(DataMigration):
+    """Rebuilds the catalog counters of the performers, the batched counterpart of
+    commands.reconcile_performer_counters."""
+    name = 'performer_counters'
+    key = Performer.__table__.c.id
+
+    async def apply_batch(self, session: AsyncSessionDep, batch: Batch) -> int:
+        await PerformerQueryBuilder.update_catalog_counters(session, batch.keys)
+        return len(batch.keys)
+
+
+@register_data_migration
+class AlbumTotalDurationsMigration(DataMigration):
+    """Recomputes the total_duration of the drifted albums, the resumable counterpart of
+    commands.reconcile_album_durations."""
+    name = 'album_total_durations'
+    key = Album.__table__.c.id
+
+    async def apply_batch(self, session: AsyncSessionDep, batch: Batch) -> int:
+        drift = await AlbumDurationReconcileQueryBuilder.reconcile_range(session, batch.after, batch.last)
+        return len(drift)
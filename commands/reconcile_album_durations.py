@@ -0,0 +1,40 @@
+"""Finds the albums whose total_duration differs from the sum of the durations of their songs and fixes them,
+one transaction per chunk of album ids. With --dry-run the drift is only reported.
+
+Usage::
+
+    python -m commands.reconcile_album_durations [--dry-run] [--chunk-size 10000]
+"""
+import argparse
+import asyncio
+
+from common.settings import Settings
+from db.database import Database
+from services.albums.query_builder.reconcile import AlbumDurationReconcileQueryBuilder
+from services.albums.schemas.reconcile import AlbumDurationReconcileResponseSchema
+
+
+async def reconcile_album_durations(database: Database, chunk_size: int,
+                                    dry_run: bool) -> AlbumDurationReconcileResponseSchema:
+    async with database.session_maker() as session:
+        return await AlbumDurationReconcileQueryBuilder.reconcile(session, chunk_size, dry_run)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Reconciles the total_duration of the albums with their songs.")
+    parser.add_argument('--dry-run', action='store_true', help="only reports the drifted albums")
+    parser.add_argument('--chunk-size', type=int, default=10000, help="album ids per transaction")
+    args = parser.parse_args()
+
+    database = Database(settings=Settings())
+    try:
+        report = await reconcile_album_durations(database, args.chunk_size, args.dry_run)
+    finally:
+        await database.dispose()
+    for album in report.items:
+        print(f"Album {album.album_id}: {album.total_duration} instead of {album.expected_duration}")
+    print(f"{report.drifted} drifted albums {'found' if args.dry_run else 'fixed'}.")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
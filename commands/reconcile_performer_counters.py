@@ -0,0 +1,29 @@
+"""Rebuilds the catalog counters of all performers from their albums and songs.
+
+Usage::
+
+    python -m commands.reconcile_performer_counters
+"""
+import asyncio
+
+from common.settings import Settings
+from db.database import Database
+from services.performers.query_builder.performer import PerformerQueryBuilder
+
+
+async def reconcile_performer_counters(database: Database) -> None:
+    async with database.session_maker() as session:
+        await PerformerQueryBuilder.update_catalog_counters(session)
+        await session.commit()
+
+
+async def main() -> None:
+    database = Database(settings=Settings())
+    try:
+        await reconcile_performer_counters(database)
+    finally:
+        await database.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,38 @@
+"""Runs a batched data migration, resuming from its checkpoint.
+
+Usage::
+
+    python -m commands.run_data_migration performer_counters [--batch-size 1000] [--pause 0.1] [--restart]
+"""
+import argparse
+import asyncio
+import logging
+
+from common.settings import Settings
+from db.database import Database
+from db.data_migration import DATA_MIGRATIONS, run_data_migration
+import commands.data_migrations  # noqa: F401 - registers the migrations
+
+
+def parse_args() -> argparse.Namespace:
+    settings = Settings().data_migration
+    parser = argparse.ArgumentParser(description="Runs a batched data migration, resuming from its checkpoint.")
+    parser.add_argument('name', choices=sorted(DATA_MIGRATIONS))
+    parser.add_argument('--batch-size', type=int, default=settings.batch_size, help="rows per transaction")
+    parser.add_argument('--pause', type=float, default=settings.pause, help="seconds between two batches")
+    parser.add_argument('--restart', action='store_true', help="starts again from the first row")
+    return parser.parse_args()
+
+
+async def main() -> None:
+    args = parse_args()
+    database = Database(settings=Settings())
+    try:
+        await run_data_migration(database, DATA_MIGRATIONS[args.name](), args.batch_size, args.pause, args.restart)
+    finally:
+        await database.dispose()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    asyncio.run(main())
@@ -0,0 +1,188 @@
+"""Admission control in front of the database pool.
+
+Every request is put in a route class (cheap reads, reads of nested graphs, writes, authentication), each
+class admits a limited number of concurrent requests and lets a bounded number of others wait for a slot
+up to a deadline. Requests that find the queue full, or do not get a slot in time, are answered right away
+with 503 and a Retry-After header, instead of queueing inside get_async_session until the clients time out.
+"""
+import asyncio
+import re
+from collections import deque
+from enum import Enum
+from typing import Deque, Dict, Optional
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from common.errors import AdmissionLimitTooHigh
+from common.settings import AdmissionSettings, AdmissionLimitSettings
+
+
+class RouteClassEnum(str, Enum):
+    read = 'read'
+    nested_read = 'nested_read'
+    write = 'write'
+    auth = 'auth'
+
+
+# Reads loading the albums and songs of performers or albums with selectinload
+NESTED_READ_PATHS = re.compile(r'^/(performers|performer_by_id/[^/]+|albums|album_by_id/[^/]+)/?$')
+AUTH_PATHS = re.compile(r'^/users/(jwt/|register|forgot-password|reset-password|request-verify-token|verify)')
+# Served outside of the admission control, so that the service can be observed and tuned while overloaded
+EXEMPT_PATHS = re.compile(r'^/(metrics|admin/admission|events|docs|redoc|openapi\.json)')
+
+
+def classify(method: str, path: str) -> Optional[RouteClassEnum]:
+    """Returns the route class of the request, None for the requests that are always admitted."""
+    if EXEMPT_PATHS.match(path):
+        return None
+    if AUTH_PATHS.match(path):
+        return RouteClassEnum.auth
+    if method not in ('GET', 'HEAD'):
+        return RouteClassEnum.write
+    if NESTED_READ_PATHS.match(path):
+        return RouteClassEnum.nested_read
+    return RouteClassEnum.read
+
+
+class AdmissionLimiter:
+    """Concurrency limit with a bounded FIFO queue of waiting requests."""
+
+    def __init__(self, settings: AdmissionLimitSettings):
+        self.limit = settings.limit
+        self.queue_size = settings.queue_size
+        self.queue_timeout = settings.queue_timeout
+        self.active = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def configure(self, limit: Optional[int] = None, queue_size: Optional[int] = None,
+                  queue_timeout: Optional[float] = None) -> None:
+        """Changes the limits at runtime, raising the limit admits the waiting requests immediately."""
+        if limit is not None:
+            self.limit = limit
+        if queue_size is not None:
+            self.queue_size = queue_size
+        if queue_timeout is not None:
+            self.queue_timeout = queue_timeout
+        self._wake_waiters()
+
+    async def acquire(self) -> bool:
+        """Waits for a slot, returns False when the request has to be rejected."""
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return True
+        if len(self._waiters) >= self.queue_size:
+            self.rejected += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            # The slot may have been handed over right before the timeout fired, it goes to the next request
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            self.timed_out += 1
+            return False
+        except asyncio.CancelledError:
+            # The slot may have been handed over right before the request was cancelled
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        self.admitted += 1
+        return True
+
+    def release(self) -> None:
+        self.active -= 1
+        self._wake_waiters()
+
+    def _wake_waiters(self) -> None:
+        while self.active < self.limit and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.active += 1
+                waiter.set_result(None)
+
+
+class AdmissionController:
+    def __init__(self, settings: Optional[AdmissionSettings] = None):
+        self.limiters: Dict[RouteClassEnum, AdmissionLimiter] = {}
+        self.pool_capacity: Optional[int] = None
+        self.configure(settings or AdmissionSettings())
+
+    def configure(self, settings: AdmissionSettings, pool_capacity: Optional[int] = None) -> None:
+        """Applies the settings, pool_capacity is the number of database connections the limits have to fit in."""
+        self.retry_after = settings.retry_after
+        self.reserved_connections = settings.reserved_connections
+        self.pool_capacity = pool_capacity
+        for route_class in RouteClassEnum:
+            limit_settings = getattr(settings, route_class.value)
+            if route_class in self.limiters:
+                self.limiters[route_class].configure(**limit_settings.model_dump())
+            else:
+                self.limiters[route_class] = AdmissionLimiter(limit_settings)
+
+    def check_limit(self, route_class: RouteClassEnum, limit: int) -> None:
+        """Raises AdmissionLimitTooHigh when the new limit of the route class would not fit in the database pool."""
+        if self.pool_capacity is None:
+            return
+        connections = self.reserved_connections + limit + sum(limiter.limit for other, limiter in self.limiters.items()
+                                                              if other != route_class)
+        if connections > self.pool_capacity:
+            raise AdmissionLimitTooHigh(connections, self.pool_capacity)
+
+    def render_metrics(self) -> str:
+        """Returns the state of the limiters in the Prometheus text exposition format."""
+        metrics = (
+            ('admission_limit', 'gauge', 'Concurrent requests admitted per route class', 'limit'),
+            ('admission_queue_size', 'gauge', 'Requests allowed to wait per route class', 'queue_size'),
+            ('admission_active', 'gauge', 'Requests being handled per route class', 'active'),
+            ('admission_queued', 'gauge', 'Requests waiting for a slot per route class', 'queued'),
+            ('admission_admitted_total', 'counter', 'Admitted requests per route class', 'admitted'),
+            ('admission_rejected_total', 'counter', 'Requests rejected because the queue was full', 'rejected'),
+            ('admission_timed_out_total', 'counter', 'Requests rejected after waiting too long', 'timed_out'),
+        )
+        lines = []
+        for name, metric_type, description, attribute in metrics:
+            lines += [f'# HELP {name} {description}', f'# TYPE {name} {metric_type}']
+            lines += [f'{name}{{route_class="{route_class.value}"}} {getattr(limiter, attribute)}'
+                      for route_class, limiter in self.limiters.items()]
+        return '\n'.join(lines) + '\n'
+
+
+admission_controller = AdmissionController()
+
+
+class AdmissionControlMiddleware:
+    def __init__(self, app: ASGIApp, controller: AdmissionController = admission_controller):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        route_class = classify(scope['method'], scope['path']) if scope['type'] == 'http' else None
+        if route_class is None:
+            await self.app(scope, receive, send)
+            return
+
+        limiter = self.controller.limiters[route_class]
+        if not await limiter.acquire():
+            response = JSONResponse({'detail': 'The service is overloaded, retry later'}, status_code=503,
+                                    headers={'Retry-After': str(self.controller.retry_after)})
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
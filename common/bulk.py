@@ -0,0 +1,5 @@
+from sqlmodel import SQLModel
+
+
+class BulkDeleteResponseSchema(SQLModel):
+    deleted: int
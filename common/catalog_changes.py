@@ -0,0 +1,107 @@
+"""Collects the catalog changes made through a session, appends them to the change log when the transaction
+commits and hands them to the registered listeners once it has committed, so that in-process state derived from
+the catalog can follow the database.
+
+The query builders record every row they write (including the ones written with bulk statements, which the
+ORM events do not see). Deleting a performer or an album also deletes its albums and songs through the
+ON DELETE CASCADE of their foreign keys, the listeners are expected to apply the cascade themselves.
+"""
+import logging
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Callable, Dict, Iterable, List, Type
+
+from sqlalchemy import event, insert, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlmodel import SQLModel
+
+from models import ChangeLog
+
+logger = logging.getLogger(__name__)
+
+CHANGES_KEY = 'catalog_changes'
+# Key of the transaction-level advisory lock taken on PostgreSQL before writing to the change log
+CHANGE_LOG_LOCK = 0x63686c67
+CHANGE_LOG_BATCH_SIZE = 200
+
+
+class ChangeActionEnum(str, Enum):
+    upsert = 'upsert'
+    delete = 'delete'
+
+
+@dataclass(frozen=True)
+class CatalogChange:
+    entity: str  # Table name of the changed row: performers, albums or songs
+    action: ChangeActionEnum
+    id: int
+    values: Dict[str, Any] = field(default_factory=dict)  # The written columns, a subset of them for updates
+
+
+CommitListener = Callable[[List[CatalogChange]], None]
+_commit_listeners: List[CommitListener] = []
+
+
+def add_commit_listener(listener: CommitListener) -> CommitListener:
+    _commit_listeners.append(listener)
+    return listener
+
+
+def record_upserts(session: AsyncSession | Session, model: Type[SQLModel], rows: Iterable[Dict[str, Any]]) -> None:
+    """Records created or updated rows, every row has to contain the id."""
+    changes = session.info.setdefault(CHANGES_KEY, [])
+    changes.extend(CatalogChange(entity=model.__tablename__, action=ChangeActionEnum.upsert, id=row['id'],
+                                 values={key: value for key, value in row.items() if key != 'id'})
+                   for row in rows)
+
+
+def record_deletes(session: AsyncSession | Session, model: Type[SQLModel], ids: Iterable[int]) -> None:
+    changes = session.info.setdefault(CHANGES_KEY, [])
+    changes.extend(CatalogChange(entity=model.__tablename__, action=ChangeActionEnum.delete, id=row_id)
+                   for row_id in ids)
+
+
+def row_values(instance: SQLModel) -> Dict[str, Any]:
+    """Returns the column values of a loaded model instance, for record_upserts. The performer counters are left
+    out, they are written with bulk statements and can be stale on the instance."""
+    return instance.model_dump(exclude={'album_count', 'song_count', 'single_count', 'total_seconds'})
+
+
+@event.listens_for(Session, 'before_commit')
+def write_change_log(session: Session) -> None:
+    """Appends the recorded changes to the change log in the committing transaction, one row per changed row
+    with its last action. On PostgreSQL the writers are serialized until their commit with an advisory lock, so
+    that the revisions become visible in increasing order and a consumer paging with since never skips a
+    revision committed late."""
+    changes = session.info.get(CHANGES_KEY)
+    if not changes:
+        return
+    actions = {}
+    for change in changes:
+        actions.pop((change.entity, change.id), None)
+        actions[(change.entity, change.id)] = change.action
+    if session.get_bind().dialect.name == 'postgresql':
+        session.execute(text('SELECT pg_advisory_xact_lock(:key)'), {'key': CHANGE_LOG_LOCK})
+    rows = [{'entity': entity, 'entity_id': entity_id, 'action': action.value}
+            for (entity, entity_id), action in actions.items()]
+    # In batches, which bounds the memory taken by the statement parameters of large bulk writes
+    for start in range(0, len(rows), CHANGE_LOG_BATCH_SIZE):
+        session.execute(insert(ChangeLog), rows[start:start + CHANGE_LOG_BATCH_SIZE])
+
+
+@event.listens_for(Session, 'after_commit')
+def dispatch_changes(session: Session) -> None:
+    changes = session.info.pop(CHANGES_KEY, None)
+    if not changes:
+        return
+    for listener in _commit_listeners:
+        try:
+            listener(changes)
+        except Exception:
+            logger.exception(f"Catalog change listener {listener!r} failed.")
+
+
+@event.listens_for(Session, 'after_rollback')
+def discard_changes(session: Session) -> None:
+    session.info.pop(CHANGES_KEY, None)
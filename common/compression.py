@@ -0,0 +1,205 @@
+"""Negotiated compression of the response bodies.
+
+Bodies of a compressible content type and of at least the minimum size are compressed with the best encoding
+accepted by the client (zstd when the optional ``zstandard`` package is installed, gzip otherwise). The
+compressed bodies are kept in a cache addressed by the digest of the uncompressed body and the encoding, so
+that a hot response (e.g. the first page of ``/performers``) is compressed once and then only hashed on every
+hit. Streamed responses (more than one body message) are passed through as they are, the endpoints producing
+large streams compress them with compress_stream.
+"""
+import gzip
+import hashlib
+import zlib
+from collections import OrderedDict
+from enum import Enum
+from typing import AsyncIterator, Dict, Hashable, List, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from common.settings import CompressionSettings
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+
+class EncodingEnum(str, Enum):
+    zstd = 'zstd'
+    gzip = 'gzip'
+
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'text/')
+
+
+def available_encodings() -> List[EncodingEnum]:
+    """Returns the supported encodings, the preferred one first."""
+    return [EncodingEnum.zstd, EncodingEnum.gzip] if zstandard is not None else [EncodingEnum.gzip]
+
+
+def negotiate(accept_encoding: str, encodings: List[EncodingEnum]) -> Optional[EncodingEnum]:
+    """Returns the encoding with the highest quality in the Accept-Encoding header, the order of the
+    supported encodings breaks the ties. None when the client accepts none of them."""
+    qualities: Dict[str, float] = {}
+    for part in accept_encoding.split(','):
+        coding, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                continue
+        if coding:
+            qualities[coding.strip().lower()] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in encodings:
+        quality = qualities.get(encoding.value, qualities.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(body: bytes, encoding: EncodingEnum, settings: CompressionSettings) -> bytes:
+    if encoding == EncodingEnum.zstd:
+        return zstandard.ZstdCompressor(level=settings.zstd_level).compress(body)
+    return gzip.compress(body, compresslevel=settings.gzip_level, mtime=0)
+
+
+async def compress_stream(chunks: AsyncIterator[bytes], encoding: EncodingEnum,
+                          settings: CompressionSettings) -> AsyncIterator[bytes]:
+    """Compresses a streamed body chunk by chunk, for the responses the middleware passes through."""
+    if encoding == EncodingEnum.zstd:
+        compressor = zstandard.ZstdCompressor(level=settings.zstd_level).compressobj()
+    else:
+        compressor = zlib.compressobj(settings.gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+class CompressedCache:
+    """LRU cache of compressed bodies, bounded by the total size of the stored (compressed) bytes."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, bytes] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        body = self._entries.get(key)
+        if body is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return body
+
+    def put(self, key: Hashable, body: bytes) -> None:
+        if len(body) > self.max_bytes:
+            return
+        self.discard(key)
+        self._entries[key] = body
+        self.size += len(body)
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def discard(self, key: Hashable) -> None:
+        body = self._entries.pop(key, None)
+        if body is not None:
+            self.size -= len(body)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size = 0
+
+
+class ResponseCompressor:
+    def __init__(self, settings: Optional[CompressionSettings] = None):
+        self.configure(settings or CompressionSettings())
+
+    def configure(self, settings: CompressionSettings) -> None:
+        self.settings = settings
+        self.encodings = available_encodings()
+        self.cache = CompressedCache(settings.cache_max_bytes)
+
+    def choose_encoding(self, headers: Headers) -> Optional[EncodingEnum]:
+        if not self.settings.enabled:
+            return None
+        return negotiate(headers.get('accept-encoding', ''), self.encodings)
+
+    def encode(self, body: bytes, encoding: EncodingEnum, key: Optional[Hashable] = None) -> bytes:
+        """Returns the compressed body from the cache, compressing and storing it on a miss. The key defaults
+        to the digest of the body."""
+        if key is None:
+            key = hashlib.blake2b(body, digest_size=16).digest()
+        cache_key = (key, encoding)
+        compressed = self.cache.get(cache_key)
+        if compressed is None:
+            compressed = compress(body, encoding, self.settings)
+            self.cache.put(cache_key, compressed)
+        return compressed
+
+
+response_compressor = ResponseCompressor()
+
+
+def is_compressible(headers: MutableHeaders) -> bool:
+    content_type = headers.get('content-type', '')
+    return 'content-encoding' not in headers and content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, compressor: ResponseCompressor = response_compressor):
+        self.app = app
+        self.compressor = compressor
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        encoding = self.compressor.choose_encoding(Headers(scope=scope)) if scope['type'] == 'http' else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+        passthrough = False
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message['type'] == 'http.response.start':
+                # Held back until the body is known, the headers depend on it
+                start = message
+                return
+
+            headers = MutableHeaders(scope=start)
+            body = message.get('body', b'')
+            if not is_compressible(headers):
+                passthrough = True
+            elif message.get('more_body', False):
+                # Streamed responses are sent as they are produced
+                headers.add_vary_header('Accept-Encoding')
+                passthrough = True
+            else:
+                headers.add_vary_header('Accept-Encoding')
+                if len(body) >= self.compressor.settings.minimum_size:
+                    body = self.compressor.encode(body, encoding)
+                    headers['Content-Encoding'] = encoding.value
+                    headers['Content-Length'] = str(len(body))
+                    message = {**message, 'body': body}
+            await send(start)
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
+
@@ -0,0 +1,164 @@
+"""Per-request deadlines.
+
+Every request classified by the admission control gets a deadline, from the X-Request-Timeout header (in
+seconds, capped at the configured maximum; any value but a positive number is answered with 400) or from the
+default of its route class. The routes exempt from the admission control, /admin/admission and /events among
+them, have none. The deadline covers the wait for an admission slot and the handling up to the start of the
+response; when it expires the handler is cancelled and the client gets 504. A request whose client disconnects
+is cancelled at any point, streamed responses included. Cancelling the handler cancels the statement it is
+awaiting and returns its connection to the pool.
+
+On PostgreSQL the transactions of the request also begin with SET LOCAL statement_timeout set to the time left,
+so that the server stops the statement by itself even when the cancellation cannot reach it.
+"""
+import asyncio
+import math
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from common.admission import classify
+from common.errors import InvalidRequestTimeout, is_statement_timeout
+from common.settings import DeadlineSettings
+
+TIMEOUT_HEADER = 'x-request-timeout'
+
+# Monotonic time at which the current request expires, None outside of the requests
+request_deadline: ContextVar[Optional[float]] = ContextVar('request_deadline', default=None)
+
+
+def remaining_time() -> Optional[float]:
+    """Returns the seconds left before the deadline of the current request, None when it has none."""
+    deadline = request_deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+@event.listens_for(Session, 'after_begin')
+def set_statement_timeout(session: Session, transaction, connection) -> None:
+    remaining = remaining_time()
+    if remaining is not None and connection.dialect.name == 'postgresql':
+        # 0 would disable the timeout
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {max(int(remaining * 1000), 1)}")
+
+
+class DeadlinePolicy:
+    def __init__(self, settings: Optional[DeadlineSettings] = None):
+        self.configure(settings or DeadlineSettings())
+
+    def configure(self, settings: DeadlineSettings) -> None:
+        self.settings = settings
+
+    def get_timeout(self, scope: Scope) -> Optional[float]:
+        """Returns the timeout of the request in seconds, None for the requests without a deadline. Raises
+        InvalidRequestTimeout when X-Request-Timeout is not a positive finite number of seconds."""
+        route_class = classify(scope['method'], scope['path']) if scope['type'] == 'http' else None
+        if route_class is None or not self.settings.enabled:
+            return None
+        value = Headers(scope=scope).get(TIMEOUT_HEADER)
+        if value is None:
+            return getattr(self.settings, route_class.value)
+        try:
+            timeout = float(value)
+        except ValueError:
+            raise InvalidRequestTimeout(value)
+        if not math.isfinite(timeout) or timeout <= 0:
+            raise InvalidRequestTimeout(value)
+        return min(timeout, self.settings.maximum)
+
+
+deadline_policy = DeadlinePolicy()
+
+
+async def receive_closed() -> Message:
+    return {'type': 'http.disconnect'}
+
+
+async def send_expired(scope: Scope, send: Send) -> None:
+    response = JSONResponse({'detail': 'The request deadline expired'}, status_code=504)
+    await response(scope, receive_closed, send)
+
+
+async def cancel_handler(handler: asyncio.Task) -> None:
+    handler.cancel()
+    await asyncio.wait((handler,))
+    if not handler.cancelled():
+        # Failed while being cancelled, the request is abandoned anyway
+        handler.exception()
+
+
+class DeadlineMiddleware:
+    def __init__(self, app: ASGIApp, policy: DeadlinePolicy = deadline_policy):
+        self.app = app
+        self.policy = policy
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            timeout = self.policy.get_timeout(scope)
+        except InvalidRequestTimeout as e:
+            await JSONResponse({'detail': str(e)}, status_code=400)(scope, receive, send)
+            return
+        if timeout is None:
+            await self.app(scope, receive, send)
+            return
+
+        deadline = time.monotonic() + timeout
+        response_started = response_complete = False
+        messages: asyncio.Queue[Message] = asyncio.Queue()
+        disconnected = asyncio.Event()
+
+        async def watch_client() -> None:
+            # The only reader of receive, so that the disconnect is seen while the handler does not read
+            while True:
+                message = await receive()
+                messages.put_nowait(message)
+                if message['type'] == 'http.disconnect':
+                    disconnected.set()
+                    return
+
+        async def send_watched(message: Message) -> None:
+            nonlocal response_started, response_complete
+            if message['type'] == 'http.response.start':
+                response_started = True
+            elif message['type'] == 'http.response.body' and not message.get('more_body', False):
+                response_complete = True
+            await send(message)
+
+        token = request_deadline.set(deadline)
+        try:
+            # The handler task copies the context, with the deadline
+            handler = asyncio.create_task(self.app(scope, messages.get, send_watched))
+        finally:
+            request_deadline.reset(token)
+        watcher = asyncio.create_task(watch_client())
+        disconnect = asyncio.create_task(disconnected.wait())
+        try:
+            while not handler.done():
+                # Streamed responses are only ended by the client, a sent response is left to finish
+                wait_timeout = None if response_started else max(deadline - time.monotonic(), 0)
+                done, _ = await asyncio.wait((handler,) if response_complete else (handler, disconnect),
+                                             timeout=wait_timeout, return_when=asyncio.FIRST_COMPLETED)
+                if handler in done or response_complete:
+                    continue
+                if disconnect in done:
+                    await cancel_handler(handler)
+                    return
+                if not response_started:
+                    await cancel_handler(handler)
+                    await send_expired(scope, send)
+                    return
+            try:
+                handler.result()
+            except DBAPIError as e:
+                if response_started or not is_statement_timeout(e):
+                    raise
+                await send_expired(scope, send)
+        finally:
+            for task in (handler, watcher, disconnect):
+                task.cancel()
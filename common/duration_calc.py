@@ -1,3 +1,9 @@
+from sqlalchemy import Integer, String, case, cast
+from sqlalchemy.sql.elements import ColumnElement
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+
+
 def parse_song_length(song_length: str) -> int:
     try:
         minutes, seconds = map(int, song_length.split(":"))
@@ -17,3 +23,30 @@ def convert_song_length(seconds: int) -> str:
 def calculate_album_duration(songs_durations: list[str]) -> str:
     total_seconds = sum(parse_song_length(song) for song in songs_durations)
     return convert_song_length(total_seconds)
+
+
+class song_length_seconds(FunctionElement):
+    """SQL counterpart of parse_song_length, converts a 'minutes:seconds' column into seconds."""
+    type = Integer()
+    name = "song_length_seconds"
+    inherit_cache = True
+
+
+@compiles(song_length_seconds)
+def _compile_song_length_seconds(element, compiler, **kw) -> str:
+    value = compiler.process(list(element.clauses)[0], **kw)
+    return (f"(CAST(substr({value}, 1, instr({value}, ':') - 1) AS INTEGER) * 60"
+            f" + CAST(substr({value}, instr({value}, ':') + 1) AS INTEGER))")
+
+
+@compiles(song_length_seconds, "postgresql")
+def _compile_song_length_seconds_postgresql(element, compiler, **kw) -> str:
+    value = compiler.process(list(element.clauses)[0], **kw)
+    return f"(split_part({value}, ':', 1)::integer * 60 + split_part({value}, ':', 2)::integer)"
+
+
+def song_length_text(seconds: ColumnElement) -> ColumnElement:
+    """SQL counterpart of convert_song_length, formats an amount of seconds as 'minutes:seconds'."""
+    remaining_seconds = seconds % 60
+    return (cast(seconds // 60, String) + ":" + case((remaining_seconds < 10, "0"), else_="")
+            + cast(remaining_seconds, String))
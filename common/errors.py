@@ -1,2 +1,58 @@
+from typing import List
+
+from sqlalchemy.exc import DBAPIError, IntegrityError
+
+
 class EmptyQueryResult(Exception):
-    """Class represents an exception when the query result is empty"""
\ No newline at end of file
+    """Class represents an exception when the query result is empty"""
+
+
+class BulkFilterRequired(Exception):
+    def __str__(self):
+        return "At least one filter must be provided for a bulk operation"
+
+
+class InvalidFacet(Exception):
+    def __init__(self, facets: List[str], allowed: List[str]):
+        self.facets = facets
+        self.allowed = allowed
+
+    def __str__(self):
+        return f"Invalid facets {', '.join(self.facets)}. Expected any of: {', '.join(self.allowed)}."
+
+
+class AdmissionLimitTooHigh(Exception):
+    def __init__(self, connections: int, pool_capacity: int):
+        self.connections = connections
+        self.pool_capacity = pool_capacity
+
+    def __str__(self):
+        return (f"The admission limits would need {self.connections} database connections, "
+                f"the pool has {self.pool_capacity}")
+
+
+class InvalidRequestTimeout(Exception):
+    def __init__(self, value: str):
+        self.value = value
+
+    def __str__(self):
+        return f"Invalid X-Request-Timeout {self.value!r}, expected a positive number of seconds"
+
+
+def is_unique_violation(error: IntegrityError, *names: str) -> bool:
+    """Checks whether the integrity error was raised by a unique constraint or index mentioning one of the names.
+    Both PostgreSQL and SQLite include the constraint (or column) name in the error message."""
+    message = str(error.orig)
+    return "unique" in message.lower() and any(name in message for name in names)
+
+
+def is_foreign_key_violation(error: IntegrityError) -> bool:
+    """Checks whether the integrity error was raised by a foreign key constraint. SQLite does not name the
+    constraint, so the caller looks up which of the referenced rows is missing."""
+    return "foreign key" in str(error.orig).lower()
+
+
+def is_statement_timeout(error: DBAPIError) -> bool:
+    """Checks whether the statement was cancelled by the statement_timeout of PostgreSQL (SQLSTATE 57014)."""
+    return (getattr(error.orig, 'sqlstate', None) == '57014' or getattr(error.orig, 'pgcode', None) == '57014'
+            or 'canceling statement due to statement timeout' in str(error.orig))
@@ -0,0 +1,76 @@
+from enum import Enum
+from typing import Dict, List, Optional, Type, Union
+
+from sqlalchemy import Integer, Table, func, literal_column, select, tablesample, type_coerce, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.elements import ColumnElement
+from sqlalchemy.sql.util import ClauseAdapter
+from sqlalchemy.types import TypeDecorator
+from sqlmodel import SQLModel
+
+from common.errors import InvalidFacet
+
+# Share of the table pages read by the approximate mode (PostgreSQL TABLESAMPLE SYSTEM)
+FACET_SAMPLE_PERCENT = 1
+
+
+class FacetModeEnum(str, Enum):
+    exact = 'exact'
+    approximate = 'approximate'
+
+
+class FacetParams(SQLModel):
+    facets: Optional[str] = None  # Comma separated fields to count the matching rows by, e.g. genre,album_id
+    facets_mode: FacetModeEnum = FacetModeEnum.exact
+
+    def fields(self, facet_enum: Type[Enum]) -> List[Enum]:
+        names = [name.strip() for name in (self.facets or '').split(',') if name.strip()]
+        try:
+            return list(dict.fromkeys(facet_enum(name) for name in names))
+        except ValueError:
+            raise InvalidFacet(facets=names, allowed=[field.value for field in facet_enum])
+
+
+class FacetCountSchema(SQLModel):
+    value: Optional[Union[int, str]] = None
+    count: int
+
+
+class FacetsSchema(SQLModel):
+    approximate: bool = False
+    counts: Dict[str, List[FacetCountSchema]]
+
+
+async def count_facets(session: AsyncSession, table: Table, where: Optional[ColumnElement],
+                       columns: Dict[str, ColumnElement], mode: FacetModeEnum) -> FacetsSchema:
+    """Counts the rows of the table matching the where clause grouped by each of the columns, with a single
+    UNION ALL statement. The approximate mode counts a sample of the table pages and scales the counts up
+    on PostgreSQL; other databases always count exactly. The columns have to be columns of the table (not ORM
+    attributes), so that they can be adapted to the sampled table."""
+    approximate = mode == FacetModeEnum.approximate and session.get_bind().dialect.name == 'postgresql'
+    source, scale = table, 1
+    if approximate:
+        source = tablesample(table, func.system(FACET_SAMPLE_PERCENT))
+        adapter = ClauseAdapter(source)
+        where = adapter.traverse(where) if where is not None else None
+        columns = {name: adapter.traverse(column) for name, column in columns.items()}
+        scale = 100 / FACET_SAMPLE_PERCENT
+
+    queries = []
+    for name, column in columns.items():
+        # Every facet yields integers (ids, years, genre codes), so the selects can be combined
+        query = (select(literal_column(f"'{name}'").label('facet'), type_coerce(column, Integer).label('value'),
+                        func.count().label('count'))
+                 .select_from(source).group_by(column))
+        queries.append(query.where(where) if where is not None else query)
+    result = await session.execute(union_all(*queries) if len(queries) > 1 else queries[0])
+
+    counts = {name: [] for name in columns}
+    for facet, value, count in result.all():
+        column_type = columns[facet].type
+        if isinstance(column_type, TypeDecorator):
+            value = column_type.process_result_value(value, session.get_bind().dialect)
+        counts[facet].append(FacetCountSchema(value=value, count=round(count * scale)))
+    for facet_counts in counts.values():
+        facet_counts.sort(key=lambda facet_count: facet_count.count, reverse=True)
+    return FacetsSchema(approximate=approximate, counts=counts)
@@ -1,5 +1,5 @@
 from pathlib import Path
-from pydantic import BaseModel, Field, SecretStr
+from pydantic import BaseModel, Field, SecretStr, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from sqlalchemy.engine import URL
 
@@ -16,6 +16,13 @@ class DatabaseSettings(BaseModel):
     )
     engine: str
     debug: bool
+    # Connections kept open by the pool and opened on top of them under load, the admission limits have to fit in them
+    pool_size: int = 20
+    max_overflow: int = 10
+
+    @property
+    def pool_capacity(self) -> int:
+        return self.pool_size + self.max_overflow
 
     def get_url(self, password: SecretStr | None = None) -> URL:
         password = password or self.password
@@ -50,6 +57,117 @@ class AuthSettings(BaseModel):
     jwt_strategy_token_secret: SecretStr
 
 
+class StatsSettings(BaseModel):
+    # Seconds between two refreshes of the statistics materialized views (PostgreSQL only)
+    refresh_interval: int = 300
+
+
+class AutocompleteSettings(BaseModel):
+    # Seconds between two rebuilds of the autocomplete index, which pick up the writes of other processes
+    rebuild_interval: int = 600
+
+
+class AdmissionLimitSettings(BaseModel):
+    limit: int = 32  # Requests of the route class handled at the same time
+    queue_size: int = 128  # Requests waiting for a free slot, the next ones are rejected right away
+    queue_timeout: float = 2  # Seconds a request may wait for a free slot before it is rejected
+
+
+class AdmissionSettings(BaseModel):
+    # Value of the Retry-After header of the rejected requests, in seconds
+    retry_after: int = 1
+    # Connections of the database pool left to the background tasks, the limits share the rest
+    reserved_connections: int = 4
+    read: AdmissionLimitSettings = AdmissionLimitSettings(limit=12, queue_size=256, queue_timeout=2)
+    nested_read: AdmissionLimitSettings = AdmissionLimitSettings(limit=6, queue_size=64, queue_timeout=2)
+    write: AdmissionLimitSettings = AdmissionLimitSettings(limit=6, queue_size=64, queue_timeout=5)
+    auth: AdmissionLimitSettings = AdmissionLimitSettings(limit=2, queue_size=32, queue_timeout=2)
+
+    @property
+    def connections(self) -> int:
+        """Connections needed when every route class is at its limit."""
+        return self.read.limit + self.nested_read.limit + self.write.limit + self.auth.limit + self.reserved_connections
+
+
+class DeadlineSettings(BaseModel):
+    enabled: bool = True
+    # Seconds a request of the route class may take when the client does not send X-Request-Timeout
+    read: float = 5
+    nested_read: float = 10
+    write: float = 30
+    auth: float = 10
+    maximum: float = 60  # Longest X-Request-Timeout accepted from a client
+
+
+class CompressionSettings(BaseModel):
+    enabled: bool = True
+    minimum_size: int = 1024  # Bodies smaller than this (in bytes) are sent uncompressed
+    gzip_level: int = 6
+    zstd_level: int = 3  # Used when the zstandard package is installed
+    # Total size of the compressed bodies kept for the repeated responses
+    cache_max_bytes: int = 32 * 1024 * 1024
+
+
+class ExportSettings(BaseModel):
+    # Rows fetched from the server-side cursor at a time
+    batch_size: int = 1000
+
+
+class MemoryCatalogSettings(BaseModel):
+    # Serves the catalog reads from an in-memory copy of the catalog loaded at startup
+    enabled: bool = False
+    # Seconds between two reloads of the copy, which pick up the writes of other processes
+    refresh_interval: int = 300
+
+
+class ChangeLogSettings(BaseModel):
+    retention_days: int = 30  # Older changes are removed, the consumers behind them get 410 from /changes
+    # Seconds after which the changes superseded by a later change of the same row are removed
+    compact_after: int = 3600
+    maintenance_interval: int = 3600  # Seconds between two compactions and retention runs
+
+
+class EventsSettings(BaseModel):
+    poll_interval: float = 1  # Seconds between two reads of the change log while it has no new entries
+    batch_size: int = 500  # Change log entries read at a time
+    buffer_size: int = 1000  # Events buffered per subscriber, a subscriber with a full buffer is evicted
+    max_subscribers: int = 1000
+    keepalive_interval: float = 15  # Seconds between two comments sent to idle streams
+    replay_limit: int = 10000  # Events replayed at most on reconnection with Last-Event-ID
+
+
+class PerformerDocumentSettings(BaseModel):
+    # Serves /performer_by_id from the performers serialized ahead of the reads, rebuilt after every write
+    enabled: bool = True
+    # Seconds between two looks for the documents made stale by the writes of other processes
+    rebuild_interval: float = 5
+    batch_size: int = 100
+
+
+class DataMigrationSettings(BaseModel):
+    batch_size: int = 1000  # Rows written per transaction
+    pause: float = 0.1  # Seconds between two batches, leaves room for the regular traffic
+
+
 class Settings(DatabaseConnectionSettings):
     debug: bool
     auth: AuthSettings
+    stats: StatsSettings = StatsSettings()
+    autocomplete: AutocompleteSettings = AutocompleteSettings()
+    admission: AdmissionSettings = AdmissionSettings()
+    deadlines: DeadlineSettings = DeadlineSettings()
+    compression: CompressionSettings = CompressionSettings()
+    export: ExportSettings = ExportSettings()
+    memory_catalog: MemoryCatalogSettings = MemoryCatalogSettings()
+    change_log: ChangeLogSettings = ChangeLogSettings()
+    events: EventsSettings = EventsSettings()
+    performer_documents: PerformerDocumentSettings = PerformerDocumentSettings()
+    data_migration: DataMigrationSettings = DataMigrationSettings()
+
+    @model_validator(mode='after')
+    def check_admission_fits_pool(self) -> 'Settings':
+        # Admitted requests beyond the pool would wait for a connection inside of the handlers instead of in the queue
+        if self.admission.connections > self.database.pool_capacity:
+            raise ValueError(f"The admission limits need {self.admission.connections} database connections, "
+                             f"the pool has {self.database.pool_capacity} (pool_size + max_overflow)")
+        return self
@@ -0,0 +1,90 @@
+"""Coalescing of identical concurrent reads.
+
+The first request for a key starts the read in a task of its own, the requests for the same key arriving
+while it runs wait for that task instead of querying the database again; every waiter gets the result (or
+the exception) of the single execution. Nothing is cached, the next request after completion reads again.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from common.deadlines import request_deadline
+from db.database import DatabaseSession
+
+T = TypeVar('T')
+
+
+class Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self) -> None:
+        self._flights: Dict[Hashable, Flight] = {}
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[T]]) -> T:
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = Flight(asyncio.create_task(call()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda task: self._forget(key, flight))
+
+        flight.waiters += 1
+        try:
+            # Waited on rather than awaited, so that a cancelled waiter does not cancel the read of the others
+            await asyncio.wait((flight.task,))
+            return flight.task.result()
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def _forget(self, key: Hashable, flight: Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if not flight.task.cancelled():
+            # Marks the exception as retrieved when every waiter was cancelled
+            flight.task.exception()
+
+
+read_flights = SingleFlight()
+
+
+def freeze(value: Any) -> Hashable:
+    """Turns query inputs (pydantic models, lists, dicts and scalars) into a hashable key."""
+    if isinstance(value, BaseModel):
+        value = value.model_dump()
+    if isinstance(value, dict):
+        return tuple(sorted((key, freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+async def coalesced_read(session: AsyncSession, read: Callable[..., Awaitable[Any]], *args: Any,
+                         serialize: Callable[[Any], T]) -> T:
+    """Calls the query builder read method with the arguments, sharing the execution with the concurrent
+    calls made with equal arguments. The shared read runs in a session of its own and returns the serialized
+    result, so that it does not depend on the session (or the cancellation) of any of the requests."""
+    key = (read.__qualname__, *(freeze(arg) for arg in args))
+    # Bound like the session of the request (the engine, or the connection the tests run in)
+    session_maker = async_sessionmaker(bind=session.bind, class_=AsyncSession, expire_on_commit=False,
+                                       join_transaction_mode=session.sync_session.join_transaction_mode)
+
+    async def call() -> T:
+        # The task copied the context of the first request, whose deadline must not cut the read short for the
+        # requests joining it. The read is still cancelled once every waiting request is
+        request_deadline.set(None)
+        async with DatabaseSession(session_maker=session_maker) as db:
+            return serialize(await read(db.session, *args))
+
+    return await read_flights.do(key, call)
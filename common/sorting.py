@@ -0,0 +1,18 @@
+from enum import Enum
+from sqlalchemy import Select
+from sqlalchemy.sql.elements import ColumnElement
+
+
+class SortOrderEnum(str, Enum):
+    asc = 'asc'
+    desc = 'desc'
+
+
+def apply_sorting(select_query: Select, sort_column: ColumnElement, order: SortOrderEnum,
+                  tie_breaker: ColumnElement) -> Select:
+    """Orders the query by the given column, using the tie breaker (the primary key) to keep the order
+    stable between pages."""
+    columns = [sort_column] if sort_column is tie_breaker else [sort_column, tie_breaker]
+    if order == SortOrderEnum.desc:
+        return select_query.order_by(*(column.desc() for column in columns))
+    return select_query.order_by(*(column.asc() for column in columns))
@@ -0,0 +1,55 @@
+import json
+from enum import Enum
+from typing import Optional
+
+from sqlalchemy import Table, func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.elements import ColumnElement
+from sqlmodel import SQLModel
+
+
+class TotalModeEnum(str, Enum):
+    exact = 'exact'
+    estimate = 'estimate'
+
+
+class TotalParams(SQLModel):
+    total: Optional[TotalModeEnum] = None  # Adds the number of all matching rows to the list response when set
+
+
+class TotalSchema(SQLModel):
+    count: int
+    estimated: bool = False
+
+
+async def count_total(session: AsyncSession, table: Table, where: Optional[ColumnElement],
+                      mode: TotalModeEnum) -> TotalSchema:
+    """Counts the rows of the table matching the where clause. The estimate mode reads the planner statistics
+    on PostgreSQL instead of counting: pg_class.reltuples without filters and the row estimate of the plan
+    of the filtered query otherwise. Other databases, and tables that were never analyzed, count exactly."""
+    if mode == TotalModeEnum.estimate and session.get_bind().dialect.name == 'postgresql':
+        estimate = await estimate_rows(session, table, where)
+        if estimate is not None:
+            return TotalSchema(count=estimate, estimated=True)
+
+    query = select(func.count()).select_from(table)
+    if where is not None:
+        query = query.where(where)
+    return TotalSchema(count=(await session.execute(query)).scalar_one())
+
+
+async def estimate_rows(session: AsyncSession, table: Table, where: Optional[ColumnElement]) -> Optional[int]:
+    if where is None:
+        query = text("SELECT reltuples::bigint FROM pg_class WHERE oid = CAST(:name AS regclass)")
+        estimate = (await session.execute(query, {'name': table.name})).scalar()
+        # reltuples is -1 (0 before PostgreSQL 14) until the table is vacuumed or analyzed
+        return estimate if estimate and estimate > 0 else None
+
+    compiled = select(1).select_from(table).where(where).compile(dialect=session.get_bind().dialect,
+                                                                compile_kwargs={'literal_binds': True})
+    # Sent to the driver as is, so that colons in the filter values are not taken for bind parameters
+    connection = await session.connection()
+    plan = (await connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}")).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
@@ -0,0 +1,157 @@
+"""Batched, resumable data migrations for tables too large for a single statement.
+
+A data migration walks the rows of a table in the order of an integer key (keyset pagination, no OFFSET) and
+applies a set-based statement to one batch of keys per transaction, with a pause between the batches. The last
+key of every batch is checkpointed in the transaction of the batch, so that an interrupted run resumes after the
+last committed batch and no batch is applied twice. The indexes a migration needs are created afterwards with
+CREATE INDEX CONCURRENTLY on PostgreSQL, without blocking the writes to the table, and the migration is marked as
+finished only once they are all built.
+
+Data migrations run next to the regular traffic, with ``python -m commands.run_data_migration``, instead of
+inside of an Alembic revision (which holds its locks until the end of the whole upgrade).
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import ClassVar, Dict, List, Optional, Type
+
+from sqlalchemy import Column, Index, func, select, text
+from sqlalchemy.schema import CreateIndex, DropIndex
+
+from db.database import Database
+from dependecies.session import AsyncSessionDep
+from models import DataMigrationCheckpoint
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Batch:
+    after: Optional[int]  # Last key of the previous batch, None for the first one
+    keys: List[int]  # Keys of the batch, in increasing order
+
+    @property
+    def last(self) -> int:
+        return self.keys[-1]
+
+
+@dataclass
+class DataMigrationReport:
+    name: str
+    batches: int = 0
+    rows: int = 0
+    seconds: float = 0
+    last_key: Optional[int] = None
+    finished: bool = False
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+class DataMigration:
+    """Base class of the data migrations, a subclass sets the name and the key and implements apply_batch."""
+    name: ClassVar[str]
+    # Unique integer column of the table (not the model attribute) the rows are walked by, usually the primary key
+    key: ClassVar[Column]
+    # Indexes of the model created concurrently once every batch has been applied
+    indexes: ClassVar[List[Index]] = []
+
+    async def apply_batch(self, session: AsyncSessionDep, batch: Batch) -> int:
+        """Migrates the rows of the batch in the current transaction and returns the number of rows written."""
+        raise NotImplementedError
+
+
+DATA_MIGRATIONS: Dict[str, Type[DataMigration]] = {}
+
+
+def register_data_migration(migration: Type[DataMigration]) -> Type[DataMigration]:
+    DATA_MIGRATIONS[migration.name] = migration
+    return migration
+
+
+async def create_index_concurrently(database: Database, index: Index) -> None:
+    """Creates the index unless it exists, with CREATE INDEX CONCURRENTLY on PostgreSQL. An invalid index left
+    behind by an interrupted concurrent build is dropped and built again."""
+    # Only for this build, metadata.create_all has to keep creating the index in its transaction
+    options = index.dialect_options['postgresql']
+    concurrently, options['concurrently'] = options['concurrently'], True
+    try:
+        async with database.engine.connect() as connection:
+            # CREATE INDEX CONCURRENTLY cannot run inside of a transaction block
+            connection = await connection.execution_options(isolation_level="AUTOCOMMIT")
+            if connection.dialect.name == 'postgresql':
+                invalid = await connection.scalar(text("SELECT NOT indisvalid FROM pg_index "
+                                                       "WHERE indexrelid = to_regclass(:name)"), {'name': index.name})
+                if invalid:
+                    logger.warning(f"Dropping the invalid index {index.name} before building it again.")
+                    await connection.execute(DropIndex(index, if_exists=True))
+            await connection.execute(CreateIndex(index, if_not_exists=True))
+    finally:
+        options['concurrently'] = concurrently
+
+
+async def get_checkpoint(session: AsyncSessionDep, name: str) -> Optional[DataMigrationCheckpoint]:
+    # Locked until the end of the batch, a second run of the same migration waits instead of repeating it
+    result = await session.execute(select(DataMigrationCheckpoint).where(DataMigrationCheckpoint.name == name)
+                                   .with_for_update())
+    return result.scalar()
+
+
+async def run_data_migration(database: Database, migration: DataMigration, batch_size: int, pause: float,
+                             restart: bool = False) -> DataMigrationReport:
+    """Applies the migration batch by batch from its checkpoint (from the first row when restart is set or
+    on the first run) and reports the throughput after every batch."""
+    report = DataMigrationReport(name=migration.name)
+    async with database.session_maker() as session:
+        checkpoint = await get_checkpoint(session, migration.name)
+        if checkpoint is None:
+            session.add(DataMigrationCheckpoint(name=migration.name))
+        elif restart:
+            checkpoint.last_key, checkpoint.rows, checkpoint.finished_at = None, 0, None
+            checkpoint.started_at = datetime.now(timezone.utc)
+        elif checkpoint.finished_at is not None:
+            logger.info(f"Data migration {migration.name} already finished at {checkpoint.finished_at}.")
+            report.last_key, report.finished = checkpoint.last_key, True
+            return report
+        await session.commit()
+        max_key = await session.scalar(select(func.max(migration.key)))
+
+    started = time.monotonic()
+    while True:
+        async with database.session_maker() as session:
+            checkpoint = await get_checkpoint(session, migration.name)
+            query = select(migration.key).order_by(migration.key).limit(batch_size)
+            if checkpoint.last_key is not None:
+                query = query.where(migration.key > checkpoint.last_key)
+            keys = list((await session.execute(query)).scalars())
+            if not keys:
+                break
+            rows = await migration.apply_batch(session, Batch(after=checkpoint.last_key, keys=keys))
+            checkpoint.last_key, checkpoint.rows = keys[-1], checkpoint.rows + rows
+            checkpoint.updated_at = datetime.now(timezone.utc)
+            await session.commit()
+
+        report.batches += 1
+        report.rows += rows
+        report.last_key = keys[-1]
+        report.seconds = time.monotonic() - started
+        logger.info(f"Data migration {migration.name}: {report.rows} rows in {report.batches} batches, "
+                    f"{report.rows_per_second:.0f} rows/s, key {report.last_key} of {max_key}.")
+        await asyncio.sleep(pause)
+
+    for index in migration.indexes:
+        logger.info(f"Data migration {migration.name}: creating the index {index.name}.")
+        await create_index_concurrently(database, index)
+    # Finished only now, a run interrupted while building the indexes finds no batch left and builds them again
+    async with database.session_maker() as session:
+        checkpoint = await get_checkpoint(session, migration.name)
+        checkpoint.finished_at = datetime.now(timezone.utc)
+        await session.commit()
+    report.seconds = time.monotonic() - started
+    report.finished = True
+    logger.info(f"Data migration {migration.name} finished: {report.rows} rows in {report.seconds:.1f}s, "
+                f"{report.rows_per_second:.0f} rows/s.")
+    return report
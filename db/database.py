@@ -25,11 +25,15 @@ class Database:
                     engine_args = dict(
                         echo=self._settings.database.debug
                     )
-                self._engine = create_async_engine(db_url, **engine_args)  # type: ignore
+                    # The pools SQLite gets by default do not take a size
+                    if db_url.get_backend_name() != 'sqlite':
+                        engine_args.update(pool_size=self._settings.database.pool_size,
+                                           max_overflow=self._settings.database.max_overflow)
+            self._engine = create_async_engine(db_url, **engine_args)  # type: ignore
 
-            self._session_maker = async_sessionmaker(
-                self._engine, class_=AsyncSession, expire_on_commit=False
-            )
+        self._session_maker = async_sessionmaker(
+            self._engine, class_=AsyncSession, expire_on_commit=False
+        )
 
     @property
     def engine(self) -> AsyncEngine:
@@ -43,11 +47,29 @@ class Database:
         await self.engine.dispose(close=close)
 
 
+_database: Optional[Database] = None
+
+
+def set_database(database: Optional[Database]) -> Optional[Database]:
+    """Registers the database used by the sessions of the application, so that a single engine
+    (and its connection pool) is shared by all requests instead of being created per session."""
+    global _database
+    _database = database
+    return database
+
+
+def get_database() -> Database:
+    """Returns the registered database, creating one from the settings on the first call."""
+    if _database is None:
+        set_database(Database())
+    return _database
+
+
 class DatabaseSession:
     def __init__(self, commit_on_exit: bool = False, session_maker: Optional[async_sessionmaker] = None):
         self.commit_on_exit = commit_on_exit
         if session_maker is None:
-            self._session_maker = Database().session_maker
+            self._session_maker = get_database().session_maker
         else:
             self._session_maker = session_maker
         self._session = None
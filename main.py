@@ -1,13 +1,30 @@
+import asyncio
 import logging
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
 
 from common.settings import Settings
-from db.database import Database
+from common.admission import AdmissionControlMiddleware, admission_controller
+from common.compression import CompressionMiddleware, response_compressor
+from common.deadlines import DeadlineMiddleware, deadline_policy
+from db.database import Database, set_database
 from services.performers.routers.performer import performers_router
 from services.albums.routers.album import albums_router
 from services.songs.routers.song import songs_router
 from services.users.routers.users import users_router
+from services.stats.routers.stats import stats_router
+from services.stats.modules.refresher import run_stats_refresher
+from services.autocomplete.routers.autocomplete import autocomplete_router
+from services.autocomplete.modules.index import run_autocomplete_rebuilder
+from services.admin.routers.admission import admission_router
+from services.admin.routers.reconcile import reconcile_router
+from services.export.routers.export import export_router
+from services.memory_catalog.modules.catalog import load_memory_catalog, run_memory_catalog_refresher
+from services.changes.routers.changes import changes_router
+from services.changes.modules.maintenance import run_change_log_maintenance
+from services.events.routers.events import events_router
+from services.events.modules.broker import event_broker, run_event_poller
+from services.performers.modules.documents import run_performer_document_builder
 
 logging.basicConfig(filename='logging.log', level=logging.DEBUG, filemode='w')
 logger = logging.getLogger(__name__)
@@ -16,15 +33,47 @@ logger = logging.getLogger(__name__)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info('Application startup.')
-    database = Database(settings=Settings())
+    settings = Settings()
+    database = set_database(Database(settings=settings))
+    admission_controller.configure(settings.admission, settings.database.pool_capacity)
+    deadline_policy.configure(settings.deadlines)
+    response_compressor.configure(settings.compression)
+    event_broker.configure(settings.events)
+    background_tasks = [
+        asyncio.create_task(run_stats_refresher(database, settings.stats.refresh_interval)),
+        asyncio.create_task(run_autocomplete_rebuilder(database, settings.autocomplete.rebuild_interval)),
+        asyncio.create_task(run_change_log_maintenance(database, settings.change_log)),
+        asyncio.create_task(run_event_poller(database)),
+    ]
+    if settings.performer_documents.enabled:
+        background_tasks.append(asyncio.create_task(
+            run_performer_document_builder(database, settings.performer_documents)))
+    if settings.memory_catalog.enabled:
+        await load_memory_catalog(database)
+        background_tasks.append(asyncio.create_task(
+            run_memory_catalog_refresher(database, settings.memory_catalog.refresh_interval)))
     yield
+    for task in background_tasks:
+        task.cancel()
     await database.dispose(close=False)
+    set_database(None)
     logger.info('Application shutdown.')
 
 
 app = FastAPI(lifespan=lifespan)
+app.add_middleware(AdmissionControlMiddleware, controller=admission_controller)
+# Outside of the admission control, the deadline covers the wait for a slot
+app.add_middleware(DeadlineMiddleware, policy=deadline_policy)
+app.add_middleware(CompressionMiddleware, compressor=response_compressor)
 
 app.include_router(performers_router, tags=['performers'])
 app.include_router(albums_router, tags=['albums'])
 app.include_router(songs_router, tags=['songs'])
+app.include_router(stats_router, tags=['stats'])
+app.include_router(autocomplete_router, tags=['autocomplete'])
+app.include_router(export_router, tags=['export'])
+app.include_router(changes_router, tags=['changes'])
+app.include_router(events_router, tags=['events'])
 app.include_router(users_router, tags=['users'])
+app.include_router(admission_router, tags=['admin'])
+app.include_router(reconcile_router, tags=['admin'])
@@ -7,7 +7,7 @@ from pydantic import computed_field
 from sqlalchemy.ext.asyncio import create_async_engine
 from sqlmodel import SQLModel
 
-from models import Performer, Album, Song
+from models import Performer, Album, Song, Genre
 from common.settings import DatabaseConnectionSettings
 
 
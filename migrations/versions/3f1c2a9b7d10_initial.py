@@ -0,0 +1,76 @@
+"""initial
+
+Revision ID: 3f1c2a9b7d10
+Revises: 
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c2a9b7d10'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'performers',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('pseudonym', sa.VARCHAR(length=64), nullable=False),
+        sa.Column('biography', sa.VARCHAR(length=500), nullable=True),
+        sa.Column('performance_type', sa.VARCHAR(length=20), nullable=True),
+        sa.Column('photo_url', sa.VARCHAR(length=150), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('pseudonym')
+    )
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('first_name', sa.VARCHAR(length=32), nullable=True),
+        sa.Column('last_name', sa.VARCHAR(length=32), nullable=True),
+        sa.Column('email', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('hashed_password', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('is_active', sa.Boolean(), nullable=False),
+        sa.Column('is_verified', sa.Boolean(), nullable=False),
+        sa.Column('is_superuser', sa.Boolean(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('email')
+    )
+    op.create_table(
+        'albums',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.VARCHAR(length=64), nullable=False),
+        sa.Column('year', sa.INTEGER(), nullable=True),
+        sa.Column('total_duration', sa.VARCHAR(length=24), nullable=True),
+        sa.Column('performer_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['performer_id'], ['performers.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table(
+        'songs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.VARCHAR(length=64), nullable=False),
+        sa.Column('duration', sa.VARCHAR(length=12), nullable=True),
+        sa.Column('genre', sa.VARCHAR(length=32), nullable=True),
+        sa.Column('performer_id', sa.Integer(), nullable=True),
+        sa.Column('album_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['album_id'], ['albums.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['performer_id'], ['performers.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('songs')
+    op.drop_table('albums')
+    op.drop_table('users')
+    op.drop_table('performers')
@@ -0,0 +1,34 @@
+"""sorting indexes
+
+Revision ID: 8a4e1d6c2b57
+Revises: 3f1c2a9b7d10
+Create Date: 2026-10-19 09:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8a4e1d6c2b57'
+down_revision: Union[str, Sequence[str], None] = '3f1c2a9b7d10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_songs_performer_id_album_id', 'songs', ['performer_id', 'album_id'], unique=False)
+    op.create_index('ix_songs_album_id', 'songs', ['album_id'], unique=False)
+    op.create_index('ix_songs_genre_title', 'songs', ['genre', 'title'], unique=False)
+    op.create_index('ix_albums_performer_id_year', 'albums', ['performer_id', 'year'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_albums_performer_id_year', table_name='albums')
+    op.drop_index('ix_songs_genre_title', table_name='songs')
+    op.drop_index('ix_songs_album_id', table_name='songs')
+    op.drop_index('ix_songs_performer_id_album_id', table_name='songs')
@@ -0,0 +1,43 @@
+"""stats views
+
+Revision ID: a6d2e8f41b93
+Revises: f3b8d2c5e716
+Create Date: 2026-10-19 12:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+from models.stats import genre_stats_select, year_stats_select
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6d2e8f41b93'
+down_revision: Union[str, Sequence[str], None] = 'f3b8d2c5e716'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_performers_total_seconds', 'performers', ['total_seconds'])
+
+    # Other databases compute the statistics on request
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for name, query in (('stats_genres', genre_stats_select()), ('stats_years', year_stats_select())):
+        compiled = query.compile(dialect=postgresql.dialect(), compile_kwargs={'literal_binds': True})
+        op.execute(f'CREATE MATERIALIZED VIEW {name} AS {compiled}')
+    # REFRESH MATERIALIZED VIEW CONCURRENTLY requires a unique index
+    op.create_index('uq_stats_genres_genre', 'stats_genres', ['genre'], unique=True)
+    op.create_index('uq_stats_years_year', 'stats_years', ['year'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('DROP MATERIALIZED VIEW stats_years')
+        op.execute('DROP MATERIALIZED VIEW stats_genres')
+    op.drop_index('ix_performers_total_seconds', table_name='performers')
@@ -0,0 +1,46 @@
+"""change log
+
+Revision ID: b7e1c4d9a352
+Revises: a6d2e8f41b93
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e1c4d9a352'
+down_revision: Union[str, Sequence[str], None] = 'a6d2e8f41b93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('change_log',
+                    sa.Column('revision', sa.BigInteger().with_variant(sa.INTEGER(), 'sqlite'), autoincrement=True,
+                              nullable=False),
+                    sa.Column('entity', sa.VARCHAR(length=16), nullable=False),
+                    sa.Column('entity_id', sa.INTEGER(), nullable=False),
+                    sa.Column('action', sa.VARCHAR(length=8), nullable=False),
+                    sa.Column('changed_at', sa.DateTime(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'),
+                              nullable=False),
+                    sa.PrimaryKeyConstraint('revision'),
+                    sqlite_autoincrement=True)
+    op.create_index('ix_change_log_entity_entity_id', 'change_log', ['entity', 'entity_id'], unique=False)
+    op.create_index('ix_change_log_changed_at', 'change_log', ['changed_at'], unique=False)
+    op.create_table('change_log_horizon',
+                    sa.Column('id', sa.INTEGER(), autoincrement=False, nullable=False),
+                    sa.Column('revision', sa.BigInteger(), server_default='0', nullable=False),
+                    sa.PrimaryKeyConstraint('id'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('change_log_horizon')
+    op.drop_index('ix_change_log_changed_at', table_name='change_log')
+    op.drop_index('ix_change_log_entity_entity_id', table_name='change_log')
+    op.drop_table('change_log')
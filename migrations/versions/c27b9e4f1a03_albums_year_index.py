@@ -0,0 +1,28 @@
+"""albums year index
+
+Revision ID: c27b9e4f1a03
+Revises: 8a4e1d6c2b57
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c27b9e4f1a03'
+down_revision: Union[str, Sequence[str], None] = '8a4e1d6c2b57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_albums_year', 'albums', ['year'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_albums_year', table_name='albums')
@@ -0,0 +1,38 @@
+"""performer documents
+
+Revision ID: c4f9a2e7b618
+Revises: b7e1c4d9a352
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4f9a2e7b618'
+down_revision: Union[str, Sequence[str], None] = 'b7e1c4d9a352'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('performer_documents',
+                    sa.Column('performer_id', sa.INTEGER(), autoincrement=False, nullable=False),
+                    sa.Column('version', sa.INTEGER(), server_default='0', nullable=False),
+                    sa.Column('document', sa.LargeBinary(), nullable=True),
+                    sa.ForeignKeyConstraint(['performer_id'], ['performers.id'], ondelete='CASCADE'),
+                    sa.PrimaryKeyConstraint('performer_id'))
+    # The documents are built by the application in the background
+    op.create_index('ix_performer_documents_stale', 'performer_documents', ['performer_id'], unique=False,
+                    postgresql_where=sa.text('document IS NULL'), sqlite_where=sa.text('document IS NULL'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_performer_documents_stale', table_name='performer_documents',
+                  postgresql_where=sa.text('document IS NULL'), sqlite_where=sa.text('document IS NULL'))
+    op.drop_table('performer_documents')
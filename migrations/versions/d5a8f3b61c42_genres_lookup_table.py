@@ -0,0 +1,59 @@
+"""genres lookup table
+
+Revision ID: d5a8f3b61c42
+Revises: c27b9e4f1a03
+Create Date: 2026-10-19 10:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from models.genres import GENRE_CODES
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5a8f3b61c42'
+down_revision: Union[str, Sequence[str], None] = 'c27b9e4f1a03'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    genres = op.create_table(
+        'genres',
+        sa.Column('id', sa.SMALLINT(), autoincrement=False, nullable=False),
+        sa.Column('name', sa.VARCHAR(length=32), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name')
+    )
+    op.bulk_insert(genres, [{'id': code, 'name': name} for name, code in GENRE_CODES.items()])
+
+    # Songs with a genre that isn't in the lookup table end up with a NULL genre.
+    op.add_column('songs', sa.Column('genre_code', sa.SMALLINT(), nullable=True))
+    op.execute('UPDATE songs SET genre_code = (SELECT genres.id FROM genres WHERE genres.name = songs.genre)')
+
+    op.drop_index('ix_songs_genre_title', table_name='songs')
+    with op.batch_alter_table('songs') as batch_op:
+        batch_op.drop_column('genre')
+        batch_op.alter_column('genre_code', new_column_name='genre')
+    with op.batch_alter_table('songs') as batch_op:
+        batch_op.create_foreign_key('fk_songs_genre_genres', 'genres', ['genre'], ['id'])
+    op.create_index('ix_songs_genre_title', 'songs', ['genre', 'title'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.add_column('songs', sa.Column('genre_name', sa.VARCHAR(length=32), nullable=True))
+    op.execute('UPDATE songs SET genre_name = (SELECT genres.name FROM genres WHERE genres.id = songs.genre)')
+
+    op.drop_index('ix_songs_genre_title', table_name='songs')
+    # Dropping the column drops its foreign key as well.
+    with op.batch_alter_table('songs') as batch_op:
+        batch_op.drop_column('genre')
+        batch_op.alter_column('genre_name', new_column_name='genre')
+    op.create_index('ix_songs_genre_title', 'songs', ['genre', 'title'], unique=False)
+
+    op.drop_table('genres')
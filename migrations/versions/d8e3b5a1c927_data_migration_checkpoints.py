@@ -0,0 +1,36 @@
+"""data migration checkpoints
+
+Revision ID: d8e3b5a1c927
+Revises: c4f9a2e7b618
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8e3b5a1c927'
+down_revision: Union[str, Sequence[str], None] = 'c4f9a2e7b618'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('data_migration_checkpoints',
+                    sa.Column('name', sa.VARCHAR(length=64), nullable=False),
+                    sa.Column('last_key', sa.BigInteger(), nullable=True),
+                    sa.Column('rows', sa.BigInteger(), server_default='0', nullable=False),
+                    sa.Column('started_at', sa.DateTime(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'),
+                              nullable=False),
+                    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+                    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+                    sa.PrimaryKeyConstraint('name'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('data_migration_checkpoints')
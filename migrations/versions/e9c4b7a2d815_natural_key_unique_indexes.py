@@ -0,0 +1,33 @@
+"""natural key unique indexes
+
+Revision ID: e9c4b7a2d815
+Revises: d5a8f3b61c42
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e9c4b7a2d815'
+down_revision: Union[str, Sequence[str], None] = 'd5a8f3b61c42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Fails if the tables already contain duplicates, they have to be merged or renamed before upgrading.
+    op.create_index('uq_albums_natural_key', 'albums',
+                    [sa.text('coalesce(performer_id, 0)'), 'title'], unique=True)
+    op.create_index('uq_songs_natural_key', 'songs',
+                    [sa.text('coalesce(performer_id, 0)'), sa.text('coalesce(album_id, 0)'), 'title'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_songs_natural_key', table_name='songs')
+    op.drop_index('uq_albums_natural_key', table_name='albums')
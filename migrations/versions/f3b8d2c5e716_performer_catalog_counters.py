@@ -0,0 +1,49 @@
+"""performer catalog counters
+
+Revision ID: f3b8d2c5e716
+Revises: e9c4b7a2d815
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from common.duration_calc import song_length_seconds
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b8d2c5e716'
+down_revision: Union[str, Sequence[str], None] = 'e9c4b7a2d815'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COUNTERS = ('album_count', 'song_count', 'single_count', 'total_seconds')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for counter in COUNTERS:
+        op.add_column('performers', sa.Column(counter, sa.INTEGER(), server_default='0', nullable=False))
+
+    performers = sa.table('performers', sa.column('id'), *(sa.column(counter) for counter in COUNTERS))
+    albums = sa.table('albums', sa.column('id'), sa.column('performer_id'))
+    songs = sa.table('songs', sa.column('id'), sa.column('performer_id'), sa.column('album_id'),
+                     sa.column('duration'))
+    songs_query = sa.select(sa.func.count(songs.c.id)).where(songs.c.performer_id == performers.c.id)
+    op.execute(performers.update().values(
+        album_count=(sa.select(sa.func.count(albums.c.id)).where(albums.c.performer_id == performers.c.id)
+                     .scalar_subquery()),
+        song_count=songs_query.scalar_subquery(),
+        single_count=songs_query.where(songs.c.album_id.is_(None)).scalar_subquery(),
+        total_seconds=(sa.select(sa.func.coalesce(sa.func.sum(song_length_seconds(songs.c.duration)), 0))
+                       .where(songs.c.performer_id == performers.c.id).scalar_subquery()),
+    ))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('performers') as batch_op:
+        for counter in reversed(COUNTERS):
+            batch_op.drop_column(counter)
@@ -1,4 +1,8 @@
+from .genres import Genre
 from .performers import Performer
 from .albums import Album
 from .songs import Song
 from .user import User
+from .change_log import ChangeLog, ChangeLogHorizon
+from .performer_documents import PerformerDocument
+from .data_migration import DataMigrationCheckpoint
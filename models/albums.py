@@ -1,5 +1,5 @@
 from sqlmodel import SQLModel, Field, Relationship
-from sqlalchemy import Column, String, Integer, VARCHAR, INTEGER
+from sqlalchemy import Column, String, Integer, VARCHAR, INTEGER, Index, func, literal_column
 from typing import List, Optional, Required
 
 from models import Performer
@@ -7,6 +7,10 @@ from models import Performer
 
 class Album(SQLModel, table=True):
     __tablename__ = "albums"
+    __table_args__ = (
+        Index("ix_albums_performer_id_year", "performer_id", "year"),
+        Index("ix_albums_year", "year"),
+    )
 
     id: Optional[int] = Field(primary_key=True)
     title: str = Field(sa_column=Column(VARCHAR(64), nullable=False))
@@ -16,3 +20,8 @@ class Album(SQLModel, table=True):
     performer_id: Optional[int] = Field(foreign_key="performers.id", ondelete="CASCADE")
 
     performer: Optional[Performer] = Relationship(back_populates="albums")
+
+
+# An album title is unique per performer, albums without a performer share the 0 key.
+ALBUM_NATURAL_KEY = (func.coalesce(Album.__table__.c.performer_id, literal_column("0")), Album.__table__.c.title)
+Index("uq_albums_natural_key", *ALBUM_NATURAL_KEY, unique=True)
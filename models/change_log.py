@@ -0,0 +1,36 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Column, BigInteger, INTEGER, VARCHAR, DateTime, Index, func
+from sqlmodel import SQLModel, Field
+
+# SQLite only autoincrements INTEGER PRIMARY KEY columns
+RevisionType = BigInteger().with_variant(INTEGER(), "sqlite")
+
+
+class ChangeLog(SQLModel, table=True):
+    """One row per performer, album or song written by a committed transaction, in commit order."""
+    __tablename__ = "change_log"
+    __table_args__ = (
+        Index("ix_change_log_entity_entity_id", "entity", "entity_id"),
+        Index("ix_change_log_changed_at", "changed_at"),
+        # Never reuses the revision of deleted rows
+        {"sqlite_autoincrement": True},
+    )
+
+    revision: Optional[int] = Field(default=None, sa_column=Column(RevisionType, primary_key=True,
+                                                                   autoincrement=True))
+    entity: str = Field(sa_column=Column(VARCHAR(16), nullable=False))  # performers, albums or songs
+    entity_id: int = Field(sa_column=Column(INTEGER, nullable=False))
+    action: str = Field(sa_column=Column(VARCHAR(8), nullable=False))  # upsert or delete
+    changed_at: Optional[datetime] = Field(default=None, sa_column=Column(DateTime(timezone=True), nullable=False,
+                                                                          server_default=func.now()))
+
+
+class ChangeLogHorizon(SQLModel, table=True):
+    """Single row holding the newest revision removed by the retention, the consumers behind it have to
+    resynchronize from a full export."""
+    __tablename__ = "change_log_horizon"
+
+    id: int = Field(default=1, sa_column=Column(INTEGER, primary_key=True, autoincrement=False))
+    revision: int = Field(default=0, sa_column=Column(BigInteger, nullable=False, server_default="0"))
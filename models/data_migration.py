@@ -0,0 +1,19 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Column, BigInteger, VARCHAR, DateTime, func
+from sqlmodel import SQLModel, Field
+
+
+class DataMigrationCheckpoint(SQLModel, table=True):
+    """Progress of a batched data migration, written in the transaction of every batch so that an interrupted
+    run resumes after the last committed batch."""
+    __tablename__ = "data_migration_checkpoints"
+
+    name: str = Field(sa_column=Column(VARCHAR(64), primary_key=True))
+    last_key: Optional[int] = Field(default=None, sa_column=Column(BigInteger, nullable=True))
+    rows: int = Field(default=0, sa_column=Column(BigInteger, nullable=False, server_default="0"))
+    started_at: Optional[datetime] = Field(default=None, sa_column=Column(DateTime(timezone=True), nullable=False,
+                                                                          server_default=func.now()))
+    updated_at: Optional[datetime] = Field(default=None, sa_column=Column(DateTime(timezone=True), nullable=True))
+    finished_at: Optional[datetime] = Field(default=None, sa_column=Column(DateTime(timezone=True), nullable=True))
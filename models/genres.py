@@ -0,0 +1,43 @@
+from sqlmodel import SQLModel, Field
+from sqlalchemy import Column, SMALLINT, VARCHAR, SmallInteger, event
+from sqlalchemy.types import TypeDecorator
+from typing import Optional
+
+from services.songs.schemas.song import SongTypeEnum
+
+# Stable integer codes of the genres, numbered in the order of SongTypeEnum; songs store the code instead of the
+# name. Never reorder or remove a genre of SongTypeEnum, new genres are added at its end and get the next code.
+GENRE_CODES = {genre.value: code for code, genre in enumerate(SongTypeEnum, start=1)}
+GENRE_NAMES = {code: name for name, code in GENRE_CODES.items()}
+
+
+class GenreType(TypeDecorator):
+    """Stores a genre name as its SMALLINT code and loads it back as the name."""
+    impl = SmallInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect) -> Optional[int]:
+        if value is None:
+            return None
+        name = getattr(value, "value", value)
+        try:
+            return GENRE_CODES[name]
+        except KeyError:
+            raise ValueError(f"Unknown genre: {name}")
+
+    def process_result_value(self, value, dialect) -> Optional[str]:
+        if value is None:
+            return None
+        return GENRE_NAMES[value]
+
+
+class Genre(SQLModel, table=True):
+    __tablename__ = "genres"
+
+    id: Optional[int] = Field(sa_column=Column(SMALLINT, primary_key=True, autoincrement=False))
+    name: str = Field(sa_column=Column(VARCHAR(32), unique=True, nullable=False))
+
+
+@event.listens_for(Genre.__table__, "after_create")
+def insert_genres(target, connection, **kw) -> None:
+    connection.execute(target.insert(), [{"id": code, "name": name} for name, code in GENRE_CODES.items()])
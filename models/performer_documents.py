@@ -0,0 +1,20 @@
+from typing import Optional
+
+from sqlalchemy import Column, ForeignKey, INTEGER, LargeBinary, Index, text
+from sqlmodel import SQLModel, Field
+
+
+class PerformerDocument(SQLModel, table=True):
+    """The response of /performer_by_id for a performer, serialized ahead of the reads. Writes to the performer
+    or to any of its albums and songs clear the document and bump the version in their transaction, the
+    document is then rebuilt in the background."""
+    __tablename__ = "performer_documents"
+    __table_args__ = (
+        Index("ix_performer_documents_stale", "performer_id", postgresql_where=text("document IS NULL"),
+              sqlite_where=text("document IS NULL")),
+    )
+
+    performer_id: int = Field(sa_column=Column(INTEGER, ForeignKey("performers.id", ondelete="CASCADE"),
+                                               primary_key=True, autoincrement=False))
+    version: int = Field(default=0, sa_column=Column(INTEGER, nullable=False, server_default="0"))
+    document: Optional[bytes] = Field(default=None, sa_column=Column(LargeBinary, nullable=True))
@@ -1,10 +1,13 @@
 from sqlmodel import SQLModel, Field, Relationship
-from sqlalchemy import Column, String, VARCHAR
+from sqlalchemy import Column, String, VARCHAR, INTEGER, Index
 from typing import Optional, List
 
 
 class Performer(SQLModel, table=True):
     __tablename__ = "performers"
+    __table_args__ = (
+        Index("ix_performers_total_seconds", "total_seconds"),
+    )
 
     id: Optional[int] = Field(primary_key=True)
     pseudonym: str = Field(sa_column=Column(VARCHAR(64), unique=True, nullable=False))
@@ -12,6 +15,12 @@ class Performer(SQLModel, table=True):
     performance_type: str = Field(sa_column=Column(VARCHAR(20)))
     photo_url: Optional[str] = Field(sa_column=Column(VARCHAR(150)))
 
+    # Catalog counters, kept up to date by the query builders and rebuilt by commands.reconcile_performer_counters
+    album_count: int = Field(default=0, sa_column=Column(INTEGER, nullable=False, server_default="0"))
+    song_count: int = Field(default=0, sa_column=Column(INTEGER, nullable=False, server_default="0"))
+    single_count: int = Field(default=0, sa_column=Column(INTEGER, nullable=False, server_default="0"))
+    total_seconds: int = Field(default=0, sa_column=Column(INTEGER, nullable=False, server_default="0"))
+
     albums: Optional[List["Album"]] = Relationship(back_populates="performer",
                                                    sa_relationship_kwargs={"cascade": "all, delete-orphan"})
     singles: List["Song"] = Relationship(back_populates="performer",
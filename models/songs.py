@@ -1,19 +1,32 @@
 from sqlmodel import SQLModel, Field, Relationship
-from sqlalchemy import Column, VARCHAR
+from sqlalchemy import Column, VARCHAR, Index, ForeignKey, func, literal_column
 from typing import Optional
 
 from models import Performer, Album
+from models.genres import GenreType
 
 
 class Song(SQLModel, table=True):
     __tablename__ = "songs"
+    __table_args__ = (
+        Index("ix_songs_performer_id_album_id", "performer_id", "album_id"),
+        Index("ix_songs_album_id", "album_id"),
+        Index("ix_songs_genre_title", "genre", "title"),
+    )
 
     id: Optional[int] = Field(primary_key=True)
     title: str = Field(sa_column=Column(VARCHAR(64), nullable=False))
     duration: str = Field(sa_column=Column(VARCHAR(12)))
-    genre: str = Field(sa_column=Column(VARCHAR(32)))
+    genre: str = Field(sa_column=Column(GenreType, ForeignKey("genres.id", name="fk_songs_genre_genres")))
     performer_id: Optional[int] = Field(foreign_key="performers.id", ondelete="CASCADE")
     album_id: Optional[int] = Field(foreign_key="albums.id", ondelete="CASCADE")
 
     performer: Optional[Performer] = Relationship(back_populates="singles")
     album: Optional[Album] = Relationship(back_populates="songs")
+
+
+# A song title is unique per performer and album, singles and songs without a performer share the 0 keys.
+SONG_NATURAL_KEY = (func.coalesce(Song.__table__.c.performer_id, literal_column("0")),
+                    func.coalesce(Song.__table__.c.album_id, literal_column("0")),
+                    Song.__table__.c.title)
+Index("uq_songs_natural_key", *SONG_NATURAL_KEY, unique=True)
@@ -0,0 +1,25 @@
+from sqlalchemy import Select, Integer, table, column, select, func
+
+from models.genres import GenreType
+from models.albums import Album
+from models.songs import Song
+from common.duration_calc import song_length_seconds
+
+
+def genre_stats_select() -> Select:
+    return (select(Song.genre.label("genre"), func.count(Song.id).label("song_count"),
+                   func.coalesce(func.sum(song_length_seconds(Song.duration)), 0).label("total_seconds"))
+            .group_by(Song.genre))
+
+
+def year_stats_select() -> Select:
+    return select(Album.year.label("year"), func.count(Album.id).label("album_count")).group_by(Album.year)
+
+
+# Materialized views holding the results of the selects above on PostgreSQL (see the stats_views migration).
+# They are refreshed concurrently by services.stats.modules.refresher, other databases run the selects directly.
+stats_genres = table("stats_genres", column("genre", GenreType), column("song_count", Integer),
+                     column("total_seconds", Integer))
+stats_years = table("stats_years", column("year", Integer), column("album_count", Integer))
+
+STATS_VIEWS = (stats_genres.name, stats_years.name)
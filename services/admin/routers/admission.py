@@ -0,0 +1,50 @@
+import logging
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import PlainTextResponse
+
+from common.admission import admission_controller, AdmissionLimiter, RouteClassEnum
+from common.errors import AdmissionLimitTooHigh
+from models import User
+from services.admin.schemas.admission import (AdmissionLimiterSchema, AdmissionLimiterListResponseSchema,
+                                              AdmissionLimiterUpdateSchema)
+from services.users.modules.manager import current_superuser
+
+admission_router = APIRouter()
+
+logger = logging.getLogger(__name__)
+
+
+def limiter_schema(route_class: RouteClassEnum, limiter: AdmissionLimiter) -> AdmissionLimiterSchema:
+    return AdmissionLimiterSchema(route_class=route_class, limit=limiter.limit, queue_size=limiter.queue_size,
+                                  queue_timeout=limiter.queue_timeout, active=limiter.active, queued=limiter.queued,
+                                  admitted=limiter.admitted, rejected=limiter.rejected, timed_out=limiter.timed_out)
+
+
+@admission_router.get('/metrics', response_class=PlainTextResponse)
+async def get_metrics() -> str:
+    """Returns the admission control metrics in the Prometheus text format."""
+    return admission_controller.render_metrics()
+
+
+@admission_router.get('/admin/admission', response_model=AdmissionLimiterListResponseSchema)
+async def get_admission_limits(user: User = Depends(current_superuser)) -> AdmissionLimiterListResponseSchema:
+    """Returns the limits and the current load of every route class."""
+    return AdmissionLimiterListResponseSchema(items=[limiter_schema(route_class, limiter)
+                                                     for route_class, limiter in admission_controller.limiters.items()])
+
+
+@admission_router.patch('/admin/admission/{route_class}', response_model=AdmissionLimiterSchema)
+async def update_admission_limits(route_class: RouteClassEnum, data: AdmissionLimiterUpdateSchema,
+                                  user: User = Depends(current_superuser)) -> AdmissionLimiterSchema:
+    """Changes the limits of the route class, the change applies to the waiting requests immediately.
+    The limits of all route classes together have to fit in the database pool."""
+    limiter = admission_controller.limiters[route_class]
+    try:
+        if data.limit is not None:
+            admission_controller.check_limit(route_class, data.limit)
+        limiter.configure(**data.model_dump(exclude_unset=True))
+        logger.info(f"User {user.email} has changed the admission limits of {route_class.value} requests.")
+        return limiter_schema(route_class, limiter)
+    except AdmissionLimitTooHigh as e:
+        logger.warning(f"Admission limit of {route_class.value} requests exceeding the database pool was rejected.")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
@@ -0,0 +1,26 @@
+import logging
+from fastapi import APIRouter, Depends, Query
+
+from dependecies.session import AsyncSessionDep
+from models import User
+from services.albums.query_builder.reconcile import AlbumDurationReconcileQueryBuilder
+from services.albums.schemas.reconcile import AlbumDurationReconcileResponseSchema
+from services.users.modules.manager import current_superuser
+
+reconcile_router = APIRouter()
+
+logger = logging.getLogger(__name__)
+
+
+@reconcile_router.post('/admin/reconcile/album_durations', response_model=AlbumDurationReconcileResponseSchema)
+async def reconcile_album_durations(session: AsyncSessionDep, dry_run: bool = True, after: int = Query(0, ge=0),
+                                    chunk_size: int = Query(10000, ge=1, le=100000),
+                                    limit: int = Query(1000, ge=0, le=10000),
+                                    user: User = Depends(current_superuser)) -> AlbumDurationReconcileResponseSchema:
+    """Reports the albums of one chunk of album ids above after whose total_duration differs from the sum of
+    their songs and, with dry_run=false, fixes them. Each call stays well within the deadline of writes, the
+    next chunk is requested with after set to the returned next_after until it is null."""
+    report = await AlbumDurationReconcileQueryBuilder.reconcile(session, chunk_size, dry_run, limit, after, chunks=1)
+    logger.info(f"User {user.email} has reconciled the album durations after {after} ({report.drifted} drifted, "
+                f"dry run: {dry_run}).")
+    return report
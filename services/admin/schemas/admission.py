@@ -0,0 +1,26 @@
+from sqlmodel import SQLModel, Field
+from typing import Optional, List
+
+from common.admission import RouteClassEnum
+
+
+class AdmissionLimiterSchema(SQLModel):
+    route_class: RouteClassEnum
+    limit: int
+    queue_size: int
+    queue_timeout: float
+    active: int
+    queued: int
+    admitted: int
+    rejected: int
+    timed_out: int
+
+
+class AdmissionLimiterListResponseSchema(SQLModel):
+    items: List[AdmissionLimiterSchema]
+
+
+class AdmissionLimiterUpdateSchema(SQLModel):
+    limit: Optional[int] = Field(default=None, ge=1)
+    queue_size: Optional[int] = Field(default=None, ge=0)
+    queue_timeout: Optional[float] = Field(default=None, ge=0)
@@ -1,26 +1,38 @@
-from typing import List
-from sqlmodel import select, delete
+from typing import List, Optional
+from sqlmodel import select, delete, update
 from sqlalchemy.orm import selectinload
-from sqlalchemy import Select, String, cast
+from sqlalchemy import Select
+from sqlalchemy.exc import IntegrityError
 
 from dependecies.session import AsyncSessionDep
 from common.pagination import PaginationParams
-from common.errors import EmptyQueryResult
+from common.errors import EmptyQueryResult, BulkFilterRequired, is_unique_violation, is_foreign_key_violation
+from common.upsert import dialect_insert
+from common.catalog_changes import record_upserts, record_deletes, row_values
+from common.sorting import apply_sorting
+from common.totals import TotalParams, TotalSchema, count_total
+from common.facets import FacetParams, FacetsSchema, count_facets
 from models import Album, Song
+from models.albums import ALBUM_NATURAL_KEY
+from models.songs import SONG_NATURAL_KEY
 from services.albums.errors import AlbumWithNameAlreadyExists, AlbumNotFound, AlbumMustContainSongs
-from services.songs.errors import InvalidSongDuration
+from services.songs.errors import InvalidSongDuration, SongWithNameAlreadyExists
+from services.performers.errors import PerformerNotFound
 from services.albums.schemas.album import AlbumCreateSchema, AlbumUpdateSchema, AlbumFullUpdateSchema
-from services.albums.schemas.filters import AlbumFilter
-from common.duration_calc import calculate_album_duration, parse_song_length
+from services.albums.schemas.filters import AlbumFilter, AlbumSorting, AlbumSortEnum, AlbumFacetEnum
+from services.albums.query_builder.totals import AlbumTotalsQueryBuilder
+from services.performers.query_builder.performer import PerformerQueryBuilder
+from common.duration_calc import calculate_album_duration, parse_song_length, song_length_seconds
 
 
 class AlbumQueryBuilder:
     @staticmethod
     async def get_albums(session: AsyncSessionDep, pagination_params: PaginationParams,
-                         filters: AlbumFilter) -> List[Album]:
+                         filters: AlbumFilter, sorting: Optional[AlbumSorting] = None) -> List[Album]:
         query_offset, query_limit = (pagination_params.page - 1) * pagination_params.size, pagination_params.size
         select_query = (await AlbumQueryBuilder.apply_filters(select(Album).options(selectinload(Album.songs))
                                                               .offset(query_offset).limit(query_limit), filters))
+        select_query = await AlbumQueryBuilder.apply_sorting(select_query, sorting or AlbumSorting())
         result = await session.execute(select_query)
         albums = list(result.scalars())
         if not albums:
@@ -31,12 +43,50 @@ class AlbumQueryBuilder:
     async def apply_filters(select_query: Select, filters: AlbumFilter) -> Select:
         if filters and filters.title:
             select_query = select_query.where(Album.title.ilike(f'%{filters.title}%'))
-        if filters and filters.year:
-            select_query = select_query.where(cast(Album.year, String).ilike(f'%{filters.year}%'))
+        if filters and filters.year is not None:
+            select_query = select_query.where(Album.year == filters.year)
+        if filters and filters.year_from is not None:
+            select_query = select_query.where(Album.year >= filters.year_from)
+        if filters and filters.year_to is not None:
+            select_query = select_query.where(Album.year <= filters.year_to)
         if filters and filters.performer_id:
             select_query = select_query.where(Album.performer_id == filters.performer_id)
         return select_query
 
+    @staticmethod
+    async def get_facets(session: AsyncSessionDep, filters: AlbumFilter,
+                         facets: FacetParams) -> Optional[FacetsSchema]:
+        """Counts all albums matching the filters per value of each requested facet, None if none is requested."""
+        facet_columns = {
+            AlbumFacetEnum.year: Album.__table__.c.year,
+            AlbumFacetEnum.performer_id: Album.__table__.c.performer_id,
+        }
+        fields = facets.fields(AlbumFacetEnum)
+        if not fields:
+            return None
+        filtered_query = await AlbumQueryBuilder.apply_filters(select(Album), filters)
+        return await count_facets(session, Album.__table__, filtered_query.whereclause,
+                                  {field.value: facet_columns[field] for field in fields}, facets.facets_mode)
+
+    @staticmethod
+    async def get_total(session: AsyncSessionDep, filters: AlbumFilter,
+                        totals: TotalParams) -> Optional[TotalSchema]:
+        """Counts (or estimates) all albums matching the filters, None if the total is not requested."""
+        if totals.total is None:
+            return None
+        filtered_query = await AlbumQueryBuilder.apply_filters(select(Album), filters)
+        return await count_total(session, Album.__table__, filtered_query.whereclause, totals.total)
+
+    @staticmethod
+    async def apply_sorting(select_query: Select, sorting: AlbumSorting) -> Select:
+        sort_columns = {
+            AlbumSortEnum.id: Album.id,
+            AlbumSortEnum.title: Album.title,
+            AlbumSortEnum.year: Album.year,
+            AlbumSortEnum.duration: song_length_seconds(Album.total_duration),
+        }
+        return apply_sorting(select_query, sort_columns[sorting.sort], sorting.order, Album.id)
+
     @staticmethod
     async def validate_album_songs_duration(data: AlbumCreateSchema):
         for song_data in data.songs:
@@ -54,11 +104,6 @@ class AlbumQueryBuilder:
         if not data.songs:
             raise AlbumMustContainSongs
 
-        query = select(Album).where(Album.title == data.title)
-        result = await session.execute(query)
-        if result.scalar():
-            raise AlbumWithNameAlreadyExists
-
         album = Album(**data.model_dump(exclude={'songs', 'total_duration'}),
                       total_duration="0:00")
 
@@ -72,10 +117,64 @@ class AlbumQueryBuilder:
         album.songs = songs
 
         session.add(album)
-        await session.commit()
+        try:
+            await session.flush()
+            record_upserts(session, Album, [row_values(album)])
+            record_upserts(session, Song, [row_values(song) for song in songs])
+            await PerformerQueryBuilder.update_catalog_counters(session, [album.performer_id])
+            await session.commit()
+        except IntegrityError as e:
+            await session.rollback()
+            if is_unique_violation(e, 'uq_albums_natural_key'):
+                raise AlbumWithNameAlreadyExists
+            if is_unique_violation(e, 'uq_songs_natural_key'):
+                raise SongWithNameAlreadyExists
+            if is_foreign_key_violation(e):
+                raise PerformerNotFound
+            raise
         await session.refresh(album, attribute_names=['songs'])
         return album
 
+    @staticmethod
+    async def upsert_album(session: AsyncSessionDep, data: AlbumCreateSchema) -> Album:
+        """Creates the album, or updates the album of the same performer with the same title.
+        Its songs are upserted by title as well, songs missing from the data are kept."""
+        await AlbumQueryBuilder.validate_album_songs_duration(data)
+
+        if not data.songs:
+            raise AlbumMustContainSongs
+        # The same natural key twice in one INSERT ... ON CONFLICT cannot be updated by the statement
+        if len({song_data.title for song_data in data.songs}) < len(data.songs):
+            raise SongWithNameAlreadyExists
+
+        try:
+            album_values = data.model_dump(exclude={'songs', 'total_duration'})
+            album_query = dialect_insert(session, Album).values(**album_values)
+            album_query = album_query.on_conflict_do_update(index_elements=ALBUM_NATURAL_KEY,
+                                                            set_={'year': album_query.excluded.year})
+            album_id = (await session.execute(album_query.returning(Album.id))).scalar_one()
+            record_upserts(session, Album, [{'id': album_id, **album_values}])
+
+            songs_values = {song_data.title: {**song_data.model_dump(exclude={'performer_id', 'album_id'}),
+                                              'performer_id': data.performer_id, 'album_id': album_id}
+                            for song_data in data.songs}
+            songs_query = dialect_insert(session, Song).values(list(songs_values.values()))
+            songs_query = songs_query.on_conflict_do_update(index_elements=SONG_NATURAL_KEY,
+                                                            set_={'duration': songs_query.excluded.duration,
+                                                                  'genre': songs_query.excluded.genre})
+            result = await session.execute(songs_query.returning(Song.id, Song.title))
+            record_upserts(session, Song, [{'id': song_id, **songs_values[title]} for song_id, title in result.all()])
+
+            await AlbumTotalsQueryBuilder.update_total_durations(session, [album_id])
+            await PerformerQueryBuilder.update_catalog_counters(session, [data.performer_id])
+            await session.commit()
+        except IntegrityError as e:
+            await session.rollback()
+            if is_foreign_key_violation(e):
+                raise PerformerNotFound
+            raise
+        return await AlbumQueryBuilder.get_album_by_id(session, album_id)
+
     @staticmethod
     async def get_album_by_id(session: AsyncSessionDep, album_id: int):
         query = select(Album).where(Album.id == album_id).options(selectinload(Album.songs))
@@ -87,26 +186,75 @@ class AlbumQueryBuilder:
 
     @staticmethod
     async def delete_album_by_id(session: AsyncSessionDep, album_id: int) -> None:
-        await AlbumQueryBuilder.get_album_by_id(session, album_id)
+        # Songs of the album are removed by the ON DELETE CASCADE of songs.album_id, also those of other performers
+        performer_ids = await PerformerQueryBuilder.get_song_performer_ids(session, Song.album_id == album_id)
+        query = (delete(Album).where(Album.id == album_id).returning(Album.performer_id)
+                 .execution_options(synchronize_session=False))
+        result = await session.execute(query)
+        deleted = result.first()
+        if deleted is None:
+            raise AlbumNotFound
+        record_deletes(session, Album, [album_id])
+        await PerformerQueryBuilder.update_catalog_counters(session, {deleted.performer_id, *performer_ids})
+        await session.commit()
 
-        query = delete(Album).where(Album.id == album_id)
-        await session.execute(query)
+    @staticmethod
+    async def delete_albums(session: AsyncSessionDep, filters: AlbumFilter) -> int:
+        """Deletes all albums matching the filters, together with their songs, and returns their number."""
+        query = await AlbumQueryBuilder.apply_filters(delete(Album), filters)
+        if query.whereclause is None:
+            raise BulkFilterRequired
+        album_ids = (await AlbumQueryBuilder.apply_filters(select(Album.id), filters)).scalar_subquery()
+        performer_ids = await PerformerQueryBuilder.get_song_performer_ids(session, Song.album_id.in_(album_ids))
+        result = await session.execute(query.returning(Album.id, Album.performer_id)
+                                       .execution_options(synchronize_session=False))
+        deleted = result.all()
+        record_deletes(session, Album, [album.id for album in deleted])
+        await PerformerQueryBuilder.update_catalog_counters(session, {*performer_ids,
+                                                                      *(album.performer_id for album in deleted)})
         await session.commit()
+        return len(deleted)
 
     @staticmethod
     async def update_album_by_id(session: AsyncSessionDep, album_id: int, data: AlbumUpdateSchema) -> Album:
         album = await AlbumQueryBuilder.get_album_by_id(session, album_id)
-        for key, value in data.model_dump(exclude_unset=True).items():
+        old_performer_id = album.performer_id
+        values = data.model_dump(exclude_unset=True)
+        for key, value in values.items():
             setattr(album, key, value)
-        await session.commit()
+        try:
+            record_upserts(session, Album, [{'id': album_id, **values}])
+            await session.flush()
+            await PerformerQueryBuilder.update_catalog_counters(session, [old_performer_id, album.performer_id])
+            await session.commit()
+        except IntegrityError as e:
+            await session.rollback()
+            if is_unique_violation(e, 'uq_albums_natural_key'):
+                raise AlbumWithNameAlreadyExists
+            if is_foreign_key_violation(e):
+                raise PerformerNotFound
+            raise
         await session.refresh(album)
         return album
 
     @staticmethod
     async def replace_album_by_id(session: AsyncSessionDep, album_id: int, data: AlbumFullUpdateSchema) -> Album:
         album = await AlbumQueryBuilder.get_album_by_id(session, album_id)
-        for key, value in data.model_dump(exclude={'songs'}).items():
+        old_performer_id = album.performer_id
+        values = data.model_dump(exclude={'songs'})
+        for key, value in values.items():
             setattr(album, key, value)
-        await session.commit()
+        try:
+            record_upserts(session, Album, [{'id': album_id, **values}])
+            await session.flush()
+            await PerformerQueryBuilder.update_catalog_counters(session, [old_performer_id, album.performer_id])
+            await session.commit()
+        except IntegrityError as e:
+            await session.rollback()
+            if is_unique_violation(e, 'uq_albums_natural_key'):
+                raise AlbumWithNameAlreadyExists
+            if is_foreign_key_violation(e):
+                raise PerformerNotFound
+            raise
         await session.refresh(album)
         return album
@@ -0,0 +1,60 @@
+from typing import List, Optional
+
+from sqlalchemy import func
+from sqlmodel import select
+
+from dependecies.session import AsyncSessionDep
+from common.catalog_changes import record_upserts
+from common.duration_calc import song_length_seconds, song_length_text
+from models import Album, Song
+from services.albums.query_builder.totals import AlbumTotalsQueryBuilder
+from services.albums.schemas.reconcile import AlbumDurationDriftSchema, AlbumDurationReconcileResponseSchema
+
+
+class AlbumDurationReconcileQueryBuilder:
+    @staticmethod
+    async def find_drift(session: AsyncSessionDep, after: Optional[int], last: int) -> List[AlbumDurationDriftSchema]:
+        """Returns the albums with an id in (after, last] whose total_duration differs from the sum of the
+        durations of their songs, computed with one grouped query."""
+        expected = song_length_text(func.coalesce(func.sum(song_length_seconds(Song.duration)), 0))
+        query = (select(Album.id, Album.performer_id, Album.total_duration, expected.label('expected'))
+                 .outerjoin(Song, Song.album_id == Album.id).where(Album.id <= last)
+                 .group_by(Album.id, Album.performer_id, Album.total_duration)
+                 .having(Album.total_duration.is_distinct_from(expected)).order_by(Album.id))
+        if after is not None:
+            query = query.where(Album.id > after)
+        result = await session.execute(query)
+        return [AlbumDurationDriftSchema(album_id=row.id, performer_id=row.performer_id,
+                                         total_duration=row.total_duration, expected_duration=row.expected)
+                for row in result]
+
+    @staticmethod
+    async def reconcile_range(session: AsyncSessionDep, after: Optional[int], last: int,
+                              dry_run: bool = False) -> List[AlbumDurationDriftSchema]:
+        """Finds the drifted albums of the id range and, unless dry_run is set, recomputes their total_duration
+        with a single UPDATE in the current transaction. Returns the drift found."""
+        drift = await AlbumDurationReconcileQueryBuilder.find_drift(session, after, last)
+        if drift and not dry_run:
+            await AlbumTotalsQueryBuilder.update_total_durations(session, [album.album_id for album in drift])
+            record_upserts(session, Album, [{'id': album.album_id, 'total_duration': album.expected_duration}
+                                            for album in drift])
+        return drift
+
+    @staticmethod
+    async def reconcile(session: AsyncSessionDep, chunk_size: int, dry_run: bool = False, limit: int = 1000,
+                        after: int = 0, chunks: Optional[int] = None) -> AlbumDurationReconcileResponseSchema:
+        """Reconciles the total_duration of the albums with an id above after, one transaction per chunk_size
+        album ids, and reports up to limit of the drifted albums. With chunks set, stops after that many chunks
+        and returns the id to continue after in next_after, which is None once the last album is reached."""
+        max_id = await session.scalar(select(func.max(Album.id))) or 0
+        report = AlbumDurationReconcileResponseSchema(dry_run=dry_run, drifted=0, items=[], next_after=None)
+        for done, chunk_after in enumerate(range(after, max_id, chunk_size)):
+            if chunks is not None and done == chunks:
+                report.next_after = chunk_after
+                break
+            drift = await AlbumDurationReconcileQueryBuilder.reconcile_range(session, chunk_after,
+                                                                             chunk_after + chunk_size, dry_run)
+            await session.commit()
+            report.drifted += len(drift)
+            report.items += drift[:limit - len(report.items)]
+        return report
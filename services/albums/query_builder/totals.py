@@ -0,0 +1,26 @@
+from typing import Iterable, Optional
+from sqlmodel import select, update
+from sqlalchemy import func
+from dependecies.session import AsyncSessionDep
+from common.duration_calc import song_length_seconds, song_length_text
+from models import Album, Song
+from services.performers.query_builder.document import PerformerDocumentQueryBuilder
+
+
+class AlbumTotalsQueryBuilder:
+    @staticmethod
+    async def update_total_durations(session: AsyncSessionDep, album_ids: Iterable[Optional[int]]) -> None:
+        """Recomputes total_duration of the given albums from their songs with a single UPDATE. The albums are
+        locked first, so that the sums are computed after the concurrent writers of their songs have committed
+        (under READ COMMITTED the subqueries of an UPDATE that waited for a row lock still see its old snapshot).
+        The documents of the performers owning the albums are cleared, as they embed the songs of their albums."""
+        album_ids = {album_id for album_id in album_ids if album_id is not None}
+        if not album_ids:
+            return
+        result = await session.execute(select(Album.performer_id).where(Album.id.in_(album_ids)).order_by(Album.id)
+                                       .with_for_update())
+        await PerformerDocumentQueryBuilder.invalidate(session, set(result.scalars()))
+        total_seconds = (select(func.coalesce(func.sum(song_length_seconds(Song.duration)), 0))
+                         .where(Song.album_id == Album.id).scalar_subquery())
+        await session.execute(update(Album).where(Album.id.in_(album_ids))
+                              .values(total_duration=song_length_text(total_seconds)))
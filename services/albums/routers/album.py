@@ -1,17 +1,22 @@
 import logging
-from typing import Annotated
+from typing import Annotated, List
 from fastapi import APIRouter, HTTPException, status, Depends
 
 from dependecies.session import AsyncSessionDep
 from common.pagination import PaginationParams
-from common.errors import EmptyQueryResult
-from models import User
+from common.errors import EmptyQueryResult, BulkFilterRequired, InvalidFacet
+from common.facets import FacetParams
+from common.totals import TotalParams
+from common.bulk import BulkDeleteResponseSchema
+from models import User, Album
 from services.albums.errors import AlbumWithNameAlreadyExists, AlbumNotFound, AlbumMustContainSongs
-from services.songs.errors import InvalidSongDuration
+from services.songs.errors import InvalidSongDuration, SongWithNameAlreadyExists
+from services.performers.errors import PerformerNotFound
 from services.albums.query_builder.album import AlbumQueryBuilder
+from services.memory_catalog.modules.catalog import catalog_read
 from services.albums.schemas.album import (AlbumListResponseSchema, AlbumResponseSchema, AlbumCreateSchema,
                                            AlbumUpdateSchema, AlbumFullUpdateSchema)
-from services.albums.schemas.filters import AlbumFilter
+from services.albums.schemas.filters import AlbumFilter, AlbumSorting
 from services.users.modules.manager import current_active_user
 
 
@@ -20,20 +25,40 @@ albums_router = APIRouter()
 logger = logging.getLogger(__name__)
 
 
+def serialize_albums(albums: List[Album]) -> List[AlbumResponseSchema]:
+    return [AlbumResponseSchema.model_validate(album) for album in albums]
+
+
 @albums_router.get('/albums', response_model=AlbumListResponseSchema)
 async def get_albums(session: AsyncSessionDep,
                      pagination_params: Annotated[PaginationParams,
                                                   Depends(PaginationParams)],
                      filters: AlbumFilter = Depends(),
+                     sorting: AlbumSorting = Depends(),
+                     facets: FacetParams = Depends(),
+                     totals: TotalParams = Depends(),
                      user: User = Depends(current_active_user)) -> AlbumListResponseSchema:
-    """Returns a paginated list of albums, including their songs, specified by the pagination params."""
+    """Returns a paginated list of albums, including their songs, specified by the pagination params, with the
+    counts of all matching albums per value of the requested facets and the total number of matching albums
+    if requested. An empty page is returned as 204, unless the total is requested."""
     try:
-        albums = await AlbumQueryBuilder.get_albums(session, pagination_params, filters)
+        try:
+            albums = await catalog_read(session, AlbumQueryBuilder.get_albums, pagination_params, filters, sorting,
+                                        serialize=serialize_albums)
+        except EmptyQueryResult:
+            if totals.total is None:
+                raise
+            albums = []
+        facet_counts = await catalog_read(session, AlbumQueryBuilder.get_facets, filters, facets)
+        total = await catalog_read(session, AlbumQueryBuilder.get_total, filters, totals)
         logger.info(f"User {user.email} has sent a request")
-        return AlbumListResponseSchema(items=albums)
+        return AlbumListResponseSchema(items=albums, facets=facet_counts, total=total)
     except EmptyQueryResult:
         logger.warning("No albums found.")
         raise HTTPException(status_code=status.HTTP_204_NO_CONTENT)
+    except InvalidFacet as e:
+        logger.warning("Invalid facets requested.")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
 @albums_router.post('/albums', status_code=status.HTTP_201_CREATED)
@@ -49,12 +74,41 @@ async def create_album(session: AsyncSessionDep, data: AlbumCreateSchema,
     except AlbumWithNameAlreadyExists as e:
         logger.warning("Album with given name already exists.")
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except SongWithNameAlreadyExists as e:
+        logger.warning("Album contains songs with the same name.")
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
     except AlbumMustContainSongs as e:
         logger.warning("Album must contain songs, otherwise it cannot exist")
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except InvalidSongDuration as e:
         logger.warning("Invalid song duration occurred while creating the song.")
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except PerformerNotFound as e:
+        logger.warning("The performer of the album does not exist.")
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+
+
+@albums_router.put('/albums', response_model=AlbumResponseSchema)
+async def upsert_album(session: AsyncSessionDep, data: AlbumCreateSchema,
+                       user: User = Depends(current_active_user)) -> AlbumResponseSchema:
+    """Creates an album, or updates the album of the same performer with the same title, and returns it.
+    The songs of the album are upserted by their title."""
+    try:
+        album = await AlbumQueryBuilder.upsert_album(session, data)
+        logger.info(f"User {user.email} has successfully upserted an album")
+        return album
+    except SongWithNameAlreadyExists as e:
+        logger.warning("Album contains songs with the same name.")
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except AlbumMustContainSongs as e:
+        logger.warning("Album must contain songs, otherwise it cannot exist")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except InvalidSongDuration as e:
+        logger.warning("Invalid song duration occurred while upserting the album.")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except PerformerNotFound as e:
+        logger.warning("The performer of the album does not exist.")
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
 
 
 @albums_router.get('/album_by_id/{id}', response_model=AlbumResponseSchema)
@@ -62,7 +116,8 @@ async def get_album_by_id(session: AsyncSessionDep, album_id: int,
                           user: User = Depends(current_active_user)) -> AlbumResponseSchema:
     """Returns the album schema using the ID provided by the user."""
     try:
-        album = await AlbumQueryBuilder.get_album_by_id(session, album_id)
+        album = await catalog_read(session, AlbumQueryBuilder.get_album_by_id, album_id,
+                                   serialize=AlbumResponseSchema.model_validate)
         logger.info(f"User {user.email} has sent a request")
         return album
     except AlbumNotFound as e:
@@ -82,6 +137,20 @@ async def delete_album_by_id(session: AsyncSessionDep, album_id: int,
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
 
 
+@albums_router.delete('/albums', response_model=BulkDeleteResponseSchema)
+async def delete_albums(session: AsyncSessionDep, filters: AlbumFilter = Depends(),
+                        user: User = Depends(current_active_user)) -> BulkDeleteResponseSchema:
+    """Deletes all albums matching the filters, together with their songs, and returns the number of deleted
+    albums."""
+    try:
+        deleted = await AlbumQueryBuilder.delete_albums(session, filters)
+        logger.info(f"User {user.email} has successfully deleted {deleted} albums.")
+        return BulkDeleteResponseSchema(deleted=deleted)
+    except BulkFilterRequired as e:
+        logger.warning("Bulk deletion of albums without filters was rejected.")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
 @albums_router.patch('/albums/{id}', response_model=AlbumResponseSchema)
 async def update_album_by_id(session: AsyncSessionDep, album_id: int,
                              data: AlbumUpdateSchema, user: User = Depends(current_active_user)) -> AlbumResponseSchema:
@@ -94,6 +163,12 @@ async def update_album_by_id(session: AsyncSessionDep, album_id: int,
     except AlbumNotFound as e:
         logger.error(f"Song with an id {album_id} not found.")
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except AlbumWithNameAlreadyExists as e:
+        logger.warning("Album with given name already exists.")
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except PerformerNotFound as e:
+        logger.warning("The performer of the album does not exist.")
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
 
 
 @albums_router.put('/albums/{id}', response_model=AlbumResponseSchema)
@@ -108,3 +183,9 @@ async def replace_album_by_id(session: AsyncSessionDep, album_id: int,
     except AlbumNotFound as e:
         logger.error(f"Song with an id {album_id} not found.")
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except AlbumWithNameAlreadyExists as e:
+        logger.warning("Album with given name already exists.")
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except PerformerNotFound as e:
+        logger.warning("The performer of the album does not exist.")
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
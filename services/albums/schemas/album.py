@@ -3,6 +3,9 @@ from typing import Optional, List
 from services import SongResponseSchema, SongCreateSchema, SongUpdateSchema
 from pydantic import ConfigDict
 
+from common.facets import FacetsSchema
+from common.totals import TotalSchema
+
 
 class AlbumResponseSchema(SQLModel):
     id: Optional[int] = None
@@ -17,6 +20,8 @@ class AlbumResponseSchema(SQLModel):
 
 class AlbumListResponseSchema(SQLModel):
     items: List[AlbumResponseSchema]
+    facets: Optional[FacetsSchema] = None
+    total: Optional[TotalSchema] = None
 
 
 class AlbumCreateSchema(SQLModel):
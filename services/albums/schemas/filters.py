@@ -1,9 +1,30 @@
 from sqlmodel import SQLModel, Field
 from typing import Optional
+from enum import Enum
+
+from common.sorting import SortOrderEnum
 
 
 class AlbumFilter(SQLModel):
     title: Optional[str] = Field(default=None, max_length=64)
-    year: Optional[int] = Field(default=None, max_length=4)
+    year: Optional[int] = Field(default=None, ge=0)
+    year_from: Optional[int] = Field(default=None, ge=0)  # Filters albums released in or after the given year
+    year_to: Optional[int] = Field(default=None, ge=0)  # Filters albums released in or before the given year
     performer_id: Optional[int] = Field(default=None)
 
+
+class AlbumSortEnum(str, Enum):
+    id = 'id'
+    title = 'title'
+    year = 'year'
+    duration = 'duration'
+
+
+class AlbumFacetEnum(str, Enum):
+    year = 'year'
+    performer_id = 'performer_id'
+
+
+class AlbumSorting(SQLModel):
+    sort: AlbumSortEnum = AlbumSortEnum.id
+    order: SortOrderEnum = SortOrderEnum.asc
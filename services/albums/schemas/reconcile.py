@@ -0,0 +1,16 @@
+from sqlmodel import SQLModel
+from typing import List, Optional
+
+
+class AlbumDurationDriftSchema(SQLModel):
+    album_id: int
+    performer_id: Optional[int]
+    total_duration: Optional[str]  # Stored value
+    expected_duration: str  # Sum of the durations of the songs
+
+
+class AlbumDurationReconcileResponseSchema(SQLModel):
+    dry_run: bool
+    drifted: int  # Number of albums whose total_duration differed from their songs
+    items: List[AlbumDurationDriftSchema]  # At most limit of them, in album id order
+    next_after: Optional[int]  # Album id to continue after, None once every album has been reconciled
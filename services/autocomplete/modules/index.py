@@ -0,0 +1,225 @@
+import asyncio
+import heapq
+import logging
+from bisect import bisect_left
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import select
+
+from common.catalog_changes import CatalogChange, ChangeActionEnum, add_commit_listener
+from db.database import Database
+from models import Performer, Album, Song
+
+logger = logging.getLogger(__name__)
+
+PERFORMERS, ALBUMS, SONGS = Performer.__tablename__, Album.__tablename__, Song.__tablename__
+# Performers are ranked before albums, albums before songs
+ENTITY_RANKS = {PERFORMERS: 0, ALBUMS: 1, SONGS: 2}
+# Number of prefix matches looked at to rank the results, bounds the cost of very short queries
+MAX_CANDIDATES = 256
+# Largest number of keys a commit adds and removes one by one, larger commits merge them in one pass over the array
+SMALL_KEY_BATCH = 32
+
+EntryKey = Tuple[str, int]
+IndexKey = Tuple[str, str, int]
+
+
+@dataclass
+class IndexEntry:
+    label: str
+    keys: Tuple[str, ...]
+    performer_id: Optional[int] = None
+    album_id: Optional[int] = None
+
+
+def normalize(text: str) -> str:
+    return ' '.join(text.casefold().split())
+
+
+def entry_keys(label: str) -> Tuple[str, ...]:
+    """Returns the label starting at each of its words, so that 'The Wall' is found by 'the' and by 'wall'."""
+    words = normalize(label).split()
+    return tuple(dict.fromkeys(' '.join(words[i:]) for i in range(len(words))))
+
+
+class PrefixIndex:
+    """Sorted array of (key, entity, id) searched with bisect, with the entries stored by (entity, id).
+    Not thread safe, it is only used from the event loop."""
+
+    def __init__(self) -> None:
+        self._keys: List[IndexKey] = []
+        self._entries: Dict[EntryKey, IndexEntry] = {}
+        self._children: Dict[EntryKey, Set[EntryKey]] = {}
+        # Net keys added to and removed from the sorted array by the changes being applied, merged at the end
+        self._added: Set[IndexKey] = set()
+        self._removed: Set[IndexKey] = set()
+        # Changes committed while the rows of a rebuild are being loaded, applied again to the rebuilt index
+        self._pending: Optional[List[CatalogChange]] = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def start_rebuild(self) -> None:
+        self._pending = []
+
+    def abort_rebuild(self) -> None:
+        self._pending = None
+
+    def rebuild(self, performers: List[Tuple], albums: List[Tuple], songs: List[Tuple]) -> None:
+        """Replaces the content of the index with (id, pseudonym), (id, title, performer_id) and
+        (id, title, performer_id, album_id) rows, then applies the changes committed since start_rebuild again."""
+        pending, self._pending = self._pending or [], None
+        entries = {}
+        entries.update(((PERFORMERS, row[0]), IndexEntry(label=row[1], keys=entry_keys(row[1])))
+                       for row in performers)
+        entries.update(((ALBUMS, row[0]), IndexEntry(label=row[1], keys=entry_keys(row[1]), performer_id=row[2]))
+                       for row in albums)
+        entries.update(((SONGS, row[0]), IndexEntry(label=row[1], keys=entry_keys(row[1]), performer_id=row[2],
+                                                    album_id=row[3]))
+                       for row in songs)
+        self._entries = entries
+        self._keys = sorted((key, entity, entity_id) for (entity, entity_id), entry in entries.items()
+                            for key in entry.keys)
+        self._children = {}
+        for entry_key, entry in entries.items():
+            self._link(entry_key, entry)
+        self.apply_changes(pending)
+
+    def search(self, query: str, limit: int) -> List[Tuple[str, int, IndexEntry]]:
+        """Returns up to limit (entity, id, entry) matches of the query, ranked by exact matches first, then
+        matches at the start of the label, the entity and the label length."""
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        candidates = {}
+        position = bisect_left(self._keys, (prefix,))
+        for key, entity, entity_id in self._keys[position:position + MAX_CANDIDATES]:
+            if not key.startswith(prefix):
+                break
+            entry = self._entries[(entity, entity_id)]
+            rank = (key != prefix, key != entry.keys[0], ENTITY_RANKS[entity], len(entry.label), entry.label)
+            best = candidates.get((entity, entity_id))
+            if best is None or rank < best[0]:
+                candidates[(entity, entity_id)] = (rank, entry)
+        best = heapq.nsmallest(limit, candidates.items(), key=lambda item: item[1][0])
+        return [(entity, entity_id, entry) for (entity, entity_id), (rank, entry) in best]
+
+    def apply_changes(self, changes: List[CatalogChange]) -> None:
+        """Applies the changes of a commit. The keys they add and remove are merged into the sorted array once,
+        instead of moving its tail for every key."""
+        if self._pending is not None:
+            self._pending.extend(changes)
+        for change in changes:
+            if change.action == ChangeActionEnum.delete:
+                self._remove((change.entity, change.id), cascade=True)
+            elif change.entity in ENTITY_RANKS:
+                self._put(change)
+        self._merge_keys()
+
+    def _merge_keys(self) -> None:
+        added, removed = sorted(self._added), self._removed
+        self._added, self._removed = set(), set()
+        if len(added) + len(removed) <= SMALL_KEY_BATCH:
+            # A few keys are cheaper to move into place one by one than to copy the whole array for
+            for key in removed:
+                position = bisect_left(self._keys, key)
+                if position < len(self._keys) and self._keys[position] == key:
+                    del self._keys[position]
+            for key in added:
+                self._keys.insert(bisect_left(self._keys, key), key)
+            return
+        keys = [key for key in self._keys if key not in removed] if removed else self._keys
+        self._keys = list(heapq.merge(keys, added))
+
+    def _add_key(self, key: IndexKey) -> None:
+        if key in self._removed:
+            self._removed.discard(key)
+        else:
+            self._added.add(key)
+
+    def _remove_key(self, key: IndexKey) -> None:
+        if key in self._added:
+            self._added.discard(key)
+        else:
+            self._removed.add(key)
+
+    def _put(self, change: CatalogChange) -> None:
+        entry_key = (change.entity, change.id)
+        label = change.values.get('pseudonym' if change.entity == PERFORMERS else 'title')
+        entry = self._entries.get(entry_key)
+        if entry is None:
+            if label is None:
+                # A partial update of a row the index has not seen yet, the next rebuild picks it up
+                return
+            entry = IndexEntry(label=label, keys=())
+        else:
+            self._remove(entry_key, cascade=False)
+        if label is not None:
+            entry.label, entry.keys = label, entry_keys(label)
+        entry.performer_id = change.values.get('performer_id', entry.performer_id)
+        entry.album_id = change.values.get('album_id', entry.album_id)
+
+        self._entries[entry_key] = entry
+        for key in entry.keys:
+            self._add_key((key, change.entity, change.id))
+        self._link(entry_key, entry)
+
+    def _remove(self, entry_key: EntryKey, cascade: bool) -> None:
+        entry = self._entries.pop(entry_key, None)
+        if entry is None:
+            return
+        for key in entry.keys:
+            self._remove_key((key, *entry_key))
+        for parent_key in self._parents(entry):
+            self._children.get(parent_key, set()).discard(entry_key)
+        children = self._children.pop(entry_key, set())
+        if cascade:
+            # Mirrors the ON DELETE CASCADE of albums.performer_id, songs.performer_id and songs.album_id
+            for child_key in children:
+                self._remove(child_key, cascade=True)
+        else:
+            self._children[entry_key] = children
+
+    def _link(self, entry_key: EntryKey, entry: IndexEntry) -> None:
+        for parent_key in self._parents(entry):
+            self._children.setdefault(parent_key, set()).add(entry_key)
+
+    @staticmethod
+    def _parents(entry: IndexEntry) -> List[EntryKey]:
+        parents = []
+        if entry.performer_id is not None:
+            parents.append((PERFORMERS, entry.performer_id))
+        if entry.album_id is not None:
+            parents.append((ALBUMS, entry.album_id))
+        return parents
+
+
+autocomplete_index = PrefixIndex()
+add_commit_listener(autocomplete_index.apply_changes)
+
+
+async def build_autocomplete_index(database: Database) -> None:
+    """Loads the labels of the whole catalog into the index, with the changes committed during the load."""
+    autocomplete_index.start_rebuild()
+    try:
+        async with database.session_maker() as session:
+            performers = (await session.execute(select(Performer.id, Performer.pseudonym))).all()
+            albums = (await session.execute(select(Album.id, Album.title, Album.performer_id))).all()
+            songs = (await session.execute(select(Song.id, Song.title, Song.performer_id, Song.album_id))).all()
+    except Exception:
+        autocomplete_index.abort_rebuild()
+        raise
+    autocomplete_index.rebuild(performers, albums, songs)
+    logger.info(f"Autocomplete index built with {len(autocomplete_index)} entries.")
+
+
+async def run_autocomplete_rebuilder(database: Database, interval: int) -> None:
+    """Builds the index, then rebuilds it every interval seconds until cancelled, which picks up the changes
+    committed by other processes of the application."""
+    while True:
+        try:
+            await build_autocomplete_index(database)
+        except Exception:
+            logger.exception("Failed to build the autocomplete index.")
+        await asyncio.sleep(interval)
@@ -0,0 +1,24 @@
+import logging
+from fastapi import APIRouter, Depends, Query
+
+from models import User
+from services.autocomplete.modules.index import autocomplete_index
+from services.autocomplete.schemas.autocomplete import AutocompleteListResponseSchema, AutocompleteItemSchema
+from services.users.modules.manager import current_active_user
+
+autocomplete_router = APIRouter()
+
+logger = logging.getLogger(__name__)
+
+
+@autocomplete_router.get('/autocomplete', response_model=AutocompleteListResponseSchema)
+async def autocomplete(q: str = Query(min_length=1, max_length=64), limit: int = Query(default=10, ge=1, le=50),
+                       user: User = Depends(current_active_user)) -> AutocompleteListResponseSchema:
+    """Returns the performers, albums and songs whose name has a word starting with the query, best matches
+    first."""
+    matches = autocomplete_index.search(q, limit)
+    return AutocompleteListResponseSchema(items=[
+        AutocompleteItemSchema(entity=entity, id=entity_id, label=entry.label, performer_id=entry.performer_id,
+                               album_id=entry.album_id)
+        for entity, entity_id, entry in matches
+    ])
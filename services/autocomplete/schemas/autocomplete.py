@@ -0,0 +1,21 @@
+from sqlmodel import SQLModel
+from typing import Optional, List
+from enum import Enum
+
+
+class AutocompleteEntityEnum(str, Enum):
+    performers = 'performers'
+    albums = 'albums'
+    songs = 'songs'
+
+
+class AutocompleteItemSchema(SQLModel):
+    entity: AutocompleteEntityEnum
+    id: int
+    label: str
+    performer_id: Optional[int] = None
+    album_id: Optional[int] = None
+
+
+class AutocompleteListResponseSchema(SQLModel):
+    items: List[AutocompleteItemSchema]
@@ -0,0 +1,8 @@
+class ChangesExpired(Exception):
+    def __init__(self, since: int, horizon: int):
+        self.since = since
+        self.horizon = horizon
+
+    def __str__(self):
+        return (f"Changes after revision {self.since} are no longer kept (the oldest kept change follows revision "
+                f"{self.horizon}), resynchronize from a full export.")
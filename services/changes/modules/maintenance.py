@@ -0,0 +1,27 @@
+import asyncio
+import logging
+from datetime import timedelta
+
+from common.settings import ChangeLogSettings
+from db.database import Database
+from services.changes.query_builder.changes import ChangesQueryBuilder
+
+logger = logging.getLogger(__name__)
+
+
+async def maintain_change_log(database: Database, settings: ChangeLogSettings) -> None:
+    """Compacts the change log, then removes the changes past the retention."""
+    async with database.session_maker() as session:
+        compacted = await ChangesQueryBuilder.compact(session, timedelta(seconds=settings.compact_after))
+        expired = await ChangesQueryBuilder.apply_retention(session, timedelta(days=settings.retention_days))
+    logger.info(f"Change log maintained: {compacted} superseded and {expired} expired changes removed.")
+
+
+async def run_change_log_maintenance(database: Database, settings: ChangeLogSettings) -> None:
+    """Maintains the change log every maintenance_interval seconds until cancelled."""
+    while True:
+        await asyncio.sleep(settings.maintenance_interval)
+        try:
+            await maintain_change_log(database, settings)
+        except Exception:
+            logger.exception("Failed to maintain the change log.")
@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from sqlalchemy import func, select, delete
+from sqlalchemy.orm import aliased
+
+from dependecies.session import AsyncSessionDep
+from models import ChangeLog, ChangeLogHorizon
+from services.changes.errors import ChangesExpired
+
+
+class ChangesQueryBuilder:
+    @staticmethod
+    async def get_horizon(session: AsyncSessionDep) -> int:
+        horizon = await session.scalar(select(ChangeLogHorizon.revision).where(ChangeLogHorizon.id == 1))
+        return horizon or 0
+
+    @staticmethod
+    async def get_latest_revision(session: AsyncSessionDep) -> int:
+        return await session.scalar(select(func.coalesce(func.max(ChangeLog.revision), 0)))
+
+    @staticmethod
+    async def check_since(session: AsyncSessionDep, since: int) -> None:
+        """Raises ChangesExpired when changes following the revision were already removed by the retention."""
+        horizon = await ChangesQueryBuilder.get_horizon(session)
+        if since < horizon:
+            raise ChangesExpired(since=since, horizon=horizon)
+
+    @staticmethod
+    async def get_changes(session: AsyncSessionDep, since: int, limit: int) -> List[ChangeLog]:
+        """Returns up to limit + 1 changes with a revision greater than since, in revision order (keyset
+        pagination on the primary key), the extra one tells whether there are more."""
+        await ChangesQueryBuilder.check_since(session, since)
+        query = (select(ChangeLog).where(ChangeLog.revision > since)
+                 .order_by(ChangeLog.revision).limit(limit + 1))
+        result = await session.execute(query)
+        return list(result.scalars())
+
+    @staticmethod
+    async def compact(session: AsyncSessionDep, older_than: timedelta) -> int:
+        """Removes the changes older than the given age that are superseded by a later change of the same row,
+        a consumer reading past them still sees the last change of every row. Returns the number removed."""
+        later = aliased(ChangeLog)
+        superseded = (select(later.revision).where(later.entity == ChangeLog.entity,
+                                                   later.entity_id == ChangeLog.entity_id,
+                                                   later.revision > ChangeLog.revision).exists())
+        cutoff = datetime.now(timezone.utc) - older_than
+        result = await session.execute(delete(ChangeLog).where(ChangeLog.changed_at < cutoff, superseded)
+                                       .execution_options(synchronize_session=False))
+        await session.commit()
+        return result.rowcount
+
+    @staticmethod
+    async def apply_retention(session: AsyncSessionDep, retention: timedelta) -> int:
+        """Removes the changes older than the retention and moves the horizon past them. Returns the number
+        removed."""
+        cutoff = datetime.now(timezone.utc) - retention
+        expired: Optional[int] = await session.scalar(select(func.max(ChangeLog.revision))
+                                                      .where(ChangeLog.changed_at < cutoff))
+        if expired is None:
+            return 0
+        result = await session.execute(delete(ChangeLog).where(ChangeLog.revision <= expired)
+                                       .execution_options(synchronize_session=False))
+        horizon = await session.scalar(select(ChangeLogHorizon).where(ChangeLogHorizon.id == 1))
+        if horizon is None:
+            session.add(ChangeLogHorizon(id=1, revision=expired))
+        else:
+            horizon.revision = expired
+        await session.commit()
+        return result.rowcount
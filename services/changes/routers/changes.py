@@ -0,0 +1,32 @@
+import logging
+from typing import Annotated
+from fastapi import APIRouter, HTTPException, status, Depends
+
+from dependecies.session import AsyncSessionDep
+from models import User
+from services.changes.errors import ChangesExpired
+from services.changes.query_builder.changes import ChangesQueryBuilder
+from services.changes.schemas.changes import ChangeListResponseSchema, ChangesParams
+from services.users.modules.manager import current_active_user
+
+changes_router = APIRouter()
+
+logger = logging.getLogger(__name__)
+
+
+@changes_router.get('/changes', response_model=ChangeListResponseSchema)
+async def get_changes(session: AsyncSessionDep, params: Annotated[ChangesParams, Depends(ChangesParams)],
+                      user: User = Depends(current_active_user)) -> ChangeListResponseSchema:
+    """Returns the performers, albums and songs written after the since revision, in revision order. Deleting
+    a performer or an album also deletes its albums and songs, only the deleted performer or album is listed.
+    Answers 410 when the changes after since were removed by the retention."""
+    try:
+        changes = await ChangesQueryBuilder.get_changes(session, params.since, params.limit)
+    except ChangesExpired as e:
+        logger.warning(f"Changes after revision {params.since} requested past the retention.")
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail=str(e))
+    has_more = len(changes) > params.limit
+    changes = changes[:params.limit]
+    logger.info(f"User {user.email} has sent a request.")
+    return ChangeListResponseSchema(items=changes, next_since=changes[-1].revision if changes else params.since,
+                                    has_more=has_more)
@@ -0,0 +1,28 @@
+from datetime import datetime
+from sqlmodel import SQLModel, Field
+from typing import List
+from pydantic import ConfigDict
+
+from common.catalog_changes import ChangeActionEnum
+
+
+class ChangeSchema(SQLModel):
+    revision: int
+    entity: str
+    entity_id: int
+    action: ChangeActionEnum
+    changed_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ChangeListResponseSchema(SQLModel):
+    items: List[ChangeSchema]
+    # Revision to pass as since for the next page, the same as since when there were no newer changes
+    next_since: int
+    has_more: bool
+
+
+class ChangesParams(SQLModel):
+    since: int = Field(0, ge=0)  # Returns the changes with a greater revision
+    limit: int = Field(100, ge=1, le=10000)
@@ -0,0 +1,106 @@
+"""Fan-out of the catalog changes to the Server-Sent Events subscribers.
+
+A single poller per process reads the new entries of the change log (written by every process of the
+application) and hands them to the subscribers whose filters match, so the clients no longer poll the catalog
+themselves. Every subscriber has a bounded buffer; a subscriber too slow to drain it is evicted and its stream
+ends, the client reconnects with the Last-Event-ID header and the missed events are replayed from the log.
+"""
+import asyncio
+import logging
+from typing import List, Optional, Set
+
+from common.settings import EventsSettings
+from db.database import Database
+from services.events.query_builder.events import EventsQueryBuilder
+from services.events.schemas.events import CatalogEventSchema, EventEntityEnum
+
+logger = logging.getLogger(__name__)
+
+
+class Subscriber:
+    def __init__(self, since: int, buffer_size: int, entities: Optional[Set[EventEntityEnum]] = None,
+                 performer_ids: Optional[Set[int]] = None):
+        self.since = since  # Last revision sent (or skipped by the filters) to the subscriber
+        self.entities = entities
+        self.performer_ids = performer_ids
+        self.queue: asyncio.Queue[CatalogEventSchema] = asyncio.Queue(maxsize=buffer_size)
+        self.evicted = asyncio.Event()
+
+    def matches(self, event: CatalogEventSchema) -> bool:
+        if self.entities and event.entity not in self.entities:
+            return False
+        # Deleted albums and songs have no known performer, they are sent to every performer filter
+        return not self.performer_ids or event.performer_id is None or event.performer_id in self.performer_ids
+
+
+class EventBroker:
+    def __init__(self, settings: Optional[EventsSettings] = None):
+        self.subscribers: Set[Subscriber] = set()
+        self.evictions = 0
+        self.configure(settings or EventsSettings())
+
+    def configure(self, settings: EventsSettings) -> None:
+        self.settings = settings
+
+    def subscribe(self, since: int, entities: Optional[Set[EventEntityEnum]] = None,
+                  performer_ids: Optional[Set[int]] = None) -> Optional[Subscriber]:
+        """Subscribes to the events following the since revision. Returns None when the number of subscribers
+        has reached the limit."""
+        if len(self.subscribers) >= self.settings.max_subscribers:
+            return None
+        subscriber = Subscriber(since, self.settings.buffer_size, entities, performer_ids)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        self.subscribers.discard(subscriber)
+
+    def publish(self, events: List[CatalogEventSchema], after: int) -> None:
+        """Hands the events following the after revision to the subscribers. A subscriber that joined with an
+        older revision while they were read is skipped, the next poll reads its missing events first."""
+        for subscriber in list(self.subscribers):
+            if subscriber.since < after:
+                continue
+            for event in events:
+                if event.revision <= subscriber.since:
+                    continue
+                if subscriber.matches(event):
+                    try:
+                        subscriber.queue.put_nowait(event)
+                    except asyncio.QueueFull:
+                        self.evict(subscriber)
+                        break
+                subscriber.since = event.revision
+
+    def evict(self, subscriber: Subscriber) -> None:
+        self.unsubscribe(subscriber)
+        subscriber.evicted.set()
+        self.evictions += 1
+        logger.warning("Slow events subscriber evicted.")
+
+    async def poll(self, database: Database) -> bool:
+        """Publishes the change log entries following the oldest revision of the subscribers, returns whether
+        there were any. Nothing is read while nobody is subscribed. Reading from the subscribers instead of from
+        the last poll also delivers the entries committed between the replay of a new subscriber and its joining."""
+        if not self.subscribers:
+            return False
+        after = min(subscriber.since for subscriber in self.subscribers)
+        async with database.session_maker() as session:
+            events = await EventsQueryBuilder.get_events(session, after, self.settings.batch_size)
+        if events:
+            self.publish(events, after)
+        return bool(events)
+
+
+event_broker = EventBroker()
+
+
+async def run_event_poller(database: Database) -> None:
+    """Polls the change log every poll_interval seconds until cancelled, without waiting while it is behind."""
+    while True:
+        try:
+            if await event_broker.poll(database):
+                continue
+        except Exception:
+            logger.exception("Failed to poll the change log for events.")
+        await asyncio.sleep(event_broker.settings.poll_interval)
@@ -0,0 +1,32 @@
+from typing import List
+
+from sqlalchemy import select
+
+from dependecies.session import AsyncSessionDep
+from models import ChangeLog, Album, Song, Performer
+from services.events.schemas.events import CatalogEventSchema
+
+PERFORMERS, ALBUMS, SONGS = Performer.__tablename__, Album.__tablename__, Song.__tablename__
+
+
+class EventsQueryBuilder:
+    @staticmethod
+    async def get_events(session: AsyncSessionDep, since: int, limit: int) -> List[CatalogEventSchema]:
+        """Returns up to limit change log entries after the since revision as events, with the performer of
+        every changed row that still exists."""
+        result = await session.execute(select(ChangeLog.revision, ChangeLog.entity, ChangeLog.entity_id,
+                                              ChangeLog.action)
+                                       .where(ChangeLog.revision > since).order_by(ChangeLog.revision).limit(limit))
+        changes = result.all()
+
+        performer_ids = {}
+        for model in (Album, Song):
+            ids = {change.entity_id for change in changes if change.entity == model.__tablename__}
+            if ids:
+                rows = await session.execute(select(model.id, model.performer_id).where(model.id.in_(ids)))
+                performer_ids.update(((model.__tablename__, row.id), row.performer_id) for row in rows)
+        return [CatalogEventSchema(revision=change.revision, entity=change.entity, entity_id=change.entity_id,
+                                   action=change.action,
+                                   performer_id=(change.entity_id if change.entity == PERFORMERS
+                                                 else performer_ids.get((change.entity, change.entity_id))))
+                for change in changes]
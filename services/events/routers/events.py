@@ -0,0 +1,108 @@
+import asyncio
+import logging
+from typing import AsyncIterator, List, Optional
+from fastapi import APIRouter, HTTPException, status, Depends, Header, Query, Request
+from fastapi.responses import StreamingResponse
+
+from dependecies.session import AsyncSessionDep
+from models import User
+from services.changes.errors import ChangesExpired
+from services.changes.query_builder.changes import ChangesQueryBuilder
+from services.events.modules.broker import event_broker, Subscriber
+from services.events.query_builder.events import EventsQueryBuilder
+from services.events.schemas.events import CatalogEventSchema, EventEntityEnum
+from services.users.modules.manager import current_active_user
+
+events_router = APIRouter()
+
+logger = logging.getLogger(__name__)
+
+STREAM_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+
+
+def format_event(event: CatalogEventSchema) -> bytes:
+    return (f"id: {event.revision}\nevent: {event.entity.value}.{event.action.value}\n"
+            f"data: {event.model_dump_json()}\n\n").encode()
+
+
+async def event_stream(request: Request, subscriber: Subscriber, replayed: List[CatalogEventSchema],
+                       complete: bool) -> AsyncIterator[bytes]:
+    """Sends the replayed events and then the live ones until the client disconnects or the subscriber is
+    evicted. When the replay was cut at the replay limit the stream ends after it, so that the client resumes
+    from the last replayed event."""
+    try:
+        yield b'retry: 1000\n\n'
+        for event in replayed:
+            if subscriber.matches(event):
+                yield format_event(event)
+        if not complete:
+            return
+        evicted = asyncio.ensure_future(subscriber.evicted.wait())
+        try:
+            while not subscriber.evicted.is_set():
+                # Buffered events are sent even after an eviction, the client resumes after the last of them
+                while not subscriber.queue.empty():
+                    yield format_event(subscriber.queue.get_nowait())
+                received = asyncio.ensure_future(subscriber.queue.get())
+                done, _ = await asyncio.wait((received, evicted), timeout=event_broker.settings.keepalive_interval,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if received in done:
+                    yield format_event(received.result())
+                else:
+                    received.cancel()
+                    if await request.is_disconnected():
+                        return
+                    if not done:
+                        yield b': keepalive\n\n'
+            while not subscriber.queue.empty():
+                yield format_event(subscriber.queue.get_nowait())
+        finally:
+            evicted.cancel()
+    finally:
+        event_broker.unsubscribe(subscriber)
+
+
+@events_router.get('/events')
+async def get_events(request: Request, session: AsyncSessionDep,
+                     entities: Optional[List[EventEntityEnum]] = Query(None),
+                     performer_id: Optional[List[int]] = Query(None),
+                     last_event_id: Optional[int] = Query(None, ge=0),
+                     last_event_id_header: Optional[int] = Header(None, alias='Last-Event-ID', ge=0),
+                     user: User = Depends(current_active_user)) -> StreamingResponse:
+    """Streams the changes of the performers, albums and songs as server-sent events, optionally only the
+    given entities and the rows of the given performers. Every event has the change log revision as its id,
+    a reconnecting client gets the events it missed after the Last-Event-ID header (or the last_event_id
+    parameter). Answers 410 when those events were removed by the retention."""
+    since = last_event_id_header if last_event_id_header is not None else last_event_id
+    replayed: List[CatalogEventSchema] = []
+    complete = True
+    try:
+        if since is None:
+            since = await ChangesQueryBuilder.get_latest_revision(session)
+        else:
+            await ChangesQueryBuilder.check_since(session, since)
+            limit = event_broker.settings.replay_limit
+            replayed = await EventsQueryBuilder.get_events(session, since, limit + 1)
+            complete = len(replayed) <= limit
+            replayed = replayed[:limit]
+            if replayed:
+                since = replayed[-1].revision
+    except ChangesExpired as e:
+        logger.warning(f"Events after revision {since} requested past the retention.")
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail=str(e))
+    finally:
+        # The stream outlives the request, the connection is not held while the client is idle
+        await session.close()
+
+    filters = set(entities or ()), set(performer_id or ())
+    if complete:
+        subscriber = event_broker.subscribe(since, *filters)
+    else:
+        # Only filters the replayed events, the stream ends after them
+        subscriber = Subscriber(since, 1, *filters)
+    if subscriber is None:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            detail="Too many event streams, retry later.", headers={'Retry-After': '5'})
+    logger.info(f"User {user.email} has sent a request.")
+    return StreamingResponse(event_stream(request, subscriber, replayed, complete),
+                             media_type='text/event-stream', headers=STREAM_HEADERS)
@@ -0,0 +1,20 @@
+from enum import Enum
+from sqlmodel import SQLModel
+from typing import Optional
+
+from common.catalog_changes import ChangeActionEnum
+
+
+class EventEntityEnum(str, Enum):
+    performers = 'performers'
+    albums = 'albums'
+    songs = 'songs'
+
+
+class CatalogEventSchema(SQLModel):
+    revision: int
+    entity: EventEntityEnum
+    entity_id: int
+    action: ChangeActionEnum
+    # Performer of the changed row, None for the deleted albums and songs (their row is gone)
+    performer_id: Optional[int] = None
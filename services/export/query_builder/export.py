@@ -0,0 +1,58 @@
+from typing import AsyncIterator, Dict, List, Optional
+from sqlalchemy import Select, or_, select
+
+from dependecies.session import AsyncSessionDep
+from models import Performer, Album, Song, ChangeLog
+from services.export.schemas.export import ExportEntityEnum
+
+performers, albums, songs = Performer.__table__, Album.__table__, Song.__table__
+
+
+def flat_songs_select() -> Select:
+    return (select(songs.c.id, songs.c.title, songs.c.duration, songs.c.genre,
+                   songs.c.album_id, albums.c.title.label('album_title'), albums.c.year.label('album_year'),
+                   songs.c.performer_id, performers.c.pseudonym.label('performer_pseudonym'),
+                   performers.c.performance_type.label('performer_performance_type'))
+            .select_from(songs)
+            .outerjoin(albums, songs.c.album_id == albums.c.id)
+            .outerjoin(performers, songs.c.performer_id == performers.c.id))
+
+
+# Tables whose change log entries select the exported rows with since, with the column of the rows holding the ids
+# of the entries. A flat row changes with its song, its album and its performer
+EXPORT_CHANGES = {
+    ExportEntityEnum.performers: [(performers, performers.c.id)],
+    ExportEntityEnum.albums: [(albums, albums.c.id)],
+    ExportEntityEnum.songs: [(songs, songs.c.id)],
+    ExportEntityEnum.flat: [(songs, songs.c.id), (albums, songs.c.album_id), (performers, songs.c.performer_id)],
+}
+
+# Core selects of the plain columns, so that the rows are streamed without the ORM identity map and eager loads
+EXPORT_SELECTS = {
+    ExportEntityEnum.performers: lambda: select(performers),
+    ExportEntityEnum.albums: lambda: select(albums),
+    ExportEntityEnum.songs: lambda: select(songs),
+    ExportEntityEnum.flat: flat_songs_select,
+}
+
+
+class ExportQueryBuilder:
+    @staticmethod
+    def get_columns(entity: ExportEntityEnum) -> List[str]:
+        return list(EXPORT_SELECTS[entity]().selected_columns.keys())
+
+    @staticmethod
+    async def stream_rows(session: AsyncSessionDep, entity: ExportEntityEnum, batch_size: int,
+                          since: Optional[int] = None) -> AsyncIterator[List[Dict]]:
+        """Yields the rows of the entity ordered by id in batches, only the rows changed after the since revision
+        of the change log when it is given. The rows are fetched through a server-side cursor (on PostgreSQL)
+        batch_size at a time, so the memory used does not depend on the catalog size."""
+        query = EXPORT_SELECTS[entity]()
+        if since is not None:
+            query = query.where(or_(*(column.in_(select(ChangeLog.entity_id).where(ChangeLog.entity == table.name,
+                                                                                   ChangeLog.revision > since))
+                                      for table, column in EXPORT_CHANGES[entity])))
+        query = query.order_by(query.selected_columns.id).execution_options(yield_per=batch_size)
+        result = await session.stream(query)
+        async for partition in result.mappings().partitions():
+            yield partition
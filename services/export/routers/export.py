@@ -0,0 +1,72 @@
+import csv
+import io
+import json
+import logging
+from typing import AsyncIterator, Optional
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request
+from fastapi.responses import StreamingResponse
+
+from common.compression import response_compressor, compress_stream
+from common.settings import Settings
+from dependecies.session import AsyncSessionDep
+from models import User
+from services.changes.errors import ChangesExpired
+from services.changes.query_builder.changes import ChangesQueryBuilder
+from services.export.query_builder.export import ExportQueryBuilder
+from services.export.schemas.export import ExportEntityEnum, ExportFormatEnum
+from services.users.modules.manager import current_active_user
+
+export_router = APIRouter()
+
+logger = logging.getLogger(__name__)
+
+EXPORT_BATCH_SIZE = Settings().export.batch_size
+MEDIA_TYPES = {ExportFormatEnum.ndjson: 'application/x-ndjson', ExportFormatEnum.csv: 'text/csv'}
+
+
+async def ndjson_chunks(session: AsyncSessionDep, entity: ExportEntityEnum,
+                        since: Optional[int]) -> AsyncIterator[bytes]:
+    async for rows in ExportQueryBuilder.stream_rows(session, entity, EXPORT_BATCH_SIZE, since):
+        yield ''.join(json.dumps(dict(row), separators=(',', ':')) + '\n' for row in rows).encode()
+
+
+async def csv_chunks(session: AsyncSessionDep, entity: ExportEntityEnum,
+                     since: Optional[int]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(ExportQueryBuilder.get_columns(entity))
+    async for rows in ExportQueryBuilder.stream_rows(session, entity, EXPORT_BATCH_SIZE, since):
+        writer.writerows(row.values() for row in rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+@export_router.get('/export/{entity}', response_class=StreamingResponse)
+async def export_catalog(session: AsyncSessionDep, request: Request, entity: ExportEntityEnum,
+                         export_format: ExportFormatEnum = Query(default=ExportFormatEnum.ndjson, alias='format'),
+                         since: Optional[int] = Query(default=None, ge=0),
+                         user: User = Depends(current_active_user)) -> StreamingResponse:
+    """Streams all rows of the entity (or the songs joined with their album and performer, for flat) as NDJSON
+    or CSV, compressed when the client accepts it. With since, only the rows changed after that revision of
+    the change log are exported, flat rows also when their album or performer changed. The X-Change-Revision
+    header holds the revision to follow /changes from."""
+    try:
+        if since is not None:
+            await ChangesQueryBuilder.check_since(session, since)
+        revision = await ChangesQueryBuilder.get_latest_revision(session)
+    except ChangesExpired as e:
+        logger.warning(f"Export of the changes after revision {since} requested past the retention.")
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail=str(e))
+    chunks = ndjson_chunks if export_format == ExportFormatEnum.ndjson else csv_chunks
+    body = chunks(session, entity, since)
+    headers = {'Content-Disposition': f'attachment; filename="{entity.value}.{export_format.value}"',
+               'Vary': 'Accept-Encoding', 'X-Change-Revision': str(revision)}
+    encoding = response_compressor.choose_encoding(request.headers)
+    if encoding is not None:
+        body = compress_stream(body, encoding, response_compressor.settings)
+        headers['Content-Encoding'] = encoding.value
+    logger.info(f"User {user.email} has started an export of {entity.value}.")
+    return StreamingResponse(body, media_type=MEDIA_TYPES[export_format], headers=headers)
@@ -0,0 +1,13 @@
+from enum import Enum
+
+
+class ExportEntityEnum(str, Enum):
+    performers = 'performers'
+    albums = 'albums'
+    songs = 'songs'
+    flat = 'flat'  # Songs joined with their album and performer
+
+
+class ExportFormatEnum(str, Enum):
+    ndjson = 'ndjson'
+    csv = 'csv'
@@ -0,0 +1,544 @@
+"""Read-only in-memory copy of the catalog, for the nodes serving mostly reads.
+
+With BE_MEMORY_CATALOG__ENABLED the whole catalog is loaded at startup into compact records (with __slots__)
+kept in arrays with id -> index maps, the performers and albums hold the adjacency lists of their albums and
+songs. The read methods of the query builders are answered from it with no database round trip, with the
+same filters, sorting and pagination as the SQL queries. Writes still go to the database; the changes committed
+by this process are applied right away through the catalog change listeners and the whole catalog is reloaded
+every refresh_interval seconds, which picks up the writes of other processes.
+"""
+import asyncio
+import heapq
+import logging
+from bisect import insort
+from collections import Counter
+from operator import attrgetter
+from typing import Any, Callable, Dict, Generic, Iterator, List, Optional, Tuple, TypeVar
+
+from sqlalchemy import select
+
+from common.catalog_changes import CatalogChange, ChangeActionEnum, add_commit_listener
+from common.duration_calc import parse_song_length, convert_song_length
+from common.errors import EmptyQueryResult
+from common.facets import FacetParams, FacetsSchema, FacetCountSchema
+from common.pagination import PaginationParams
+from common.singleflight import coalesced_read
+from common.sorting import SortOrderEnum
+from common.totals import TotalParams, TotalSchema
+from db.database import Database
+from dependecies.session import AsyncSessionDep
+from models import Performer, Album, Song
+from models.genres import GENRE_CODES, GENRE_NAMES
+from services.performers.errors import PerformerNotFound
+from services.performers.query_builder.performer import PerformerQueryBuilder
+from services.performers.schemas.filters import PerformerFilter, PerformerSorting, PerformerSortEnum
+from services.albums.errors import AlbumNotFound
+from services.albums.query_builder.album import AlbumQueryBuilder
+from services.albums.schemas.filters import AlbumFilter, AlbumSorting, AlbumSortEnum, AlbumFacetEnum
+from services.songs.errors import SongNotFound
+from services.songs.query_builder.song import SongQueryBuilder
+from services.songs.schemas.filters import SongFilter, SongSorting, SongSortEnum, SongFacetEnum
+
+logger = logging.getLogger(__name__)
+
+PERFORMERS, ALBUMS, SONGS = Performer.__tablename__, Album.__tablename__, Song.__tablename__
+
+by_id = attrgetter('id')
+
+
+def duration_seconds(duration: Optional[str]) -> Optional[int]:
+    try:
+        return parse_song_length(duration) if duration else None
+    except ValueError:
+        return None
+
+
+class SongRecord:
+    __slots__ = ('id', 'title', 'duration', 'genre', 'performer_id', 'album_id', 'seconds')
+
+    def __init__(self, id: int, title: str, duration: str, genre: str, performer_id: Optional[int],
+                 album_id: Optional[int]):
+        self.id, self.title, self.genre = id, title, genre
+        self.performer_id, self.album_id = performer_id, album_id
+        self.set_duration(duration)
+
+    def set_duration(self, duration: str) -> None:
+        self.duration = duration
+        self.seconds = duration_seconds(duration) or 0
+
+
+class AlbumRecord:
+    __slots__ = ('id', 'title', 'year', 'total_duration', 'performer_id', 'songs')
+
+    def __init__(self, id: int, title: str, year: Optional[int], total_duration: Optional[str],
+                 performer_id: Optional[int]):
+        self.id, self.title, self.year = id, title, year
+        self.total_duration, self.performer_id = total_duration, performer_id
+        self.songs: List[SongRecord] = []
+
+    def update_total_duration(self) -> None:
+        """Mirrors AlbumTotalsQueryBuilder.update_total_durations, which is not recorded as a catalog change."""
+        self.total_duration = convert_song_length(sum(song.seconds for song in self.songs))
+
+
+class PerformerRecord:
+    __slots__ = ('id', 'pseudonym', 'biography', 'performance_type', 'photo_url', 'albums', 'songs')
+
+    def __init__(self, id: int, pseudonym: str, biography: Optional[str], performance_type: str,
+                 photo_url: Optional[str]):
+        self.id, self.pseudonym, self.biography = id, pseudonym, biography
+        self.performance_type, self.photo_url = performance_type, photo_url
+        self.albums: List[AlbumRecord] = []
+        self.songs: List[SongRecord] = []  # Every song with the performer_id, singles and album songs
+
+    # The catalog counters are derived from the adjacency lists instead of being stored
+    @property
+    def singles(self) -> List[SongRecord]:
+        return [song for song in self.songs if song.album_id is None]
+
+    @property
+    def album_count(self) -> int:
+        return len(self.albums)
+
+    @property
+    def song_count(self) -> int:
+        return len(self.songs)
+
+    @property
+    def single_count(self) -> int:
+        return sum(1 for song in self.songs if song.album_id is None)
+
+    @property
+    def total_seconds(self) -> int:
+        return sum(song.seconds for song in self.songs)
+
+
+R = TypeVar('R')
+
+
+class RecordTable(Generic[R]):
+    """Records in an array with an id -> index map. Removed records leave a hole, the array is compacted once
+    half of it are holes."""
+    __slots__ = ('records', 'index', 'holes')
+
+    def __init__(self, records: Optional[List[R]] = None):
+        self.records: List[Optional[R]] = records or []
+        self.index: Dict[int, int] = {record.id: position for position, record in enumerate(self.records)}
+        self.holes = 0
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __iter__(self) -> Iterator[R]:
+        return (record for record in self.records if record is not None)
+
+    def get(self, record_id: Optional[int]) -> Optional[R]:
+        position = self.index.get(record_id)
+        return self.records[position] if position is not None else None
+
+    def add(self, record: R) -> None:
+        self.index[record.id] = len(self.records)
+        self.records.append(record)
+
+    def remove(self, record_id: int) -> Optional[R]:
+        position = self.index.pop(record_id, None)
+        if position is None:
+            return None
+        record, self.records[position] = self.records[position], None
+        self.holes += 1
+        if self.holes * 2 > len(self.records):
+            self.records = list(self)
+            self.index = {record.id: position for position, record in enumerate(self.records)}
+            self.holes = 0
+        return record
+
+
+def contains(value: Optional[str], text: str) -> bool:
+    """Counterpart of ilike('%text%')."""
+    return value is not None and text.casefold() in value.casefold()
+
+
+def in_range(value: Optional[int], exact: Optional[int], start: Optional[int], end: Optional[int]) -> bool:
+    if exact is None and start is None and end is None:
+        return True
+    if value is None:
+        return False
+    return ((exact is None or value == exact) and (start is None or value >= start)
+            and (end is None or value <= end))
+
+
+def page(records: List[R], pagination_params: PaginationParams, sort_key: Callable[[R], Any],
+         order: SortOrderEnum) -> List[R]:
+    """Returns one page of the records ordered by the sort key and the id, like apply_sorting. NULLs are ordered
+    last in ascending order and first in descending order, as on PostgreSQL."""
+    offset = max((pagination_params.page - 1) * pagination_params.size, 0)
+    count = offset + pagination_params.size
+
+    def key(record: R) -> Tuple:
+        value = sort_key(record)
+        return value is None, value if value is not None else 0, record.id
+
+    if order == SortOrderEnum.desc:
+        return heapq.nlargest(count, records, key=key)[offset:]
+    return heapq.nsmallest(count, records, key=key)[offset:]
+
+
+def facet_counts(records: List[R], fields: Dict[str, Callable[[R], Any]]) -> FacetsSchema:
+    """Counts the records per value of each field like count_facets: by the stored value (the genre code for
+    genres), the most frequent first and the ties in the order of the values."""
+    counts = {}
+    for name, value_of in fields.items():
+        counter = Counter(value_of(record) for record in records)
+        ordered = sorted(counter.items(), key=lambda item: (-item[1], item[0] is not None, item[0] or 0))
+        labels = GENRE_NAMES if name == SongFacetEnum.genre.value else {}
+        counts[name] = [FacetCountSchema(value=labels.get(value, value), count=count) for value, count in ordered]
+    return FacetsSchema(approximate=False, counts=counts)
+
+
+PERFORMER_SORT_KEYS = {
+    PerformerSortEnum.id: by_id,
+    PerformerSortEnum.pseudonym: attrgetter('pseudonym'),
+    PerformerSortEnum.performance_type: attrgetter('performance_type'),
+}
+ALBUM_SORT_KEYS = {
+    AlbumSortEnum.id: by_id,
+    AlbumSortEnum.title: attrgetter('title'),
+    AlbumSortEnum.year: attrgetter('year'),
+    AlbumSortEnum.duration: lambda album: duration_seconds(album.total_duration),
+}
+SONG_SORT_KEYS = {
+    SongSortEnum.id: by_id,
+    SongSortEnum.title: attrgetter('title'),
+    SongSortEnum.genre: attrgetter('genre'),  # By name, like the case() over the codes of the database
+    SongSortEnum.duration: attrgetter('seconds'),
+}
+ALBUM_FACETS = {AlbumFacetEnum.year: attrgetter('year'), AlbumFacetEnum.performer_id: attrgetter('performer_id')}
+SONG_FACETS = {SongFacetEnum.genre: lambda song: GENRE_CODES.get(song.genre),
+               SongFacetEnum.album_id: attrgetter('album_id'), SongFacetEnum.performer_id: attrgetter('performer_id')}
+
+
+class MemoryCatalog:
+    """Not thread safe, it is only used from the event loop."""
+
+    def __init__(self) -> None:
+        self.serving = False
+        self.performers: RecordTable[PerformerRecord] = RecordTable()
+        self.albums: RecordTable[AlbumRecord] = RecordTable()
+        self.songs: RecordTable[SongRecord] = RecordTable()
+        # Changes committed while the catalog is being reloaded, applied again to the reloaded catalog
+        self._pending: Optional[List[CatalogChange]] = None
+
+    @property
+    def reloading(self) -> bool:
+        return self._pending is not None
+
+    def start_reload(self) -> None:
+        self._pending = []
+
+    def finish_reload(self, performers: List[Tuple], albums: List[Tuple], songs: List[Tuple]) -> None:
+        """Replaces the content of the catalog with the rows of the three tables (in the column order of the
+        records), then applies the changes committed since start_reload again."""
+        pending, self._pending = self._pending or [], None
+        self.performers = RecordTable([PerformerRecord(*row) for row in performers])
+        self.albums = RecordTable([AlbumRecord(*row) for row in albums])
+        self.songs = RecordTable([SongRecord(*row) for row in songs])
+        for album in self.albums:
+            self._link_album(album)
+        for song in self.songs:
+            self._link_song(song, update_duration=False)
+        self.apply_changes(pending)
+        self.serving = True
+
+    def abort_reload(self) -> None:
+        self._pending = None
+
+    # Reads
+
+    def get_performers(self, pagination_params: PaginationParams, filters: PerformerFilter,
+                       sorting: Optional[PerformerSorting] = None) -> List[PerformerRecord]:
+        sorting = sorting or PerformerSorting()
+        performers = page(self.filter_performers(filters), pagination_params, PERFORMER_SORT_KEYS[sorting.sort],
+                          sorting.order)
+        if not performers:
+            raise EmptyQueryResult
+        return performers
+
+    def get_performer_by_id(self, performer_id: int) -> PerformerRecord:
+        performer = self.performers.get(performer_id)
+        if performer is None:
+            raise PerformerNotFound
+        return performer
+
+    def get_albums(self, pagination_params: PaginationParams, filters: AlbumFilter,
+                   sorting: Optional[AlbumSorting] = None) -> List[AlbumRecord]:
+        sorting = sorting or AlbumSorting()
+        albums = page(self.filter_albums(filters), pagination_params, ALBUM_SORT_KEYS[sorting.sort], sorting.order)
+        if not albums:
+            raise EmptyQueryResult
+        return albums
+
+    def get_album_by_id(self, album_id: int) -> AlbumRecord:
+        album = self.albums.get(album_id)
+        if album is None:
+            raise AlbumNotFound
+        return album
+
+    def get_songs(self, pagination_params: PaginationParams, filters: SongFilter,
+                  sorting: Optional[SongSorting] = None) -> List[SongRecord]:
+        sorting = sorting or SongSorting()
+        songs = page(self.filter_songs(filters), pagination_params, SONG_SORT_KEYS[sorting.sort], sorting.order)
+        if not songs:
+            raise EmptyQueryResult
+        return songs
+
+    def get_song_by_id(self, song_id: int) -> SongRecord:
+        song = self.songs.get(song_id)
+        if song is None:
+            raise SongNotFound
+        return song
+
+    def get_performer_total(self, filters: PerformerFilter, totals: TotalParams) -> Optional[TotalSchema]:
+        return TotalSchema(count=len(self.filter_performers(filters))) if totals.total is not None else None
+
+    def get_album_total(self, filters: AlbumFilter, totals: TotalParams) -> Optional[TotalSchema]:
+        return TotalSchema(count=len(self.filter_albums(filters))) if totals.total is not None else None
+
+    def get_song_total(self, filters: SongFilter, totals: TotalParams) -> Optional[TotalSchema]:
+        return TotalSchema(count=len(self.filter_songs(filters))) if totals.total is not None else None
+
+    def get_album_facets(self, filters: AlbumFilter, facets: FacetParams) -> Optional[FacetsSchema]:
+        fields = facets.fields(AlbumFacetEnum)
+        if not fields:
+            return None
+        return facet_counts(self.filter_albums(filters), {field.value: ALBUM_FACETS[field] for field in fields})
+
+    def get_song_facets(self, filters: SongFilter, facets: FacetParams) -> Optional[FacetsSchema]:
+        fields = facets.fields(SongFacetEnum)
+        if not fields:
+            return None
+        return facet_counts(self.filter_songs(filters), {field.value: SONG_FACETS[field] for field in fields})
+
+    def filter_performers(self, filters: PerformerFilter) -> List[PerformerRecord]:
+        performers = list(self.performers)
+        if filters and filters.pseudonym:
+            performers = [performer for performer in performers if contains(performer.pseudonym, filters.pseudonym)]
+        if filters and filters.performance_type:
+            performers = [performer for performer in performers
+                          if contains(performer.performance_type, filters.performance_type)]
+        if filters and any(year is not None for year in (filters.year, filters.year_from, filters.year_to)):
+            performers = [performer for performer in performers
+                          if any(in_range(album.year, filters.year, filters.year_from, filters.year_to)
+                                 for album in performer.albums)]
+        return performers
+
+    def filter_albums(self, filters: AlbumFilter) -> List[AlbumRecord]:
+        if filters and filters.performer_id:
+            performer = self.performers.get(filters.performer_id)
+            albums = list(performer.albums) if performer is not None else []
+        else:
+            albums = list(self.albums)
+        if filters and filters.title:
+            albums = [album for album in albums if contains(album.title, filters.title)]
+        if filters:
+            albums = [album for album in albums if in_range(album.year, filters.year, filters.year_from,
+                                                            filters.year_to)]
+        return albums
+
+    def filter_songs(self, filters: SongFilter) -> List[SongRecord]:
+        if filters.album_id is not None:
+            album = self.albums.get(filters.album_id)
+            songs = list(album.songs) if album is not None else []
+        elif filters.performer_id is not None:
+            performer = self.performers.get(filters.performer_id)
+            songs = list(performer.songs) if performer is not None else []
+        else:
+            songs = list(self.songs)
+        if filters.title is not None:
+            songs = [song for song in songs if contains(song.title, filters.title)]
+        if filters.genre is not None:
+            songs = [song for song in songs if song.genre == filters.genre.value]
+        if filters.performer_id is not None:
+            songs = [song for song in songs if song.performer_id == filters.performer_id]
+        if filters.album_id_is_null:
+            songs = [song for song in songs if song.album_id is None]
+        return songs
+
+    # Changes
+
+    def apply_changes(self, changes: List[CatalogChange]) -> None:
+        if self._pending is not None:
+            self._pending.extend(changes)
+        for change in changes:
+            if change.action == ChangeActionEnum.delete:
+                self._delete(change.entity, change.id)
+            elif change.entity == PERFORMERS:
+                self._put_performer(change)
+            elif change.entity == ALBUMS:
+                self._put_album(change)
+            elif change.entity == SONGS:
+                self._put_song(change)
+
+    def _put_performer(self, change: CatalogChange) -> None:
+        performer = self.performers.get(change.id)
+        if performer is None:
+            if 'pseudonym' not in change.values:
+                # A partial update of a row the catalog has not seen yet, the next reload picks it up
+                return
+            performer = PerformerRecord(change.id, change.values['pseudonym'], None, None, None)
+            self.performers.add(performer)
+        for name in ('pseudonym', 'biography', 'performance_type', 'photo_url'):
+            if name in change.values:
+                setattr(performer, name, change.values[name])
+
+    def _put_album(self, change: CatalogChange) -> None:
+        album = self.albums.get(change.id)
+        if album is None:
+            if 'title' not in change.values:
+                return
+            album = AlbumRecord(change.id, change.values['title'], None, None, None)
+            self.albums.add(album)
+        else:
+            self._unlink_album(album)
+        for name in ('title', 'year', 'total_duration', 'performer_id'):
+            if name in change.values:
+                setattr(album, name, change.values[name])
+        self._link_album(album)
+
+    def _put_song(self, change: CatalogChange) -> None:
+        song = self.songs.get(change.id)
+        if song is None:
+            if 'title' not in change.values or 'duration' not in change.values:
+                return
+            song = SongRecord(change.id, change.values['title'], change.values['duration'], None, None, None)
+            self.songs.add(song)
+        else:
+            self._unlink_song(song)
+        for name in ('title', 'genre', 'performer_id', 'album_id'):
+            if name in change.values:
+                setattr(song, name, getattr(change.values[name], 'value', change.values[name]))
+        if 'duration' in change.values:
+            song.set_duration(change.values['duration'])
+        self._link_song(song)
+
+    def _delete(self, entity: str, record_id: int, cascaded: bool = False) -> None:
+        # Mirrors the ON DELETE CASCADE of albums.performer_id, songs.performer_id and songs.album_id, the database
+        # recomputes the totals of the albums of other performers losing songs of a deleted performer as well
+        if entity == PERFORMERS:
+            performer = self.performers.remove(record_id)
+            if performer is not None:
+                for album in list(performer.albums):
+                    self._delete(ALBUMS, album.id, cascaded=True)
+                for song in list(performer.songs):
+                    self._delete(SONGS, song.id)
+        elif entity == ALBUMS:
+            album = self.albums.get(record_id)
+            if album is not None:
+                for song in list(album.songs):
+                    self._delete(SONGS, song.id, cascaded=True)
+                self._unlink_album(album)
+                self.albums.remove(record_id)
+        elif entity == SONGS:
+            song = self.songs.get(record_id)
+            if song is not None:
+                self._unlink_song(song, update_duration=not cascaded)
+                self.songs.remove(record_id)
+
+    def _link_album(self, album: AlbumRecord) -> None:
+        performer = self.performers.get(album.performer_id)
+        if performer is not None:
+            insort(performer.albums, album, key=by_id)
+
+    def _unlink_album(self, album: AlbumRecord) -> None:
+        performer = self.performers.get(album.performer_id)
+        if performer is not None and album in performer.albums:
+            performer.albums.remove(album)
+
+    def _link_song(self, song: SongRecord, update_duration: bool = True) -> None:
+        album = self.albums.get(song.album_id)
+        if album is not None:
+            insort(album.songs, song, key=by_id)
+            if update_duration:
+                album.update_total_duration()
+        performer = self.performers.get(song.performer_id)
+        if performer is not None:
+            insort(performer.songs, song, key=by_id)
+
+    def _unlink_song(self, song: SongRecord, update_duration: bool = True) -> None:
+        album = self.albums.get(song.album_id)
+        if album is not None and song in album.songs:
+            album.songs.remove(song)
+            if update_duration:
+                album.update_total_duration()
+        performer = self.performers.get(song.performer_id)
+        if performer is not None and song in performer.songs:
+            performer.songs.remove(song)
+
+
+memory_catalog = MemoryCatalog()
+
+# The query builder reads answered by the memory catalog, they take the same arguments without the session
+MEMORY_READS: Dict[Callable, Callable] = {
+    PerformerQueryBuilder.get_performers: memory_catalog.get_performers,
+    PerformerQueryBuilder.get_performer_summaries: memory_catalog.get_performers,
+    PerformerQueryBuilder.get_performer_by_id: memory_catalog.get_performer_by_id,
+    PerformerQueryBuilder.get_total: memory_catalog.get_performer_total,
+    AlbumQueryBuilder.get_albums: memory_catalog.get_albums,
+    AlbumQueryBuilder.get_album_by_id: memory_catalog.get_album_by_id,
+    AlbumQueryBuilder.get_facets: memory_catalog.get_album_facets,
+    AlbumQueryBuilder.get_total: memory_catalog.get_album_total,
+    SongQueryBuilder.get_songs: memory_catalog.get_songs,
+    SongQueryBuilder.get_song_by_id: memory_catalog.get_song_by_id,
+    SongQueryBuilder.get_facets: memory_catalog.get_song_facets,
+    SongQueryBuilder.get_total: memory_catalog.get_song_total,
+}
+
+
+async def catalog_read(session: AsyncSessionDep, read: Callable, *args: Any,
+                       serialize: Optional[Callable[[Any], Any]] = None) -> Any:
+    """Calls the query builder read, or answers it from the memory catalog while it is serving. Database reads
+    given a serialize function are coalesced with the identical concurrent reads."""
+    memory_read = MEMORY_READS.get(read) if memory_catalog.serving else None
+    if memory_read is not None:
+        result = memory_read(*args)
+        return serialize(result) if serialize is not None else result
+    if serialize is not None:
+        return await coalesced_read(session, read, *args, serialize=serialize)
+    return await read(session, *args)
+
+
+@add_commit_listener
+def apply_catalog_changes(changes: List[CatalogChange]) -> None:
+    if memory_catalog.serving or memory_catalog.reloading:
+        memory_catalog.apply_changes(changes)
+
+
+async def load_memory_catalog(database: Database) -> None:
+    """Reloads the whole catalog from the database and starts serving the reads from it."""
+    memory_catalog.start_reload()
+    try:
+        async with database.session_maker() as session:
+            performers = (await session.execute(
+                select(Performer.id, Performer.pseudonym, Performer.biography, Performer.performance_type,
+                       Performer.photo_url).order_by(Performer.id))).all()
+            albums = (await session.execute(
+                select(Album.id, Album.title, Album.year, Album.total_duration, Album.performer_id)
+                .order_by(Album.id))).all()
+            songs = (await session.execute(
+                select(Song.id, Song.title, Song.duration, Song.genre, Song.performer_id, Song.album_id)
+                .order_by(Song.id))).all()
+    except Exception:
+        memory_catalog.abort_reload()
+        raise
+    memory_catalog.finish_reload(performers, albums, songs)
+    logger.info(f"Memory catalog loaded with {len(memory_catalog.performers)} performers, "
+                f"{len(memory_catalog.albums)} albums and {len(memory_catalog.songs)} songs.")
+
+
+async def run_memory_catalog_refresher(database: Database, interval: int) -> None:
+    """Reloads the catalog every interval seconds until cancelled, the first load is done at startup."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await load_memory_catalog(database)
+        except Exception:
+            logger.exception("Failed to reload the memory catalog.")
@@ -0,0 +1,35 @@
+import asyncio
+import logging
+from typing import List
+
+from common.catalog_changes import CatalogChange, add_commit_listener
+from common.settings import PerformerDocumentSettings
+from db.database import Database
+from services.performers.query_builder.document import PerformerDocumentQueryBuilder
+
+logger = logging.getLogger(__name__)
+
+# Set by the commits of this process, so that their documents are rebuilt without waiting for the interval
+documents_stale = asyncio.Event()
+
+
+@add_commit_listener
+def wake_document_builder(changes: List[CatalogChange]) -> None:
+    documents_stale.set()
+
+
+async def run_performer_document_builder(database: Database, settings: PerformerDocumentSettings) -> None:
+    """Builds the stale performer documents after every catalog write of this process, and every
+    rebuild_interval seconds for the writes of the other processes, until cancelled."""
+    while True:
+        try:
+            await asyncio.wait_for(documents_stale.wait(), settings.rebuild_interval)
+        except asyncio.TimeoutError:
+            pass
+        documents_stale.clear()
+        try:
+            async with database.session_maker() as session:
+                while await PerformerDocumentQueryBuilder.build_stale(session, settings.batch_size):
+                    pass
+        except Exception:
+            logger.exception("Failed to build the performer documents.")
@@ -0,0 +1,61 @@
+from typing import Iterable, Optional
+
+from sqlalchemy import bindparam, exists, update
+from sqlalchemy.orm import selectinload
+from sqlmodel import select
+
+from dependecies.session import AsyncSessionDep
+from common.upsert import dialect_insert
+from models import Performer, Album, PerformerDocument
+from services.performers.schemas.performer import PerformerResponseSchema
+
+documents_table = PerformerDocument.__table__
+
+
+class PerformerDocumentQueryBuilder:
+    @staticmethod
+    async def get_document(session: AsyncSessionDep, performer_id: int) -> Optional[bytes]:
+        """Returns the serialized performer, None when it is stale or not built yet."""
+        return await session.scalar(select(PerformerDocument.document)
+                                    .where(PerformerDocument.performer_id == performer_id))
+
+    @staticmethod
+    async def invalidate(session: AsyncSessionDep, performer_ids: Optional[Iterable[int]] = None) -> None:
+        """Clears the documents of the given performers (of all performers when no ids are given) in the current
+        transaction. The version bump makes a concurrent build of the old state fail to store its document."""
+        query = update(documents_table)
+        if performer_ids is not None:
+            query = query.where(documents_table.c.performer_id.in_(set(performer_ids)))
+        await session.execute(query.values(version=documents_table.c.version + 1, document=None))
+
+    @staticmethod
+    async def build_stale(session: AsyncSessionDep, batch_size: int) -> int:
+        """Builds up to batch_size missing or stale documents and returns the number built. A document is stored
+        only if its performer was not written since its version was read."""
+        await session.execute(dialect_insert(session, PerformerDocument)
+                              .from_select(['performer_id'],
+                                           select(Performer.id).where(~exists().where(
+                                               PerformerDocument.performer_id == Performer.id)))
+                              .on_conflict_do_nothing())
+        result = await session.execute(select(PerformerDocument.performer_id, PerformerDocument.version)
+                                       .where(PerformerDocument.document.is_(None))
+                                       .order_by(PerformerDocument.performer_id).limit(batch_size))
+        versions = dict(result.all())
+        if not versions:
+            await session.commit()
+            return 0
+
+        # The versions are read before the performers, a write committed in between fails the version check
+        result = await session.execute(select(Performer).where(Performer.id.in_(versions))
+                                       .options(selectinload(Performer.albums).selectinload(Album.songs),
+                                                selectinload(Performer.singles)))
+        documents = [{'built_id': performer.id, 'built_version': versions[performer.id],
+                      'built_document': PerformerResponseSchema.model_validate(performer).model_dump_json().encode()}
+                     for performer in result.scalars()]
+        if documents:
+            await session.execute(update(documents_table)
+                                  .where(documents_table.c.performer_id == bindparam('built_id'),
+                                         documents_table.c.version == bindparam('built_version'))
+                                  .values(document=bindparam('built_document')), documents)
+        await session.commit()
+        return len(documents)
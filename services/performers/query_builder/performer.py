@@ -1,37 +1,96 @@
-from typing import List
+from typing import List, Optional, Iterable, Set
 
-from sqlalchemy import Select
-from sqlmodel import select, delete
+from sqlalchemy import Select, func
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select, delete, update
 from sqlalchemy.orm import selectinload
 
 from dependecies.session import AsyncSessionDep
 from common.pagination import PaginationParams
-from common.errors import EmptyQueryResult
+from common.errors import EmptyQueryResult, is_unique_violation
+from common.upsert import dialect_insert
+from common.catalog_changes import record_upserts, record_deletes, row_values
+from common.sorting import apply_sorting
+from common.totals import TotalParams, TotalSchema, count_total
 from models import Performer, Album, Song
+from services.performers.query_builder.document import PerformerDocumentQueryBuilder
+from services.albums.query_builder.totals import AlbumTotalsQueryBuilder
 from services.performers.errors import PerformerWithNameAlreadyExists, PerformerNotFound
-from services.albums.errors import AlbumMustContainSongs
-from services.songs.errors import InvalidSongDuration
+from services.albums.errors import AlbumMustContainSongs, AlbumWithNameAlreadyExists
+from services.songs.errors import InvalidSongDuration, SongWithNameAlreadyExists
 from services.performers.schemas.performer import (PerformerCreateSchema, PerformerUpdateSchema,
                                                    PerformerFullUpdateSchema)
-from services.performers.schemas.filters import PerformerFilter
-from common.duration_calc import calculate_album_duration, parse_song_length
+from services.performers.schemas.filters import PerformerFilter, PerformerSorting, PerformerSortEnum
+from common.duration_calc import calculate_album_duration, parse_song_length, song_length_seconds
 
 
 class PerformerQueryBuilder:
     @staticmethod
     async def get_performers(session: AsyncSessionDep, pagination_params: PaginationParams,
-                             filters: PerformerFilter) -> List[Performer]:
+                             filters: PerformerFilter, sorting: Optional[PerformerSorting] = None) -> List[Performer]:
         query_offset, query_limit = (pagination_params.page - 1) * pagination_params.size, pagination_params.size
         select_query = (await PerformerQueryBuilder
                         .apply_filters(select(Performer).options(selectinload(Performer.albums)
                                        .selectinload(Album.songs), selectinload(Performer.singles))
                                        .offset(query_offset).limit(query_limit), filters))
+        select_query = await PerformerQueryBuilder.apply_sorting(select_query, sorting or PerformerSorting())
         result = await session.execute(select_query)
         performers = list(result.scalars())
         if not performers:
             raise EmptyQueryResult
         return performers
 
+    @staticmethod
+    async def get_performer_summaries(session: AsyncSessionDep, pagination_params: PaginationParams,
+                                      filters: PerformerFilter,
+                                      sorting: Optional[PerformerSorting] = None) -> List[Performer]:
+        """Returns the performers without their albums and singles, for listing them with their counters."""
+        query_offset, query_limit = (pagination_params.page - 1) * pagination_params.size, pagination_params.size
+        select_query = await PerformerQueryBuilder.apply_filters(select(Performer).offset(query_offset)
+                                                                 .limit(query_limit), filters)
+        select_query = await PerformerQueryBuilder.apply_sorting(select_query, sorting or PerformerSorting())
+        result = await session.execute(select_query)
+        performers = list(result.scalars())
+        if not performers:
+            raise EmptyQueryResult
+        return performers
+
+    @staticmethod
+    async def update_catalog_counters(session: AsyncSessionDep,
+                                      performer_ids: Optional[Iterable[Optional[int]]] = None) -> None:
+        """Recomputes the album, song and single counts and the total playtime of the given performers
+        (of all performers when no ids are given) from their albums and songs with a single UPDATE, and clears
+        their documents."""
+        query = update(Performer)
+        lock_query = select(Performer.id).order_by(Performer.id).with_for_update()
+        if performer_ids is not None:
+            performer_ids = {performer_id for performer_id in performer_ids if performer_id is not None}
+            if not performer_ids:
+                return
+            query = query.where(Performer.id.in_(performer_ids))
+            lock_query = lock_query.where(Performer.id.in_(performer_ids))
+        # The rows are locked in the order of their ids first, concurrent writers of the same performers wait for
+        # each other and the sums below see the songs committed by the previous one instead of an older snapshot
+        await session.execute(lock_query)
+        await PerformerDocumentQueryBuilder.invalidate(session, performer_ids)
+
+        albums_query = select(func.count(Album.id)).where(Album.performer_id == Performer.id)
+        songs_query = select(func.count(Song.id)).where(Song.performer_id == Performer.id)
+        seconds_query = (select(func.coalesce(func.sum(song_length_seconds(Song.duration)), 0))
+                         .where(Song.performer_id == Performer.id))
+        await session.execute(query.values(album_count=albums_query.scalar_subquery(),
+                                           song_count=songs_query.scalar_subquery(),
+                                           single_count=songs_query.where(Song.album_id.is_(None)).scalar_subquery(),
+                                           total_seconds=seconds_query.scalar_subquery())
+                              .execution_options(synchronize_session=False))
+
+    @staticmethod
+    async def get_song_performer_ids(session: AsyncSessionDep, *criteria) -> Set[int]:
+        """Returns the performers of the songs matching the criteria, read before a delete whose cascade removes
+        those songs, so that their counters can be recomputed after it."""
+        result = await session.execute(select(Song.performer_id).where(*criteria).distinct())
+        return set(result.scalars())
+
     @staticmethod
     async def apply_filters(select_query: Select, filters: PerformerFilter) -> Select:
         if filters and filters.pseudonym:
@@ -39,8 +98,35 @@ class PerformerQueryBuilder:
         if filters and filters.performance_type:
             select_query = select_query.where(Performer.performance_type
                                               .ilike(f'%{filters.performance_type}%'))
+        if filters and any(year is not None for year in (filters.year, filters.year_from, filters.year_to)):
+            albums_query = select(Album.id).where(Album.performer_id == Performer.id)
+            if filters.year is not None:
+                albums_query = albums_query.where(Album.year == filters.year)
+            if filters.year_from is not None:
+                albums_query = albums_query.where(Album.year >= filters.year_from)
+            if filters.year_to is not None:
+                albums_query = albums_query.where(Album.year <= filters.year_to)
+            select_query = select_query.where(albums_query.exists())
         return select_query
 
+    @staticmethod
+    async def get_total(session: AsyncSessionDep, filters: PerformerFilter,
+                        totals: TotalParams) -> Optional[TotalSchema]:
+        """Counts (or estimates) all performers matching the filters, None if the total is not requested."""
+        if totals.total is None:
+            return None
+        filtered_query = await PerformerQueryBuilder.apply_filters(select(Performer), filters)
+        return await count_total(session, Performer.__table__, filtered_query.whereclause, totals.total)
+
+    @staticmethod
+    async def apply_sorting(select_query: Select, sorting: PerformerSorting) -> Select:
+        sort_columns = {
+            PerformerSortEnum.id: Performer.id,
+            PerformerSortEnum.pseudonym: Performer.pseudonym,
+            PerformerSortEnum.performance_type: Performer.performance_type,
+        }
+        return apply_sorting(select_query, sort_columns[sorting.sort], sorting.order, Performer.id)
+
     @staticmethod
     async def validate_album_songs_duration(data: PerformerCreateSchema):
         for album_data in data.albums or []:
@@ -75,13 +161,9 @@ class PerformerQueryBuilder:
     async def create_performer(session: AsyncSessionDep, data: PerformerCreateSchema) -> Performer:
         await PerformerQueryBuilder.validate_album_songs_duration(data)
 
-        for album_data in data.albums:
+        for album_data in data.albums or []:
             if not album_data.songs:
                 raise AlbumMustContainSongs
-        query = select(Performer).where(Performer.pseudonym == data.pseudonym)
-        result = await session.execute(query)
-        if result.scalar():
-            raise PerformerWithNameAlreadyExists
 
         albums = []
         album_song_keys = set()
@@ -118,16 +200,45 @@ class PerformerQueryBuilder:
             singles=singles)
 
         session.add(performer)
-        await session.commit()
+        try:
+            await session.flush()
 
-        for album in albums:
-            for song in album.songs:
-                song.performer_id = performer.id
+            for album in albums:
+                for song in album.songs:
+                    song.performer_id = performer.id
+            await session.flush()
 
-        await session.commit()
+            record_upserts(session, Performer, [row_values(performer)])
+            record_upserts(session, Album, [row_values(album) for album in albums])
+            record_upserts(session, Song, [row_values(song) for album in albums for song in album.songs]
+                           + [row_values(song) for song in singles])
+            await PerformerQueryBuilder.update_catalog_counters(session, [performer.id])
+            await session.commit()
+        except IntegrityError as e:
+            await session.rollback()
+            if is_unique_violation(e, 'pseudonym'):
+                raise PerformerWithNameAlreadyExists
+            if is_unique_violation(e, 'uq_albums_natural_key'):
+                raise AlbumWithNameAlreadyExists
+            if is_unique_violation(e, 'uq_songs_natural_key'):
+                raise SongWithNameAlreadyExists
+            raise
         await session.refresh(performer, attribute_names=['albums', 'singles'])
         return performer
 
+    @staticmethod
+    async def upsert_performer(session: AsyncSessionDep, data: PerformerFullUpdateSchema) -> Performer:
+        """Creates the performer, or replaces the fields of the performer with the same pseudonym."""
+        query = dialect_insert(session, Performer).values(**data.model_dump())
+        query = query.on_conflict_do_update(index_elements=[Performer.pseudonym],
+                                            set_={key: query.excluded[key]
+                                                  for key in data.model_dump(exclude={'pseudonym'})})
+        performer_id = (await session.execute(query.returning(Performer.id))).scalar_one()
+        record_upserts(session, Performer, [{'id': performer_id, **data.model_dump()}])
+        await PerformerDocumentQueryBuilder.invalidate(session, [performer_id])
+        await session.commit()
+        return await PerformerQueryBuilder.get_performer_with_relations(session, performer_id)
+
     @staticmethod
     async def get_performer_by_id(session: AsyncSessionDep, performer_id: int) -> Performer:
         query = (select(Performer).where(Performer.id == performer_id)
@@ -140,18 +251,33 @@ class PerformerQueryBuilder:
 
     @staticmethod
     async def delete_performer_by_id(session: AsyncSessionDep, performer_id: int) -> None:
-        await PerformerQueryBuilder.get_performer_by_id(session, performer_id)
-
-        query = delete(Performer).where(Performer.id == performer_id)
-        await session.execute(query)
+        # Albums and songs of the performer are removed by the ON DELETE CASCADE of their foreign keys, together with
+        # the songs of other performers on its albums. Its songs on the albums of other performers change their totals
+        performer_ids = await PerformerQueryBuilder.get_song_performer_ids(
+            session, Song.album_id.in_(select(Album.id).where(Album.performer_id == performer_id)),
+            Song.performer_id != performer_id)
+        result = await session.execute(select(Song.album_id).where(Song.performer_id == performer_id,
+                                                                   Song.album_id.is_not(None)).distinct())
+        album_ids = set(result.scalars())
+        query = (delete(Performer).where(Performer.id == performer_id).returning(Performer.id)
+                 .execution_options(synchronize_session=False))
+        result = await session.execute(query)
+        if result.scalar() is None:
+            raise PerformerNotFound
+        record_deletes(session, Performer, [performer_id])
+        await AlbumTotalsQueryBuilder.update_total_durations(session, album_ids)
+        await PerformerQueryBuilder.update_catalog_counters(session, performer_ids)
         await session.commit()
 
     @staticmethod
     async def update_performer_by_id(session: AsyncSessionDep, performer_id: int,
                                      data: PerformerUpdateSchema) -> Performer:
         performer = await PerformerQueryBuilder.get_performer_by_id(session, performer_id)
-        for key, value in data.model_dump(exclude_unset=True, exclude={'albums', 'singles'}).items():
+        values = data.model_dump(exclude_unset=True, exclude={'albums', 'singles'})
+        for key, value in values.items():
             setattr(performer, key, value)
+        record_upserts(session, Performer, [{'id': performer_id, **values}])
+        await PerformerDocumentQueryBuilder.invalidate(session, [performer_id])
         await session.commit()
         await session.refresh(performer)
         return performer
@@ -160,8 +286,11 @@ class PerformerQueryBuilder:
     async def replace_performer_by_id(session: AsyncSessionDep, performer_id: int,
                                       data: PerformerFullUpdateSchema) -> Performer:
         performer = await PerformerQueryBuilder.get_performer_by_id(session, performer_id)
-        for key, value in data.model_dump(exclude={'albums', 'singles'}).items():
+        values = data.model_dump(exclude={'albums', 'singles'})
+        for key, value in values.items():
             setattr(performer, key, value)
+        record_upserts(session, Performer, [{'id': performer_id, **values}])
+        await PerformerDocumentQueryBuilder.invalidate(session, [performer_id])
         await session.commit()
         await session.refresh(performer)
         return performer
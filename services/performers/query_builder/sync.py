@@ -0,0 +1,150 @@
+from typing import List, Tuple
+from sqlmodel import insert, update, delete
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+
+from dependecies.session import AsyncSessionDep
+from common.errors import is_unique_violation
+from common.catalog_changes import record_upserts, record_deletes
+from models import Performer, Album, Song
+from services.performers.errors import PerformerWithNameAlreadyExists
+from services.albums.errors import AlbumMustContainSongs, AlbumWithNameAlreadyExists
+from services.songs.errors import SongWithNameAlreadyExists
+from services.songs.schemas.song import SongCreateSchema
+from services.performers.schemas.performer import PerformerCreateSchema
+from services.performers.schemas.sync import PerformerSyncResponseSchema, SyncChangesSchema
+from services.performers.query_builder.performer import PerformerQueryBuilder
+from services.albums.query_builder.totals import AlbumTotalsQueryBuilder
+
+
+class PerformerSyncQueryBuilder:
+    @staticmethod
+    def diff_songs(stored_songs: List[Song], desired_songs: List[SongCreateSchema],
+                   changes: SyncChangesSchema) -> Tuple[List[dict], List[dict], List[int]]:
+        """Matches the songs by title and returns the values to insert, the values to update and the ids to delete."""
+        stored_by_title = {song.title: song for song in stored_songs}
+        desired_by_title = {}
+        for song_data in desired_songs:
+            if song_data.title in desired_by_title:
+                raise SongWithNameAlreadyExists
+            desired_by_title[song_data.title] = song_data
+
+        inserts, updates = [], []
+        for title, song_data in desired_by_title.items():
+            song = stored_by_title.get(title)
+            if song is None:
+                inserts.append(song_data.model_dump(include={'title', 'duration', 'genre'}))
+            elif song.duration != song_data.duration or song.genre != song_data.genre:
+                updates.append({'id': song.id, 'duration': song_data.duration, 'genre': song_data.genre})
+        deletes = [song.id for title, song in stored_by_title.items() if title not in desired_by_title]
+
+        changes.inserted += len(inserts)
+        changes.updated += len(updates)
+        changes.deleted += len(deletes)
+        return inserts, updates, deletes
+
+    @staticmethod
+    async def sync_performer(session: AsyncSessionDep, performer_id: int,
+                             data: PerformerCreateSchema) -> PerformerSyncResponseSchema:
+        """Brings the stored performer graph to the desired state. The graph is loaded once, albums are matched
+        by title and songs by title within their album (or among the singles); only the differences are written,
+        with one statement per kind of change."""
+        await PerformerQueryBuilder.validate_album_songs_duration(data)
+        for album_data in data.albums or []:
+            if not album_data.songs:
+                raise AlbumMustContainSongs
+
+        performer = await PerformerQueryBuilder.get_performer_by_id(session, performer_id)
+        summary = PerformerSyncResponseSchema(performer_id=performer_id)
+
+        performer_values = data.model_dump(exclude={'albums', 'singles'})
+        if any(getattr(performer, key) != value for key, value in performer_values.items()):
+            await session.execute(update(Performer).where(Performer.id == performer_id).values(**performer_values))
+            record_upserts(session, Performer, [{'id': performer_id, **performer_values}])
+            summary.performer_updated = True
+
+        stored_albums = {album.title: album for album in performer.albums}
+        desired_albums = {}
+        for album_data in data.albums or []:
+            if album_data.title in desired_albums:
+                raise AlbumWithNameAlreadyExists
+            desired_albums[album_data.title] = album_data
+
+        album_updates, song_inserts, song_updates, song_deletes = [], [], [], []
+        affected_album_ids = set()
+        for title, album_data in desired_albums.items():
+            album = stored_albums.get(title)
+            if album is None:
+                continue
+            if album.year != album_data.year:
+                album_updates.append({'id': album.id, 'year': album_data.year})
+            inserts, updates, deletes = PerformerSyncQueryBuilder.diff_songs(album.songs, album_data.songs,
+                                                                            summary.songs)
+            song_inserts += [{**values, 'performer_id': performer_id, 'album_id': album.id} for values in inserts]
+            song_updates += updates
+            song_deletes += deletes
+            if inserts or updates or deletes:
+                affected_album_ids.add(album.id)
+
+        inserts, updates, deletes = PerformerSyncQueryBuilder.diff_songs(performer.singles, data.singles or [],
+                                                                        summary.singles)
+        song_inserts += [{**values, 'performer_id': performer_id, 'album_id': None} for values in inserts]
+        song_updates += updates
+        song_deletes += deletes
+
+        album_deletes = [album.id for title, album in stored_albums.items() if title not in desired_albums]
+        album_inserts = [{**album_data.model_dump(include={'title', 'year'}), 'performer_id': performer_id,
+                          'total_duration': '0:00'}
+                         for title, album_data in desired_albums.items() if title not in stored_albums]
+        summary.albums = SyncChangesSchema(inserted=len(album_inserts), updated=len(album_updates),
+                                           deleted=len(album_deletes))
+
+        try:
+            # Songs of the deleted albums are removed by the ON DELETE CASCADE of songs.album_id. The songs on the
+            # albums of the performer may belong to other performers, whose counters change with them
+            performer_ids = await PerformerQueryBuilder.get_song_performer_ids(
+                session, or_(Song.album_id.in_(album_deletes),
+                             Song.id.in_(song_deletes + [values['id'] for values in song_updates])))
+            if album_deletes:
+                await session.execute(delete(Album).where(Album.id.in_(album_deletes)))
+                record_deletes(session, Album, album_deletes)
+            if song_deletes:
+                await session.execute(delete(Song).where(Song.id.in_(song_deletes)))
+                record_deletes(session, Song, song_deletes)
+            if album_updates:
+                await session.execute(update(Album), album_updates)
+                record_upserts(session, Album, album_updates)
+            if song_updates:
+                await session.execute(update(Song), song_updates)
+                record_upserts(session, Song, song_updates)
+            if album_inserts:
+                result = await session.execute(insert(Album).returning(Album.id, sort_by_parameter_order=True),
+                                               album_inserts)
+                inserted_albums = list(zip(result.scalars().all(), album_inserts))
+                record_upserts(session, Album, [{'id': album_id, **values} for album_id, values in inserted_albums])
+                for album_id, values in inserted_albums:
+                    title = values['title']
+                    song_inserts += [{**song_data.model_dump(include={'title', 'duration', 'genre'}),
+                                      'performer_id': performer_id, 'album_id': album_id}
+                                     for song_data in desired_albums[title].songs]
+                    summary.songs.inserted += len(desired_albums[title].songs)
+                    affected_album_ids.add(album_id)
+            if song_inserts:
+                result = await session.execute(insert(Song).returning(Song.id, sort_by_parameter_order=True),
+                                               song_inserts)
+                record_upserts(session, Song, [{'id': song_id, **values}
+                                               for song_id, values in zip(result.scalars().all(), song_inserts)])
+
+            await AlbumTotalsQueryBuilder.update_total_durations(session, affected_album_ids)
+            await PerformerQueryBuilder.update_catalog_counters(session, {performer_id, *performer_ids})
+            await session.commit()
+        except IntegrityError as e:
+            await session.rollback()
+            if is_unique_violation(e, 'pseudonym'):
+                raise PerformerWithNameAlreadyExists
+            if is_unique_violation(e, 'uq_albums_natural_key'):
+                raise AlbumWithNameAlreadyExists
+            if is_unique_violation(e, 'uq_songs_natural_key'):
+                raise SongWithNameAlreadyExists
+            raise
+        return summary
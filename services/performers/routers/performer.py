@@ -1,37 +1,86 @@
 import logging
-from typing import Annotated
-from fastapi import APIRouter, HTTPException, status, Depends
+from typing import Annotated, List
+from fastapi import APIRouter, HTTPException, status, Depends, Response
 
 from dependecies.session import AsyncSessionDep
 from common.pagination import PaginationParams
 from common.errors import EmptyQueryResult
-from models import User
+from common.totals import TotalParams
+from common.settings import Settings
+from models import User, Performer
 from services.performers.errors import PerformerWithNameAlreadyExists, PerformerNotFound
-from services.songs.errors import InvalidSongDuration
+from services.albums.errors import AlbumWithNameAlreadyExists, AlbumMustContainSongs
+from services.songs.errors import InvalidSongDuration, SongWithNameAlreadyExists
 from services.performers.query_builder.performer import PerformerQueryBuilder
+from services.memory_catalog.modules.catalog import catalog_read, memory_catalog
+from services.performers.query_builder.document import PerformerDocumentQueryBuilder
+from services.performers.query_builder.sync import PerformerSyncQueryBuilder
 from services.performers.schemas.performer import (PerformerListResponseSchema, PerformerResponseSchema,
                                                    PerformerCreateSchema, PerformerUpdateSchema,
-                                                   PerformerFullUpdateSchema)
-from services.performers.schemas.filters import PerformerFilter
+                                                   PerformerFullUpdateSchema, PerformerSummaryListResponseSchema)
+from services.performers.schemas.sync import PerformerSyncResponseSchema
+from services.performers.schemas.filters import PerformerFilter, PerformerSorting
 from services.users.modules.manager import current_active_user
 
 performers_router = APIRouter()
 
 logger = logging.getLogger(__name__)
 
+PERFORMER_DOCUMENTS_ENABLED = Settings().performer_documents.enabled
+
+
+def serialize_performers(performers: List[Performer]) -> List[PerformerResponseSchema]:
+    return [PerformerResponseSchema.model_validate(performer) for performer in performers]
+
 
 @performers_router.get('/performers', response_model=PerformerListResponseSchema)
 async def get_performers(session: AsyncSessionDep,
                          pagination_params: Annotated[PaginationParams,
                                                       Depends(PaginationParams)],
                          filters: PerformerFilter = Depends(),
+                         sorting: PerformerSorting = Depends(),
+                         totals: TotalParams = Depends(),
                          user: User = Depends(current_active_user)) -> PerformerListResponseSchema:
     """Returns a paginated list of performers, including their albums and singles, as specified by the
-    pagination params."""
+    pagination params, with the total number of matching performers if requested. An empty page is returned
+    as 204, unless the total is requested."""
+    try:
+        try:
+            performers = await catalog_read(session, PerformerQueryBuilder.get_performers, pagination_params,
+                                            filters, sorting, serialize=serialize_performers)
+        except EmptyQueryResult:
+            if totals.total is None:
+                raise
+            performers = []
+        total = await catalog_read(session, PerformerQueryBuilder.get_total, filters, totals)
+        logger.info(f'User {user.email} has sent a request.')
+        return PerformerListResponseSchema(items=performers, total=total)
+    except EmptyQueryResult:
+        logger.warning("No performers found.")
+        raise HTTPException(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@performers_router.get('/performers/summary', response_model=PerformerSummaryListResponseSchema)
+async def get_performer_summaries(session: AsyncSessionDep,
+                                  pagination_params: Annotated[PaginationParams,
+                                                               Depends(PaginationParams)],
+                                  filters: PerformerFilter = Depends(),
+                                  sorting: PerformerSorting = Depends(),
+                                  totals: TotalParams = Depends(),
+                                  user: User = Depends(current_active_user)) -> PerformerSummaryListResponseSchema:
+    """Returns a paginated list of performers with their album, song and single counts and total playtime,
+    without their albums and singles, and the total number of matching performers if requested."""
     try:
-        performers = await PerformerQueryBuilder.get_performers(session, pagination_params, filters)
+        try:
+            performers = await catalog_read(session, PerformerQueryBuilder.get_performer_summaries,
+                                            pagination_params, filters, sorting)
+        except EmptyQueryResult:
+            if totals.total is None:
+                raise
+            performers = []
+        total = await catalog_read(session, PerformerQueryBuilder.get_total, filters, totals)
         logger.info(f'User {user.email} has sent a request.')
-        return PerformerListResponseSchema(items=performers)
+        return PerformerSummaryListResponseSchema(items=performers, total=total)
     except EmptyQueryResult:
         logger.warning("No performers found.")
         raise HTTPException(status_code=status.HTTP_204_NO_CONTENT)
@@ -51,17 +100,39 @@ async def create_performer(session: AsyncSessionDep, data: PerformerCreateSchema
     except PerformerWithNameAlreadyExists as e:
         logger.warning("Performer with given name already exists.")
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except (AlbumWithNameAlreadyExists, SongWithNameAlreadyExists) as e:
+        logger.warning("Performer contains albums or songs with the same name.")
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except AlbumMustContainSongs as e:
+        logger.warning("Album must contain songs, otherwise it cannot exist")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except InvalidSongDuration as e:
         logger.warning("Invalid song duration occurred while creating the song.")
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
+@performers_router.put('/performers', response_model=PerformerResponseSchema)
+async def upsert_performer(session: AsyncSessionDep, data: PerformerFullUpdateSchema,
+                           user: User = Depends(current_active_user)) -> PerformerResponseSchema:
+    """Creates a performer, or replaces the fields of the performer with the same pseudonym, and returns it."""
+    performer = await PerformerQueryBuilder.upsert_performer(session, data)
+    logger.info(f"User {user.email} has successfully upserted a performer.")
+    return PerformerResponseSchema.model_validate(performer)
+
+
 @performers_router.get('/performer_by_id/{id}', response_model=PerformerResponseSchema)
 async def get_performer_by_id(session: AsyncSessionDep, performer_id: int,
                               user: User = Depends(current_active_user)) -> PerformerResponseSchema:
-    """Returns the performer schema using the ID provided by the user."""
+    """Returns the performer schema using the ID provided by the user. The prebuilt document of the performer
+    is sent as it is, the performer is read from the catalog when its document is stale."""
     try:
-        performer = await PerformerQueryBuilder.get_performer_by_id(session, performer_id)
+        if PERFORMER_DOCUMENTS_ENABLED and not memory_catalog.serving:
+            document = await PerformerDocumentQueryBuilder.get_document(session, performer_id)
+            if document is not None:
+                logger.info(f"User {user.email} has sent a request.")
+                return Response(content=document, media_type='application/json')
+        performer = await catalog_read(session, PerformerQueryBuilder.get_performer_by_id, performer_id,
+                                       serialize=PerformerResponseSchema.model_validate)
         logger.info(f"User {user.email} has sent a request.")
         return performer
     except PerformerNotFound as e:
@@ -109,3 +180,23 @@ async def replace_performer_by_id(session: AsyncSessionDep, performer_id: int,
     except PerformerNotFound as e:
         logger.error(f"Performer with an id {performer_id} not found.")
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+
+
+@performers_router.post('/sync/performers/{performer_id}', response_model=PerformerSyncResponseSchema)
+async def sync_performer(session: AsyncSessionDep, performer_id: int, data: PerformerCreateSchema,
+                         user: User = Depends(current_active_user)) -> PerformerSyncResponseSchema:
+    """Brings the performer, its albums, songs and singles to the provided state, writing only the
+    differences, and returns a summary of the changes."""
+    try:
+        summary = await PerformerSyncQueryBuilder.sync_performer(session, performer_id, data)
+        logger.info(f"User {user.email} has successfully synced a performer.")
+        return summary
+    except PerformerNotFound as e:
+        logger.error(f"Performer with an id {performer_id} not found.")
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except (PerformerWithNameAlreadyExists, AlbumWithNameAlreadyExists, SongWithNameAlreadyExists) as e:
+        logger.warning("Performer sync data contains duplicated names.")
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except (AlbumMustContainSongs, InvalidSongDuration) as e:
+        logger.warning("Invalid performer sync data.")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
@@ -1,7 +1,24 @@
 from sqlmodel import SQLModel, Field
 from typing import Optional
+from enum import Enum
+
+from common.sorting import SortOrderEnum
 
 
 class PerformerFilter(SQLModel):
     pseudonym: Optional[str] = Field(default=None, max_length=64)
     performance_type: Optional[str] = Field(default=None, max_length=20)
+    year: Optional[int] = Field(default=None, ge=0)  # Performers with an album released in the given year
+    year_from: Optional[int] = Field(default=None, ge=0)  # Performers with an album released in or after the year
+    year_to: Optional[int] = Field(default=None, ge=0)  # Performers with an album released in or before the year
+
+
+class PerformerSortEnum(str, Enum):
+    id = 'id'
+    pseudonym = 'pseudonym'
+    performance_type = 'performance_type'
+
+
+class PerformerSorting(SQLModel):
+    sort: PerformerSortEnum = PerformerSortEnum.id
+    order: SortOrderEnum = SortOrderEnum.asc
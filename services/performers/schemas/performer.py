@@ -3,6 +3,7 @@ from sqlmodel import SQLModel, Field
 from typing import Optional, List
 from enum import Enum
 
+from common.totals import TotalSchema
 from services import AlbumResponseSchema, AlbumCreateSchema, AlbumUpdateSchema
 from services import SongResponseSchema, SongCreateSchema, SongUpdateSchema
 
@@ -29,6 +30,25 @@ class PerformerResponseSchema(SQLModel):
 
 class PerformerListResponseSchema(SQLModel):
     items: List[PerformerResponseSchema]
+    total: Optional[TotalSchema] = None
+
+
+class PerformerSummarySchema(SQLModel):
+    id: int
+    pseudonym: str
+    performance_type: PerformanceTypeEnum
+    photo_url: Optional[str] = None
+    album_count: int
+    song_count: int
+    single_count: int
+    total_seconds: int
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class PerformerSummaryListResponseSchema(SQLModel):
+    items: List[PerformerSummarySchema]
+    total: Optional[TotalSchema] = None
 
 
 class PerformerCreateSchema(SQLModel):
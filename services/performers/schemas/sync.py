@@ -0,0 +1,15 @@
+from sqlmodel import SQLModel, Field
+
+
+class SyncChangesSchema(SQLModel):
+    inserted: int = 0
+    updated: int = 0
+    deleted: int = 0
+
+
+class PerformerSyncResponseSchema(SQLModel):
+    performer_id: int
+    performer_updated: bool = False
+    albums: SyncChangesSchema = Field(default_factory=SyncChangesSchema)
+    songs: SyncChangesSchema = Field(default_factory=SyncChangesSchema)
+    singles: SyncChangesSchema = Field(default_factory=SyncChangesSchema)
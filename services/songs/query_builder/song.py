@@ -1,25 +1,38 @@
-from typing import List
-from sqlmodel import select, delete
-from sqlalchemy import Select
+from typing import Iterable, List, Optional
+from sqlmodel import select, delete, update
+from sqlalchemy import Select, case, func
+from sqlalchemy.exc import IntegrityError
 
 from dependecies.session import AsyncSessionDep
 from common.pagination import PaginationParams
-from common.errors import EmptyQueryResult
+from common.errors import EmptyQueryResult, BulkFilterRequired, is_unique_violation, is_foreign_key_violation
+from common.upsert import dialect_insert
+from common.catalog_changes import record_upserts, record_deletes, row_values
+from common.sorting import apply_sorting
+from common.totals import TotalParams, TotalSchema, count_total
+from common.facets import FacetParams, FacetsSchema, count_facets
 from services.songs.errors import SongWithNameAlreadyExists, SongNotFound, InvalidSongDuration
-from services.songs.schemas.song import SongCreateSchema, SongUpdateSchema, SongFullUpdateSchema
-from services.songs.schemas.filters import SongFilter
-from services.albums.query_builder.album import AlbumQueryBuilder
-from models import Song
-from common.duration_calc import parse_song_length, calculate_album_duration
+from services.albums.errors import AlbumNotFound
+from services.performers.errors import PerformerNotFound
+from services.songs.schemas.song import (SongCreateSchema, SongUpdateSchema, SongFullUpdateSchema,
+                                         SongBulkUpdateSchema)
+from services.songs.schemas.filters import SongFilter, SongSorting, SongSortEnum, SongFacetEnum
+from services.albums.query_builder.totals import AlbumTotalsQueryBuilder
+from services.performers.query_builder.performer import PerformerQueryBuilder
+from models import Album, Song
+from models.genres import GENRE_NAMES
+from models.songs import SONG_NATURAL_KEY
+from common.duration_calc import parse_song_length, song_length_seconds
 
 
 class SongQueryBuilder:
     @staticmethod
     async def get_songs(session: AsyncSessionDep, pagination_params: PaginationParams,
-                        filters: SongFilter) -> List[Song]:
+                        filters: SongFilter, sorting: Optional[SongSorting] = None) -> List[Song]:
         query_offset, query_limit = (pagination_params.page - 1) * pagination_params.size, pagination_params.size
         select_query = (await SongQueryBuilder.apply_filters(select(Song)
                                                              .offset(query_offset).limit(query_limit), filters))
+        select_query = await SongQueryBuilder.apply_sorting(select_query, sorting or SongSorting())
         result = await session.execute(select_query)
         songs = list(result.scalars())
         if not songs:
@@ -31,7 +44,7 @@ class SongQueryBuilder:
         if filters.title is not None:
             select_query = select_query.where(Song.title.ilike(f'%{filters.title}%'))
         if filters.genre is not None:
-            select_query = select_query.where(Song.genre.ilike(f'%{filters.genre}%'))
+            select_query = select_query.where(Song.genre == filters.genre)
         if filters.performer_id is not None:
             select_query = select_query.where(Song.performer_id == filters.performer_id)
         if filters and filters.album_id is not None:
@@ -40,6 +53,41 @@ class SongQueryBuilder:
             select_query = select_query.where(Song.album_id.is_(None))
         return select_query
 
+    @staticmethod
+    async def get_facets(session: AsyncSessionDep, filters: SongFilter, facets: FacetParams) -> Optional[FacetsSchema]:
+        """Counts all songs matching the filters per value of each requested facet, None if none is requested."""
+        facet_columns = {
+            SongFacetEnum.genre: Song.__table__.c.genre,
+            SongFacetEnum.album_id: Song.__table__.c.album_id,
+            SongFacetEnum.performer_id: Song.__table__.c.performer_id,
+        }
+        fields = facets.fields(SongFacetEnum)
+        if not fields:
+            return None
+        filtered_query = await SongQueryBuilder.apply_filters(select(Song), filters)
+        return await count_facets(session, Song.__table__, filtered_query.whereclause,
+                                  {field.value: facet_columns[field] for field in fields}, facets.facets_mode)
+
+    @staticmethod
+    async def get_total(session: AsyncSessionDep, filters: SongFilter,
+                        totals: TotalParams) -> Optional[TotalSchema]:
+        """Counts (or estimates) all songs matching the filters, None if the total is not requested."""
+        if totals.total is None:
+            return None
+        filtered_query = await SongQueryBuilder.apply_filters(select(Song), filters)
+        return await count_total(session, Song.__table__, filtered_query.whereclause, totals.total)
+
+    @staticmethod
+    async def apply_sorting(select_query: Select, sorting: SongSorting) -> Select:
+        sort_columns = {
+            SongSortEnum.id: Song.id,
+            SongSortEnum.title: Song.title,
+            # Songs store the code of their genre, they are sorted by its name
+            SongSortEnum.genre: case(GENRE_NAMES, value=Song.__table__.c.genre),
+            SongSortEnum.duration: song_length_seconds(Song.duration),
+        }
+        return apply_sorting(select_query, sort_columns[sorting.sort], sorting.order, Song.id)
+
     @staticmethod
     async def validate_song_duration(data: SongCreateSchema):
         try:
@@ -48,20 +96,62 @@ class SongQueryBuilder:
             raise InvalidSongDuration(song_title=data.title,
                                       duration=data.duration)
 
+    @staticmethod
+    async def get_missing_reference(session: AsyncSessionDep, album_ids: Iterable[Optional[int]]) -> Exception:
+        """Returns the error of the album or performer missing after a foreign key violation of a song write."""
+        album_ids = {album_id for album_id in album_ids if album_id is not None}
+        if album_ids:
+            result = await session.execute(select(func.count(Album.id)).where(Album.id.in_(album_ids)))
+            if result.scalar() != len(album_ids):
+                return AlbumNotFound()
+        return PerformerNotFound()
+
     @staticmethod
     async def create_song(session: AsyncSessionDep, data: SongCreateSchema) -> Song:
         await SongQueryBuilder.validate_song_duration(data)
 
-        query = select(Song).where(Song.title == data.title)
-        result = await session.execute(query)
-        if result.scalar():
-            raise SongWithNameAlreadyExists
         song = Song(**data.model_dump(exclude={"id"}))
         session.add(song)
-        await session.commit()
+        try:
+            await session.flush()
+            record_upserts(session, Song, [row_values(song)])
+            await AlbumTotalsQueryBuilder.update_total_durations(session, [song.album_id])
+            await PerformerQueryBuilder.update_catalog_counters(session, [song.performer_id])
+            await session.commit()
+        except IntegrityError as e:
+            await session.rollback()
+            if is_unique_violation(e, 'uq_songs_natural_key'):
+                raise SongWithNameAlreadyExists
+            if is_foreign_key_violation(e):
+                raise await SongQueryBuilder.get_missing_reference(session, [data.album_id])
+            raise
         await session.refresh(song)
         return song
 
+    @staticmethod
+    async def upsert_song(session: AsyncSessionDep, data: SongCreateSchema) -> Song:
+        """Creates the song, or updates the song with the same title, performer and album."""
+        await SongQueryBuilder.validate_song_duration(data)
+
+        query = dialect_insert(session, Song).values(**data.model_dump())
+        query = query.on_conflict_do_update(index_elements=SONG_NATURAL_KEY,
+                                            set_={'duration': query.excluded.duration,
+                                                  'genre': query.excluded.genre})
+        try:
+            result = await session.scalars(query.returning(Song), execution_options={'populate_existing': True})
+            song = result.one()
+            record_upserts(session, Song, [row_values(song)])
+
+            await AlbumTotalsQueryBuilder.update_total_durations(session, [song.album_id])
+            await PerformerQueryBuilder.update_catalog_counters(session, [song.performer_id])
+            await session.commit()
+        except IntegrityError as e:
+            await session.rollback()
+            if is_foreign_key_violation(e):
+                raise await SongQueryBuilder.get_missing_reference(session, [data.album_id])
+            raise
+        return song
+
     @staticmethod
     async def get_song_by_id(session: AsyncSessionDep, song_id: int) -> Song:
         query = select(Song).where(Song.id == song_id)
@@ -73,11 +163,71 @@ class SongQueryBuilder:
 
     @staticmethod
     async def delete_song_by_id(session: AsyncSessionDep, song_id: int) -> None:
-        await SongQueryBuilder.get_song_by_id(session, song_id)
+        query = (delete(Song).where(Song.id == song_id).returning(Song.album_id, Song.performer_id)
+                 .execution_options(synchronize_session=False))
+        result = await session.execute(query)
+        deleted = result.first()
+        if deleted is None:
+            raise SongNotFound
+        record_deletes(session, Song, [song_id])
+        await AlbumTotalsQueryBuilder.update_total_durations(session, [deleted.album_id])
+        await PerformerQueryBuilder.update_catalog_counters(session, [deleted.performer_id])
+        await session.commit()
 
-        query = delete(Song).where(Song.id == song_id)
-        await session.execute(query)
+    @staticmethod
+    async def delete_songs(session: AsyncSessionDep, filters: SongFilter) -> int:
+        """Deletes all songs matching the filters, recomputes the totals of their albums and returns their number."""
+        query = await SongQueryBuilder.apply_filters(delete(Song), filters)
+        if query.whereclause is None:
+            raise BulkFilterRequired
+        result = await session.execute(query.returning(Song.id, Song.album_id, Song.performer_id)
+                                       .execution_options(synchronize_session=False))
+        deleted = result.all()
+        record_deletes(session, Song, [song.id for song in deleted])
+        await AlbumTotalsQueryBuilder.update_total_durations(session, {song.album_id for song in deleted})
+        await PerformerQueryBuilder.update_catalog_counters(session, {song.performer_id for song in deleted})
         await session.commit()
+        return len(deleted)
+
+    @staticmethod
+    async def bulk_update_songs(session: AsyncSessionDep, data: SongBulkUpdateSchema) -> int:
+        """Applies the changes of every item to its songs with one UPDATE per distinct set of changes, then
+        recomputes the totals of the albums the songs were moved from and to with a single UPDATE.
+        Returns the number of updated songs."""
+        changes_ids = {}
+        for item in data.items:
+            changes = tuple(sorted(item.model_dump(exclude_unset=True, exclude={'ids'}).items()))
+            changes_ids.setdefault(changes, set()).update(item.ids)
+
+        song_ids = set().union(*changes_ids.values())
+        result = await session.execute(select(Song.album_id, Song.performer_id).where(Song.id.in_(song_ids)))
+        songs = result.all()
+        if len(songs) != len(song_ids):
+            raise SongNotFound
+
+        album_ids = {song.album_id for song in songs}
+        performer_ids = {song.performer_id for song in songs}
+        try:
+            for changes, ids in changes_ids.items():
+                if not changes:
+                    continue
+                await session.execute(update(Song).where(Song.id.in_(ids)).values(**dict(changes))
+                                      .execution_options(synchronize_session=False))
+                record_upserts(session, Song, [{'id': song_id, **dict(changes)} for song_id in ids])
+                album_ids.add(dict(changes).get('album_id'))
+                performer_ids.add(dict(changes).get('performer_id'))
+
+            await AlbumTotalsQueryBuilder.update_total_durations(session, album_ids)
+            await PerformerQueryBuilder.update_catalog_counters(session, performer_ids)
+            await session.commit()
+        except IntegrityError as e:
+            await session.rollback()
+            if is_unique_violation(e, 'uq_songs_natural_key'):
+                raise SongWithNameAlreadyExists
+            if is_foreign_key_violation(e):
+                raise await SongQueryBuilder.get_missing_reference(session, [item.album_id for item in data.items])
+            raise
+        return len(song_ids)
 
     @staticmethod
     async def update_song_by_id(session: AsyncSessionDep, song_id: int, data: SongUpdateSchema) -> Song:
@@ -86,25 +236,23 @@ class SongQueryBuilder:
 
         song = await SongQueryBuilder.get_song_by_id(session, song_id)
         old_album_id = song.album_id
+        old_performer_id = song.performer_id
         for key, value in data.model_dump(exclude_unset=True).items():
             setattr(song, key, value)
-        await session.flush()
-
-        # Updating album total_duration
-        album_id = song.album_id
-        if album_id:
-            new_album = await AlbumQueryBuilder.get_album_by_id(session, album_id)
-            durations = [s.duration for s in new_album.songs if s.duration]
-            total_duration = calculate_album_duration(durations)
-            new_album.total_duration = total_duration
-
-        if old_album_id and old_album_id != song.album_id:
-            old_album = await AlbumQueryBuilder.get_album_by_id(session, old_album_id)
-            durations = [s.duration for s in old_album.songs if s.duration]
-            total_duration = calculate_album_duration(durations)
-            old_album.total_duration = total_duration
+        try:
+            await session.flush()
+            record_upserts(session, Song, [row_values(song)])
 
-        await session.commit()
+            await AlbumTotalsQueryBuilder.update_total_durations(session, [old_album_id, song.album_id])
+            await PerformerQueryBuilder.update_catalog_counters(session, [old_performer_id, song.performer_id])
+            await session.commit()
+        except IntegrityError as e:
+            await session.rollback()
+            if is_unique_violation(e, 'uq_songs_natural_key'):
+                raise SongWithNameAlreadyExists
+            if is_foreign_key_violation(e):
+                raise AlbumNotFound
+            raise
         await session.refresh(song)
         return song
 
@@ -114,25 +262,22 @@ class SongQueryBuilder:
 
         song = await SongQueryBuilder.get_song_by_id(session, song_id)
         old_album_id = song.album_id
+        old_performer_id = song.performer_id
         for key, value in data.model_dump().items():
             setattr(song, key, value)
-        await session.flush()
-
-        album_id = song.album_id
-
-        # Updates total_duration of the current album
-        new_album = await AlbumQueryBuilder.get_album_by_id(session, album_id)
-        durations = [s.duration for s in new_album.songs if s.duration]
-        total_duration = calculate_album_duration(durations)
-        new_album.total_duration = total_duration
-
-        # If album_id is changed, updates total_duration of the old album
-        if old_album_id and old_album_id != song.album_id:
-            old_album = await AlbumQueryBuilder.get_album_by_id(session, old_album_id)
-            durations = [s.duration for s in old_album.songs if s.duration]
-            total_duration = calculate_album_duration(durations)
-            old_album.total_duration = total_duration
+        try:
+            await session.flush()
+            record_upserts(session, Song, [row_values(song)])
 
-        await session.commit()
+            await AlbumTotalsQueryBuilder.update_total_durations(session, [old_album_id, song.album_id])
+            await PerformerQueryBuilder.update_catalog_counters(session, [old_performer_id, song.performer_id])
+            await session.commit()
+        except IntegrityError as e:
+            await session.rollback()
+            if is_unique_violation(e, 'uq_songs_natural_key'):
+                raise SongWithNameAlreadyExists
+            if is_foreign_key_violation(e):
+                raise AlbumNotFound
+            raise
         await session.refresh(song)
         return song
@@ -1,16 +1,22 @@
 import logging
-from typing import Annotated
+from typing import Annotated, List
 from fastapi import APIRouter, HTTPException, status, Depends
 
 from dependecies.session import AsyncSessionDep
-from common.errors import EmptyQueryResult
+from common.errors import EmptyQueryResult, BulkFilterRequired, InvalidFacet
+from common.bulk import BulkDeleteResponseSchema
+from common.facets import FacetParams
+from common.totals import TotalParams
 from common.pagination import PaginationParams
-from models import User
+from models import User, Song
 from services.songs.errors import SongWithNameAlreadyExists, SongNotFound, InvalidSongDuration
+from services.albums.errors import AlbumNotFound
+from services.performers.errors import PerformerNotFound
 from services.songs.query_builder.song import SongQueryBuilder
+from services.memory_catalog.modules.catalog import catalog_read
 from services.songs.schemas.song import (SongListResponseSchema, SongResponseSchema, SongCreateSchema, SongUpdateSchema,
-                                         SongFullUpdateSchema)
-from services.songs.schemas.filters import SongFilter
+                                         SongFullUpdateSchema, SongBulkUpdateSchema, SongBulkUpdateResponseSchema)
+from services.songs.schemas.filters import SongFilter, SongSorting
 from services.users.modules.manager import current_active_user
 
 
@@ -19,20 +25,40 @@ songs_router = APIRouter()
 logger = logging.getLogger(__name__)
 
 
+def serialize_songs(songs: List[Song]) -> List[SongResponseSchema]:
+    return [SongResponseSchema.model_validate(song) for song in songs]
+
+
 @songs_router.get('/songs', response_model=SongListResponseSchema)
 async def get_songs(session: AsyncSessionDep,
                     pagination_params: Annotated[PaginationParams,
                                                  Depends(PaginationParams)],
                     filters: SongFilter = Depends(),
+                    sorting: SongSorting = Depends(),
+                    facets: FacetParams = Depends(),
+                    totals: TotalParams = Depends(),
                     user: User = Depends(current_active_user)) -> SongListResponseSchema:
-    """Returns a paginated list of songs, as specified by the pagination params."""
+    """Returns a paginated list of songs, as specified by the pagination params, with the counts of all
+    matching songs per value of the requested facets and the total number of matching songs if requested.
+    An empty page is returned as 204, unless the total is requested."""
     try:
-        songs = await SongQueryBuilder.get_songs(session, pagination_params, filters)
+        try:
+            songs = await catalog_read(session, SongQueryBuilder.get_songs, pagination_params, filters, sorting,
+                                       serialize=serialize_songs)
+        except EmptyQueryResult:
+            if totals.total is None:
+                raise
+            songs = []
+        facet_counts = await catalog_read(session, SongQueryBuilder.get_facets, filters, facets)
+        total = await catalog_read(session, SongQueryBuilder.get_total, filters, totals)
         logger.info(f"User {user.email} has sent a request.")
-        return SongListResponseSchema(items=songs)
+        return SongListResponseSchema(items=songs, facets=facet_counts, total=total)
     except EmptyQueryResult:
         logger.warning("No songs found.")
         raise HTTPException(status_code=status.HTTP_204_NO_CONTENT)
+    except InvalidFacet as e:
+        logger.warning("Invalid facets requested.")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
 @songs_router.post('/songs', status_code=status.HTTP_201_CREATED)
@@ -49,6 +75,25 @@ async def create_song(session: AsyncSessionDep, data: SongCreateSchema,
     except InvalidSongDuration as e:
         logger.warning("Invalid song duration occurred while creating the song.")
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except (AlbumNotFound, PerformerNotFound) as e:
+        logger.warning("The album or the performer of the song does not exist.")
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+
+
+@songs_router.put('/songs', response_model=SongResponseSchema)
+async def upsert_song(session: AsyncSessionDep, data: SongCreateSchema,
+                      user: User = Depends(current_active_user)) -> SongResponseSchema:
+    """Creates a song, or updates the song with the same title, performer and album, and returns it."""
+    try:
+        song = await SongQueryBuilder.upsert_song(session, data)
+        logger.info(f"User {user.email} has successfully upserted the song.")
+        return song
+    except InvalidSongDuration as e:
+        logger.warning("Invalid song duration occurred while upserting the song.")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except (AlbumNotFound, PerformerNotFound) as e:
+        logger.warning("The album or the performer of the song does not exist.")
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
 
 
 @songs_router.get('/song_by_id/{id}', response_model=SongResponseSchema)
@@ -56,7 +101,8 @@ async def get_song_by_id(session: AsyncSessionDep, song_id: int,
                          user: User = Depends(current_active_user)) -> SongResponseSchema:
     """Returns the song schema using the ID provided by the user."""
     try:
-        song = await SongQueryBuilder.get_song_by_id(session, song_id)
+        song = await catalog_read(session, SongQueryBuilder.get_song_by_id, song_id,
+                                  serialize=SongResponseSchema.model_validate)
         logger.info(f"User {user.email} has sent a request.")
         return song
     except SongNotFound as e:
@@ -76,6 +122,40 @@ async def delete_song_by_id(session: AsyncSessionDep, song_id: int,
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
 
 
+@songs_router.delete('/songs', response_model=BulkDeleteResponseSchema)
+async def delete_songs(session: AsyncSessionDep, filters: SongFilter = Depends(),
+                       user: User = Depends(current_active_user)) -> BulkDeleteResponseSchema:
+    """Deletes all songs matching the filters and returns the number of deleted songs."""
+    try:
+        deleted = await SongQueryBuilder.delete_songs(session, filters)
+        logger.info(f"User {user.email} has successfully deleted {deleted} songs.")
+        return BulkDeleteResponseSchema(deleted=deleted)
+    except BulkFilterRequired as e:
+        logger.warning("Bulk deletion of songs without filters was rejected.")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+# Declared before PATCH /songs/{id}, otherwise 'bulk' would be matched as the id
+@songs_router.patch('/songs/bulk', response_model=SongBulkUpdateResponseSchema)
+async def bulk_update_songs(session: AsyncSessionDep, data: SongBulkUpdateSchema,
+                            user: User = Depends(current_active_user)) -> SongBulkUpdateResponseSchema:
+    """Applies the provided changes (album, genre, performer) to the listed songs and returns the number of
+    updated songs."""
+    try:
+        updated = await SongQueryBuilder.bulk_update_songs(session, data)
+        logger.info(f"User {user.email} has successfully updated {updated} songs.")
+        return SongBulkUpdateResponseSchema(updated=updated)
+    except SongNotFound as e:
+        logger.error("Some of the songs to update were not found.")
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except SongWithNameAlreadyExists as e:
+        logger.warning("Song with given name already exists in the target album.")
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except (AlbumNotFound, PerformerNotFound) as e:
+        logger.warning("The album or the performer of the song does not exist.")
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+
+
 @songs_router.patch('/songs/{id}', response_model=SongResponseSchema)
 async def update_song_by_id(session: AsyncSessionDep, song_id: int, data: SongUpdateSchema,
                             user: User = Depends(current_active_user)) -> SongResponseSchema:
@@ -91,6 +171,12 @@ async def update_song_by_id(session: AsyncSessionDep, song_id: int, data: SongUp
     except InvalidSongDuration as e:
         logger.warning("Invalid song duration occurred while creating the song.")
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except SongWithNameAlreadyExists as e:
+        logger.warning("Song with given name already exists.")
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except AlbumNotFound as e:
+        logger.warning("The album of the song does not exist.")
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
 
 
 @songs_router.put('/songs/{id}', response_model=SongResponseSchema)
@@ -107,3 +193,9 @@ async def replace_song_by_id(session: AsyncSessionDep, song_id: int, data: SongF
     except InvalidSongDuration as e:
         logger.warning("Invalid song duration occurred while creating the song.")
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except SongWithNameAlreadyExists as e:
+        logger.warning("Song with given name already exists.")
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except AlbumNotFound as e:
+        logger.warning("The album of the song does not exist.")
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
@@ -1,10 +1,32 @@
 from sqlmodel import SQLModel, Field
 from typing import Optional
+from enum import Enum
+
+from common.sorting import SortOrderEnum
+from services.songs.schemas.song import SongTypeEnum
 
 
 class SongFilter(SQLModel):
     title: Optional[str] = Field(default=None, max_length=64)
-    genre: Optional[str] = Field(default=None, max_length=32)
+    genre: Optional[SongTypeEnum] = None
     performer_id: Optional[int] = None
     album_id: Optional[int] = None  # Filters songs that belong to an album (i.e. have an album_id)
     album_id_is_null: Optional[bool] = None  # Filters songs without an album_id (i.e. singles) when set to True
+
+
+class SongSortEnum(str, Enum):
+    id = 'id'
+    title = 'title'
+    genre = 'genre'
+    duration = 'duration'
+
+
+class SongFacetEnum(str, Enum):
+    genre = 'genre'
+    album_id = 'album_id'
+    performer_id = 'performer_id'
+
+
+class SongSorting(SQLModel):
+    sort: SongSortEnum = SongSortEnum.id
+    order: SortOrderEnum = SortOrderEnum.asc
@@ -2,6 +2,9 @@ from sqlmodel import SQLModel, Field
 from typing import Optional, List
 from enum import Enum
 
+from common.facets import FacetsSchema
+from common.totals import TotalSchema
+
 
 class SongTypeEnum(str, Enum):  # 20 genres
     pop = "pop"
@@ -38,6 +41,8 @@ class SongResponseSchema(SQLModel):
 
 class SongListResponseSchema(SQLModel):
     items: List[SongResponseSchema]
+    facets: Optional[FacetsSchema] = None
+    total: Optional[TotalSchema] = None
 
 
 class SongCreateSchema(SQLModel):
@@ -63,3 +68,18 @@ class SongFullUpdateSchema(SQLModel):
     genre: SongTypeEnum = Field(max_length=32)
 
     album_id: int
+
+
+class SongBulkUpdateItemSchema(SQLModel):
+    ids: List[int] = Field(min_length=1)
+    album_id: Optional[int] = Field(default=None)
+    genre: Optional[SongTypeEnum] = Field(default=None)
+    performer_id: Optional[int] = Field(default=None)
+
+
+class SongBulkUpdateSchema(SQLModel):
+    items: List[SongBulkUpdateItemSchema] = Field(min_length=1)
+
+
+class SongBulkUpdateResponseSchema(SQLModel):
+    updated: int
@@ -0,0 +1,32 @@
+import asyncio
+import logging
+
+from sqlalchemy import text
+
+from db.database import Database
+from models.stats import STATS_VIEWS
+
+logger = logging.getLogger(__name__)
+
+
+async def refresh_stats_views(database: Database) -> None:
+    """Refreshes the statistics materialized views without blocking the readers of the current data."""
+    async with database.engine.connect() as connection:
+        # REFRESH ... CONCURRENTLY cannot run inside of a transaction block
+        connection = await connection.execution_options(isolation_level="AUTOCOMMIT")
+        for view in STATS_VIEWS:
+            await connection.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {view}"))
+
+
+async def run_stats_refresher(database: Database, interval: int) -> None:
+    """Refreshes the statistics views every interval seconds until cancelled. Does nothing on databases
+    without the views."""
+    if database.engine.dialect.name != 'postgresql':
+        return
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await refresh_stats_views(database)
+            logger.info("Statistics views refreshed.")
+        except Exception:
+            logger.exception("Failed to refresh the statistics views.")
@@ -0,0 +1,35 @@
+from typing import List
+from sqlalchemy import Row, Select, select
+
+from dependecies.session import AsyncSessionDep
+from models import Performer
+from models.stats import genre_stats_select, year_stats_select, stats_genres, stats_years
+
+
+class StatsQueryBuilder:
+    @staticmethod
+    def uses_views(session: AsyncSessionDep) -> bool:
+        """The materialized views only exist on PostgreSQL, other databases aggregate the tables on request."""
+        return session.get_bind().dialect.name == 'postgresql'
+
+    @staticmethod
+    async def get_genre_stats(session: AsyncSessionDep) -> List[Row]:
+        query: Select = select(stats_genres) if StatsQueryBuilder.uses_views(session) else genre_stats_select()
+        result = await session.execute(query.order_by(query.selected_columns.song_count.desc(),
+                                                      query.selected_columns.genre))
+        return list(result.all())
+
+    @staticmethod
+    async def get_year_stats(session: AsyncSessionDep) -> List[Row]:
+        query: Select = select(stats_years) if StatsQueryBuilder.uses_views(session) else year_stats_select()
+        result = await session.execute(query.order_by(query.selected_columns.year))
+        return list(result.all())
+
+    @staticmethod
+    async def get_top_performers(session: AsyncSessionDep, limit: int) -> List[Row]:
+        """Reads the catalog counters stored on the performers, ordered by ix_performers_total_seconds."""
+        query = (select(Performer.id, Performer.pseudonym, Performer.album_count, Performer.song_count,
+                        Performer.total_seconds)
+                 .order_by(Performer.total_seconds.desc(), Performer.id).limit(limit))
+        result = await session.execute(query)
+        return list(result.all())
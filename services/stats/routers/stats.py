@@ -0,0 +1,40 @@
+import logging
+from fastapi import APIRouter, Depends, Query
+
+from dependecies.session import AsyncSessionDep
+from models import User
+from services.stats.query_builder.stats import StatsQueryBuilder
+from services.stats.schemas.stats import (GenreStatsListResponseSchema, YearStatsListResponseSchema,
+                                          PerformerStatsListResponseSchema)
+from services.users.modules.manager import current_active_user
+
+stats_router = APIRouter()
+
+logger = logging.getLogger(__name__)
+
+
+@stats_router.get('/stats/genres', response_model=GenreStatsListResponseSchema)
+async def get_genre_stats(session: AsyncSessionDep,
+                          user: User = Depends(current_active_user)) -> GenreStatsListResponseSchema:
+    """Returns the number of songs and their total length in seconds per genre."""
+    items = await StatsQueryBuilder.get_genre_stats(session)
+    logger.info(f'User {user.email} has sent a request.')
+    return GenreStatsListResponseSchema(items=items)
+
+
+@stats_router.get('/stats/years', response_model=YearStatsListResponseSchema)
+async def get_year_stats(session: AsyncSessionDep,
+                         user: User = Depends(current_active_user)) -> YearStatsListResponseSchema:
+    """Returns the number of albums released per year."""
+    items = await StatsQueryBuilder.get_year_stats(session)
+    logger.info(f'User {user.email} has sent a request.')
+    return YearStatsListResponseSchema(items=items)
+
+
+@stats_router.get('/stats/performers/top', response_model=PerformerStatsListResponseSchema)
+async def get_top_performers(session: AsyncSessionDep, limit: int = Query(default=10, ge=1, le=100),
+                             user: User = Depends(current_active_user)) -> PerformerStatsListResponseSchema:
+    """Returns the performers with the longest total catalog playtime."""
+    items = await StatsQueryBuilder.get_top_performers(session, limit)
+    logger.info(f'User {user.email} has sent a request.')
+    return PerformerStatsListResponseSchema(items=items)
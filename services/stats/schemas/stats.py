@@ -0,0 +1,42 @@
+from sqlmodel import SQLModel
+from typing import Optional, List
+from pydantic import ConfigDict
+
+from services.songs.schemas.song import SongTypeEnum
+
+
+class GenreStatsSchema(SQLModel):
+    genre: Optional[SongTypeEnum] = None
+    song_count: int
+    total_seconds: int
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class GenreStatsListResponseSchema(SQLModel):
+    items: List[GenreStatsSchema]
+
+
+class YearStatsSchema(SQLModel):
+    year: Optional[int] = None
+    album_count: int
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class YearStatsListResponseSchema(SQLModel):
+    items: List[YearStatsSchema]
+
+
+class PerformerStatsSchema(SQLModel):
+    id: int
+    pseudonym: str
+    album_count: int
+    song_count: int
+    total_seconds: int
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class PerformerStatsListResponseSchema(SQLModel):
+    items: List[PerformerStatsSchema]
@@ -0,0 +1,86 @@
+import os
+
+os.environ.setdefault("BE_DEBUG", "false")
+os.environ.setdefault("BE_DATABASE__HOST", "localhost")
+os.environ.setdefault("BE_DATABASE__PORT", "0")
+os.environ.setdefault("BE_DATABASE__DB", ":memory:")
+os.environ.setdefault("BE_DATABASE__USER", "tests")
+os.environ.setdefault("BE_DATABASE__ENGINE", "sqlite+aiosqlite")
+os.environ.setdefault("BE_DATABASE__DEBUG", "false")
+os.environ.setdefault("BE_AUTH__RESET_PASSWORD_TOKEN_SECRET", "tests")
+os.environ.setdefault("BE_AUTH__VERIFICATION_TOKEN_SECRET", "tests")
+os.environ.setdefault("BE_AUTH__JWT_STRATEGY_TOKEN_SECRET", "tests")
+
+from typing import AsyncIterator
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy import event
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.ext.asyncio import AsyncSession, AsyncEngine, create_async_engine, async_sessionmaker
+from sqlmodel import SQLModel
+
+from main import app
+from db.database import Database, DatabaseSession, get_async_session, set_database
+from models import User
+from services.users.modules.manager import current_active_user
+
+TEST_USER = User(id=1, email="tests@example.com", first_name="Test", last_name="User",
+                 hashed_password="", is_active=True, is_superuser=True)
+
+
+@pytest.fixture(scope="session")
+def anyio_backend() -> str:
+    return "asyncio"
+
+
+def configure_sqlite(engine: AsyncEngine) -> None:
+    """Lets SQLAlchemy emit BEGIN itself, so that SAVEPOINTs work on SQLite, and enables foreign keys."""
+    @event.listens_for(engine.sync_engine, "connect")
+    def on_connect(dbapi_connection, connection_record) -> None:
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+    @event.listens_for(engine.sync_engine, "begin")
+    def on_begin(connection) -> None:
+        connection.exec_driver_sql("BEGIN")
+
+
+@pytest.fixture(scope="session")
+async def engine() -> AsyncIterator[AsyncEngine]:
+    """A single in-memory database shared by the whole run; the schema is created only once."""
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool,
+                                 connect_args={"check_same_thread": False})
+    configure_sqlite(engine)
+    async with engine.begin() as connection:
+        await connection.run_sync(SQLModel.metadata.create_all)
+    database = set_database(Database(custom_engine=engine))
+    yield engine
+    set_database(None)
+    await database.dispose()
+
+
+@pytest.fixture
+async def session_maker(engine: AsyncEngine) -> AsyncIterator[async_sessionmaker]:
+    """Binds the sessions of a test to one outer transaction, which is rolled back after the test.
+    Commits made by the application only release a SAVEPOINT inside of it."""
+    async with engine.connect() as connection:
+        transaction = await connection.begin()
+        yield async_sessionmaker(bind=connection, class_=AsyncSession, expire_on_commit=False,
+                                 join_transaction_mode="create_savepoint")
+        await transaction.rollback()
+
+
+@pytest.fixture
+async def client(session_maker: async_sessionmaker) -> AsyncIterator[AsyncClient]:
+    async def override_session() -> AsyncIterator[AsyncSession]:
+        async with DatabaseSession(session_maker=session_maker) as db:
+            yield db.session
+
+    app.dependency_overrides[get_async_session] = override_session
+    app.dependency_overrides[current_active_user] = lambda: TEST_USER
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+    app.dependency_overrides.clear()
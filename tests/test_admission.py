@@ -0,0 +1,101 @@
+"""Admission control: slots, the wait queue, timeouts and the limits checked against the database pool."""
+import asyncio
+
+import pytest
+from pydantic import ValidationError
+
+from common.admission import AdmissionController, AdmissionLimiter, RouteClassEnum, classify
+from common.errors import AdmissionLimitTooHigh
+from common.settings import AdmissionLimitSettings, AdmissionSettings, Settings
+
+pytestmark = pytest.mark.anyio
+
+
+def limiter(limit: int = 1, queue_size: int = 1, queue_timeout: float = 1) -> AdmissionLimiter:
+    return AdmissionLimiter(AdmissionLimitSettings(limit=limit, queue_size=queue_size, queue_timeout=queue_timeout))
+
+
+async def test_requests_over_the_limit_wait_for_a_released_slot():
+    admission = limiter(limit=1, queue_size=1)
+    assert await admission.acquire()
+
+    waiting = asyncio.create_task(admission.acquire())
+    await asyncio.sleep(0)
+    assert admission.queued == 1
+    assert not await admission.acquire()  # The queue is full
+    assert admission.rejected == 1
+
+    admission.release()
+    assert await waiting
+    assert (admission.active, admission.queued, admission.admitted) == (1, 0, 2)
+
+
+async def test_waiting_request_times_out_without_taking_a_slot():
+    admission = limiter(limit=1, queue_timeout=0.01)
+    assert await admission.acquire()
+    assert not await admission.acquire()
+    assert (admission.active, admission.queued, admission.timed_out) == (1, 0, 1)
+
+    admission.release()
+    assert admission.active == 0
+
+
+async def test_slot_handed_over_at_the_timeout_is_released(monkeypatch):
+    admission = limiter(limit=1)
+    assert await admission.acquire()
+
+    async def handed_over_then_timed_out(waiter, timeout):
+        # The holder releases its slot to the waiter in the same iteration as the timeout fires
+        admission.release()
+        assert waiter.done()
+        raise asyncio.TimeoutError
+
+    monkeypatch.setattr(asyncio, 'wait_for', handed_over_then_timed_out)
+    assert not await admission.acquire()
+    assert (admission.active, admission.timed_out) == (0, 1)
+
+
+async def test_slot_handed_over_to_a_cancelled_request_is_not_leaked():
+    admission = limiter(limit=1)
+    assert await admission.acquire()
+    waiting = asyncio.create_task(admission.acquire())
+    await asyncio.sleep(0)
+
+    admission.release()
+    waiting.cancel()
+    try:
+        # Depending on the Python version, wait_for returns the result that arrived before the cancellation
+        admitted = await waiting
+    except asyncio.CancelledError:
+        admitted = False
+    assert (admission.active, admission.queued) == (1 if admitted else 0, 0)
+
+
+async def test_raising_the_limit_admits_the_waiting_requests():
+    admission = limiter(limit=1, queue_size=2)
+    assert await admission.acquire()
+    waiting = [asyncio.create_task(admission.acquire()) for _ in range(2)]
+    await asyncio.sleep(0)
+
+    admission.configure(limit=3)
+    assert await asyncio.gather(*waiting) == [True, True]
+    assert admission.active == 3
+
+
+def test_only_the_admission_and_metrics_routes_are_exempt():
+    assert classify('GET', '/metrics') is None
+    assert classify('PATCH', '/admin/admission/read') is None
+    assert classify('POST', '/admin/reconcile/album_durations') == RouteClassEnum.write
+    assert classify('GET', '/performers') == RouteClassEnum.nested_read
+    assert classify('GET', '/songs') == RouteClassEnum.read
+
+
+def test_limits_have_to_fit_in_the_database_pool():
+    with pytest.raises(ValidationError):
+        Settings(admission=AdmissionSettings(read=AdmissionLimitSettings(limit=64)))
+
+    controller = AdmissionController()
+    controller.configure(AdmissionSettings(), pool_capacity=30)
+    controller.check_limit(RouteClassEnum.read, 12)
+    with pytest.raises(AdmissionLimitTooHigh):
+        controller.check_limit(RouteClassEnum.read, 13)
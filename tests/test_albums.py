@@ -0,0 +1,29 @@
+"""Album writes with songs sharing a title."""
+import pytest
+from httpx import AsyncClient
+
+pytestmark = pytest.mark.anyio
+
+
+def album_payload(*titles: str) -> dict:
+    return {"title": "Album", "year": 2000,
+            "songs": [{"title": title, "duration": "3:00", "genre": "rock"} for title in titles]}
+
+
+@pytest.mark.parametrize('method', ['POST', 'PUT'])
+async def test_album_with_two_songs_of_the_same_title_is_a_conflict(client: AsyncClient, method: str):
+    response = await client.request(method, '/albums', json=album_payload("Twice", "Once", "Twice"))
+    assert response.status_code == 409
+    assert (await client.get('/songs')).status_code == 204  # Nothing was written
+
+
+async def test_upsert_updates_the_songs_of_the_album_by_title(client: AsyncClient):
+    assert (await client.put('/albums', json=album_payload("First", "Second"))).status_code == 200
+    payload = album_payload("Second", "Third")
+    payload['songs'][0]['duration'] = "4:00"
+    response = await client.put('/albums', json=payload)
+    assert response.status_code == 200
+    album = response.json()
+    assert sorted((song['title'], song['duration']) for song in album['songs']) == \
+        [("First", "3:00"), ("Second", "4:00"), ("Third", "3:00")]
+    assert album['total_duration'] == "10:00"
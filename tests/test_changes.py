@@ -0,0 +1,116 @@
+"""The change feed: keyset paging, compaction, retention and the exports of the changes after a revision."""
+import json
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from models import ChangeLog
+from services.changes.query_builder.changes import ChangesQueryBuilder
+
+pytestmark = pytest.mark.anyio
+
+
+def performer_payload(pseudonym: str, albums: List[dict] = ()) -> dict:
+    return {"pseudonym": pseudonym, "biography": "Biography", "performance_type": "group",
+            "photo_url": "https://example.com/photo.png", "albums": list(albums), "singles": []}
+
+
+async def create_performer(client: AsyncClient, pseudonym: str, albums: List[dict] = ()) -> dict:
+    response = await client.post('/performers', json=performer_payload(pseudonym, albums))
+    assert response.status_code == 201
+    return response.json()
+
+
+async def latest_revision(session_maker: async_sessionmaker) -> int:
+    async with session_maker() as session:
+        return await ChangesQueryBuilder.get_latest_revision(session)
+
+
+async def backdate_changes(session_maker: async_sessionmaker, *criteria) -> None:
+    async with session_maker() as session:
+        await session.execute(update(ChangeLog).where(*criteria)
+                              .values(changed_at=datetime.now(timezone.utc) - timedelta(days=2)))
+        await session.commit()
+
+
+async def test_changes_are_paged_by_revision(client: AsyncClient, session_maker: async_sessionmaker):
+    since = await latest_revision(session_maker)
+    performer_ids = [(await create_performer(client, f"Performer {i}"))['id'] for i in range(3)]
+
+    response = await client.get('/changes', params={'since': since, 'limit': 2})
+    assert response.status_code == 200
+    page = response.json()
+    assert [change['entity_id'] for change in page['items']] == performer_ids[:2]
+    assert (page['next_since'], page['has_more']) == (page['items'][-1]['revision'], True)
+
+    page = (await client.get('/changes', params={'since': page['next_since'], 'limit': 2})).json()
+    assert [change['entity_id'] for change in page['items']] == performer_ids[2:]
+    assert page['has_more'] is False
+
+    # Nothing newer, the cursor stays where it is
+    page = (await client.get('/changes', params={'since': page['next_since']})).json()
+    assert (page['items'], page['has_more']) == ([], False)
+    assert page['next_since'] == await latest_revision(session_maker)
+
+
+async def test_compaction_keeps_the_last_change_of_every_row(client: AsyncClient,
+                                                             session_maker: async_sessionmaker):
+    since = await latest_revision(session_maker)
+    performer_id = (await create_performer(client, "Compacted"))['id']
+    other_id = (await create_performer(client, "Untouched"))['id']
+    for pseudonym in ("Renamed", "Renamed again"):
+        response = await client.patch(f'/performers/{performer_id}?performer_id={performer_id}',
+                                      json={"pseudonym": pseudonym})
+        assert response.status_code == 200
+    last = await latest_revision(session_maker)
+    await backdate_changes(session_maker, ChangeLog.revision > since)
+
+    async with session_maker() as session:
+        assert await ChangesQueryBuilder.compact(session, older_than=timedelta(days=1)) == 2
+    items = (await client.get('/changes', params={'since': since})).json()['items']
+    assert [(change['entity_id'], change['revision']) for change in items] == \
+        [(other_id, since + 2), (performer_id, last)]
+
+
+async def test_retention_moves_the_horizon_past_the_removed_changes(client: AsyncClient,
+                                                                    session_maker: async_sessionmaker):
+    since = await latest_revision(session_maker)
+    await create_performer(client, "Expired")
+    expired = await latest_revision(session_maker)
+    kept_id = (await create_performer(client, "Kept"))['id']
+    await backdate_changes(session_maker, ChangeLog.revision > since, ChangeLog.revision <= expired)
+
+    async with session_maker() as session:
+        assert await ChangesQueryBuilder.apply_retention(session, timedelta(days=1)) >= 1
+        assert await ChangesQueryBuilder.get_horizon(session) == expired
+
+    response = await client.get('/changes', params={'since': since})
+    assert response.status_code == 410
+    assert (await client.get('/export/performers', params={'since': since})).status_code == 410
+    items = (await client.get('/changes', params={'since': expired})).json()['items']
+    assert [change['entity_id'] for change in items] == [kept_id]
+
+
+async def test_export_since_a_revision_only_has_the_changed_rows(client: AsyncClient,
+                                                                 session_maker: async_sessionmaker):
+    album = {"title": "Album", "year": 2000, "songs": [{"title": "Song", "duration": "3:00", "genre": "rock"}]}
+    first = await create_performer(client, "First", [album])
+    since = await latest_revision(session_maker)
+    second = await create_performer(client, "Second")
+
+    response = await client.get('/export/performers', params={'since': since})
+    assert response.status_code == 200
+    assert response.headers['X-Change-Revision'] == str(await latest_revision(session_maker))
+    assert [json.loads(line)['id'] for line in response.text.splitlines()] == [second['id']]
+    assert (await client.get('/export/flat', params={'since': since})).text == ''
+
+    # The song of the renamed album is exported again with the new title
+    album_id = first['albums'][0]['id']
+    response = await client.patch(f'/albums/{album_id}?album_id={album_id}', json={"title": "Renamed"})
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in (await client.get('/export/flat', params={'since': since})).text.splitlines()]
+    assert [row['album_title'] for row in rows] == ["Renamed"]
@@ -0,0 +1,111 @@
+"""Batched data migrations: resuming from the checkpoint and building the indexes after an interruption."""
+from types import SimpleNamespace
+from typing import List
+
+import pytest
+from sqlalchemy import Index
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlmodel import select
+
+import db.data_migration
+from db.data_migration import Batch, DataMigration, run_data_migration
+from dependecies.session import AsyncSessionDep
+from models import DataMigrationCheckpoint, Performer
+
+pytestmark = pytest.mark.anyio
+
+
+class Interrupted(Exception):
+    pass
+
+
+class PerformerKeysMigration(DataMigration):
+    """Records the keys of its batches and is interrupted once before the batch after interrupt_after."""
+    name = 'test_performer_keys'
+    key = Performer.__table__.c.id
+    indexes = [Index('ix_test_performers_pseudonym', Performer.__table__.c.pseudonym)]
+
+    def __init__(self, interrupt_after: int = None):
+        self.interrupt_after = interrupt_after
+        self.batches: List[Batch] = []
+
+    async def apply_batch(self, session: AsyncSessionDep, batch: Batch) -> int:
+        if batch.after is not None and batch.after == self.interrupt_after:
+            self.interrupt_after = None
+            raise Interrupted
+        self.batches.append(batch)
+        return len(batch.keys)
+
+
+@pytest.fixture
+def database(session_maker: async_sessionmaker) -> SimpleNamespace:
+    return SimpleNamespace(session_maker=session_maker)
+
+
+@pytest.fixture
+async def performer_ids(session_maker: async_sessionmaker) -> List[int]:
+    async with session_maker() as session:
+        performers = [Performer(pseudonym=f"Performer {i}", biography="Biography", performance_type="group",
+                                photo_url="https://example.com/photo.png") for i in range(5)]
+        session.add_all(performers)
+        await session.commit()
+        return sorted(performer.id for performer in performers)
+
+
+@pytest.fixture
+def built_indexes(monkeypatch) -> List[str]:
+    """Replaces the concurrent build, which needs a connection of its own, and fails the first build."""
+    built, failed = [], []
+
+    async def create_index_concurrently(database, index: Index) -> None:
+        if not failed:
+            failed.append(index.name)
+            raise Interrupted
+        built.append(index.name)
+
+    monkeypatch.setattr(db.data_migration, 'create_index_concurrently', create_index_concurrently)
+    return built
+
+
+async def get_checkpoint(session_maker: async_sessionmaker) -> DataMigrationCheckpoint:
+    async with session_maker() as session:
+        return await session.scalar(select(DataMigrationCheckpoint)
+                                    .where(DataMigrationCheckpoint.name == PerformerKeysMigration.name))
+
+
+async def test_interrupted_migration_resumes_after_the_last_committed_batch(database: SimpleNamespace,
+                                                                           session_maker: async_sessionmaker,
+                                                                           performer_ids: List[int],
+                                                                           built_indexes: List[str]):
+    migration = PerformerKeysMigration(interrupt_after=performer_ids[1])
+    with pytest.raises(Interrupted):
+        await run_data_migration(database, migration, batch_size=2, pause=0)
+    checkpoint = await get_checkpoint(session_maker)
+    assert (checkpoint.last_key, checkpoint.rows, checkpoint.finished_at) == (performer_ids[1], 2, None)
+
+    # The index build fails in the run that applies the remaining batches
+    with pytest.raises(Interrupted):
+        await run_data_migration(database, migration, batch_size=2, pause=0)
+    assert [batch.keys for batch in migration.batches] == [performer_ids[:2], performer_ids[2:4], performer_ids[4:]]
+    assert migration.batches[1].after == performer_ids[1]
+    assert (await get_checkpoint(session_maker)).rows == 5
+
+
+async def test_migration_interrupted_while_building_its_indexes_builds_them_on_the_next_run(
+        database: SimpleNamespace, session_maker: async_sessionmaker, performer_ids: List[int],
+        built_indexes: List[str]):
+    migration = PerformerKeysMigration()
+    with pytest.raises(Interrupted):
+        await run_data_migration(database, migration, batch_size=10, pause=0)
+    checkpoint = await get_checkpoint(session_maker)
+    assert (checkpoint.last_key, checkpoint.finished_at) == (performer_ids[-1], None)
+
+    report = await run_data_migration(database, migration, batch_size=10, pause=0)
+    assert (report.finished, report.batches) == (True, 0)
+    assert built_indexes == ['ix_test_performers_pseudonym']
+    assert len(migration.batches) == 1
+    assert (await get_checkpoint(session_maker)).finished_at is not None
+
+    # A finished migration is not run again
+    report = await run_data_migration(database, migration, batch_size=10, pause=0)
+    assert report.finished and built_indexes == ['ix_test_performers_pseudonym']
@@ -0,0 +1,36 @@
+"""Request deadlines taken from the X-Request-Timeout header."""
+import pytest
+from httpx import AsyncClient
+
+from common.deadlines import DeadlinePolicy
+from common.errors import InvalidRequestTimeout
+from common.settings import DeadlineSettings
+
+pytestmark = pytest.mark.anyio
+
+
+def scope(path: str, timeout: str = None) -> dict:
+    headers = [] if timeout is None else [(b'x-request-timeout', timeout.encode())]
+    return {'type': 'http', 'method': 'GET', 'path': path, 'headers': headers}
+
+
+def test_timeout_comes_from_the_header_capped_at_the_maximum():
+    policy = DeadlinePolicy(DeadlineSettings(read=5, maximum=60))
+    assert policy.get_timeout(scope('/songs')) == 5
+    assert policy.get_timeout(scope('/songs', '0.5')) == 0.5
+    assert policy.get_timeout(scope('/songs', '600')) == 60
+    assert policy.get_timeout(scope('/admin/admission', '-1')) is None
+
+
+@pytest.mark.parametrize('timeout', ['-1', '0', 'nan', 'inf', 'soon'])
+def test_timeout_has_to_be_a_positive_number(timeout: str):
+    with pytest.raises(InvalidRequestTimeout):
+        DeadlinePolicy().get_timeout(scope('/songs', timeout))
+
+
+async def test_invalid_timeout_is_rejected_with_400(client: AsyncClient):
+    response = await client.get('/songs', headers={'X-Request-Timeout': 'nan'})
+    assert response.status_code == 400
+    assert 'X-Request-Timeout' in response.json()['detail']
+    # No song yet
+    assert (await client.get('/songs', headers={'X-Request-Timeout': '5'})).status_code == 204
@@ -0,0 +1,136 @@
+"""Server-sent events: fan-out of the change log, eviction of slow subscribers and replay on reconnection."""
+from types import SimpleNamespace
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from common.settings import EventsSettings
+from services.changes.query_builder.changes import ChangesQueryBuilder
+from services.events.modules.broker import EventBroker, Subscriber, event_broker
+from services.events.query_builder.events import EventsQueryBuilder
+from services.events.routers.events import event_stream
+from services.events.schemas.events import EventEntityEnum
+
+pytestmark = pytest.mark.anyio
+
+
+def performer_payload(pseudonym: str) -> dict:
+    return {"pseudonym": pseudonym, "biography": "Biography", "performance_type": "group",
+            "photo_url": "https://example.com/photo.png", "albums": [], "singles": []}
+
+
+async def create_performer(client: AsyncClient, pseudonym: str) -> int:
+    response = await client.post('/performers', json=performer_payload(pseudonym))
+    assert response.status_code == 201
+    return response.json()['id']
+
+
+async def latest_revision(session_maker: async_sessionmaker) -> int:
+    async with session_maker() as session:
+        return await ChangesQueryBuilder.get_latest_revision(session)
+
+
+def drain(subscriber: Subscriber) -> list:
+    events = []
+    while not subscriber.queue.empty():
+        events.append(subscriber.queue.get_nowait())
+    return events
+
+
+@pytest.fixture
+def database(session_maker: async_sessionmaker) -> SimpleNamespace:
+    # The poller only opens sessions, those of the test are bound to its rolled back transaction
+    return SimpleNamespace(session_maker=session_maker)
+
+
+async def test_poll_publishes_the_matching_events(client: AsyncClient, session_maker: async_sessionmaker,
+                                                  database: SimpleNamespace):
+    broker = EventBroker()
+    since = await latest_revision(session_maker)
+    everything = broker.subscribe(since)
+    songs_only = broker.subscribe(since, entities={EventEntityEnum.songs})
+
+    performer_id = await create_performer(client, "Events")
+    assert await broker.poll(database)
+
+    events = drain(everything)
+    assert [(event.entity, event.entity_id, event.performer_id) for event in events] == \
+        [(EventEntityEnum.performers, performer_id, performer_id)]
+    assert drain(songs_only) == []
+    # The filtered out events still move the subscriber forward
+    assert songs_only.since == everything.since == events[-1].revision
+    assert not await broker.poll(database)
+
+
+async def test_events_committed_before_joining_are_delivered_once(client: AsyncClient,
+                                                                   session_maker: async_sessionmaker,
+                                                                   database: SimpleNamespace):
+    broker = EventBroker()
+    since = await latest_revision(session_maker)
+    early = broker.subscribe(since)
+    await create_performer(client, "Before")
+    assert await broker.poll(database)
+
+    # Joins with the revision it read before the write the poller has already published
+    late = broker.subscribe(since)
+    assert await broker.poll(database)
+    assert [event.entity_id for event in drain(late)] == [event.entity_id for event in drain(early)]
+    assert drain(early) == []
+
+
+async def test_subscriber_joining_during_a_read_is_skipped_until_the_next_poll(client: AsyncClient,
+                                                                              session_maker: async_sessionmaker):
+    broker = EventBroker()
+    since = await latest_revision(session_maker)
+    await create_performer(client, "First")
+    await create_performer(client, "Second")
+    async with session_maker() as session:
+        first, second = await EventsQueryBuilder.get_events(session, since, 10)
+
+    current = broker.subscribe(first.revision)
+    late = broker.subscribe(since)
+    broker.publish([second], after=first.revision)
+    assert drain(current) == [second]
+    assert late.since == since and drain(late) == []
+
+
+async def test_slow_subscriber_is_evicted(client: AsyncClient, session_maker: async_sessionmaker,
+                                          database: SimpleNamespace):
+    broker = EventBroker(EventsSettings(buffer_size=1))
+    since = await latest_revision(session_maker)
+    subscriber = broker.subscribe(since)
+    await create_performer(client, "First")
+    await create_performer(client, "Second")
+
+    assert await broker.poll(database)
+    assert subscriber.evicted.is_set()
+    assert subscriber not in broker.subscribers
+    assert broker.evictions == 1
+
+    # The buffered event is still sent, then the stream ends and the client resumes after it
+    chunks = [chunk async for chunk in event_stream(None, subscriber, [], complete=True)]
+    assert chunks[0] == b'retry: 1000\n\n'
+    assert len(chunks) == 2 and chunks[1].startswith(f'id: {since + 1}\n'.encode())
+
+
+async def test_reconnection_replays_the_missed_events(client: AsyncClient, session_maker: async_sessionmaker):
+    since = await latest_revision(session_maker)
+    await create_performer(client, "First")
+    await create_performer(client, "Second")
+
+    settings = event_broker.settings
+    # A cut replay ends the stream, so that the buffered response of the test client completes
+    event_broker.configure(EventsSettings(replay_limit=1))
+    try:
+        response = await client.get('/events', headers={'Last-Event-ID': str(since)})
+        filtered = await client.get('/events', params={'last_event_id': since, 'entities': 'songs'})
+    finally:
+        event_broker.configure(settings)
+
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/event-stream')
+    assert f'id: {since + 1}\nevent: performers.upsert\n' in response.text
+    assert f'id: {since + 2}\n' not in response.text
+    assert 'id:' not in filtered.text
+    assert not event_broker.subscribers
@@ -0,0 +1,182 @@
+"""Memory-footprint regression tests.
+
+Every case records the peak traced memory and the number of live allocations made by one
+representative API call and compares them with the budgets stored in ``memory_budgets.json``.
+Run with ``MEMORY_BUDGETS_UPDATE=1`` to rewrite the budgets from the current measurements (with
+``BUDGET_HEADROOM`` applied) after an intended change in memory usage. The first call of a code
+path in a process also fills the statement caches of SQLAlchemy, so keep the larger of the
+measurements of a case run alone and within the whole file.
+"""
+import gc
+import json
+import logging
+import os
+import tracemalloc
+from pathlib import Path
+from typing import Awaitable, Callable
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from models import Performer, Album, Song
+from services.albums.query_builder.reconcile import AlbumDurationReconcileQueryBuilder
+
+BUDGETS_PATH = Path(__file__).resolve().parent / "memory_budgets.json"
+BUDGET_HEADROOM = 1.5
+UPDATE_BUDGETS = os.environ.get("MEMORY_BUDGETS_UPDATE") == "1"
+
+pytestmark = pytest.mark.anyio
+
+
+def song_payload(index: int) -> dict:
+    return {"title": f"Song {index}", "duration": f"{3 + index % 3}:{index % 60:02d}", "genre": "rock"}
+
+
+def album_payload(index: int, songs_count: int) -> dict:
+    return {"title": f"Album {index}", "year": 1970 + index % 50,
+            "songs": [song_payload(index * songs_count + i) for i in range(songs_count)]}
+
+
+def performer_payload(pseudonym: str, albums_count: int, songs_count: int, singles_count: int) -> dict:
+    return {"pseudonym": pseudonym, "biography": "Biography " * 20, "performance_type": "group",
+            "photo_url": "https://example.com/photo.png",
+            "albums": [album_payload(i, songs_count) for i in range(albums_count)],
+            "singles": [song_payload(10_000 + i) for i in range(singles_count)]}
+
+
+async def seed_catalog(session_maker: async_sessionmaker, performers_count: int, albums_count: int = 3,
+                       songs_count: int = 10, singles_count: int = 5) -> None:
+    async with session_maker() as session:
+        performers = []
+        for p in range(performers_count):
+            albums = [Album(title=f"Album {p}-{a}", year=1970 + a, total_duration="40:00",
+                            songs=[Song(title=f"Song {p}-{a}-{s}", duration="4:00", genre="rock")
+                                   for s in range(songs_count)])
+                      for a in range(albums_count)]
+            singles = [Song(title=f"Single {p}-{s}", duration="3:30", genre="pop") for s in range(singles_count)]
+            performers.append(Performer(pseudonym=f"Performer {p}", biography="Biography " * 20,
+                                        performance_type="group", photo_url="https://example.com/photo.png",
+                                        albums=albums, singles=singles))
+        session.add_all(performers)
+        await session.flush()
+        for performer in performers:
+            for album in performer.albums:
+                for song in album.songs:
+                    song.performer_id = performer.id
+        await session.commit()
+
+
+async def measure(call: Callable[[], Awaitable]) -> dict:
+    """Runs the call under tracemalloc and returns its peak memory and the allocations it left alive. Logging is
+    disabled during the call, the records kept by the log capture of pytest would count as allocations."""
+    gc.collect()
+    logging.disable(logging.CRITICAL)
+    tracemalloc.start()
+    try:
+        baseline, _ = tracemalloc.get_traced_memory()
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        await call()
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+        logging.disable(logging.NOTSET)
+    allocations = sum(stat.count_diff for stat in after.compare_to(before, "filename") if stat.count_diff > 0)
+    return {"peak_bytes": peak - baseline, "allocations": allocations}
+
+
+def load_budgets() -> dict:
+    if not BUDGETS_PATH.exists():
+        return {}
+    return json.loads(BUDGETS_PATH.read_text())
+
+
+def check_budget(case: str, measured: dict) -> None:
+    budgets = load_budgets()
+    if UPDATE_BUDGETS:
+        budgets[case] = {key: int(value * BUDGET_HEADROOM) for key, value in measured.items()}
+        BUDGETS_PATH.write_text(json.dumps(budgets, indent=4, sort_keys=True) + "\n")
+        return
+
+    budget = budgets.get(case)
+    assert budget is not None, f"No memory budget stored for '{case}', run with MEMORY_BUDGETS_UPDATE=1"
+    for key, limit in budget.items():
+        assert measured[key] <= limit, f"{case}: {key} {measured[key]} exceeds the budget of {limit}"
+
+
+async def expect_status(client: AsyncClient, method: str, url: str, expected_status: int, **kwargs) -> None:
+    response = await client.request(method, url, **kwargs)
+    assert response.status_code == expected_status, response.text
+
+
+@pytest.mark.parametrize("size", [10, 50, 100])
+async def test_get_performers_with_full_nesting(client: AsyncClient, session_maker: async_sessionmaker,
+                                                size: int) -> None:
+    await seed_catalog(session_maker, performers_count=100)
+    measured = await measure(lambda: expect_status(client, "GET", "/performers", 200,
+                                                   params={"page": 1, "size": size}))
+    check_budget(f"get_performers[size={size}]", measured)
+
+
+async def test_get_albums(client: AsyncClient, session_maker: async_sessionmaker) -> None:
+    await seed_catalog(session_maker, performers_count=40)
+    measured = await measure(lambda: expect_status(client, "GET", "/albums", 200, params={"page": 1, "size": 100}))
+    check_budget("get_albums[size=100]", measured)
+
+
+async def test_create_performer_with_large_discography(client: AsyncClient) -> None:
+    payload = performer_payload("Prolific", albums_count=20, songs_count=15, singles_count=30)
+    measured = await measure(lambda: expect_status(client, "POST", "/performers", 201, json=payload))
+    check_budget("create_performer[albums=20,songs=15]", measured)
+
+
+async def test_create_album_with_many_songs(client: AsyncClient) -> None:
+    payload = album_payload(1, songs_count=300)
+    measured = await measure(lambda: expect_status(client, "POST", "/albums", 201, json=payload))
+    check_budget("create_album[songs=300]", measured)
+
+
+async def test_sync_performer_with_large_discography(client: AsyncClient) -> None:
+    payload = performer_payload("Prolific", albums_count=20, songs_count=15, singles_count=30)
+    response = await client.post("/performers", json=payload)
+    performer_id = response.json()["id"]
+    payload["albums"] = payload["albums"][2:] + [album_payload(100, songs_count=15)]
+    payload["singles"][0]["duration"] = "9:59"
+    measured = await measure(lambda: expect_status(client, "POST", f"/sync/performers/{performer_id}", 200,
+                                                   json=payload))
+    check_budget("sync_performer[albums=20,songs=15]", measured)
+
+
+async def test_bulk_delete_songs(client: AsyncClient, session_maker: async_sessionmaker) -> None:
+    await seed_catalog(session_maker, performers_count=40)
+    measured = await measure(lambda: expect_status(client, "DELETE", "/songs", 200, params={"genre": "rock"}))
+    check_budget("delete_songs[songs=1200]", measured)
+
+
+async def test_bulk_move_songs(client: AsyncClient, session_maker: async_sessionmaker) -> None:
+    await seed_catalog(session_maker, performers_count=10, albums_count=3, songs_count=30)
+    payload = {"items": [{"ids": list(range(1, 301)), "album_id": 1},
+                         {"ids": list(range(301, 331)), "album_id": None, "genre": "pop"}]}
+    measured = await measure(lambda: expect_status(client, "PATCH", "/songs/bulk", 200, json=payload))
+    check_budget("bulk_update_songs[songs=330]", measured)
+
+
+async def test_export_flat_songs(client: AsyncClient, session_maker: async_sessionmaker) -> None:
+    await seed_catalog(session_maker, performers_count=40)
+    measured = await measure(lambda: expect_status(client, "GET", "/export/flat", 200, params={"format": "ndjson"}))
+    check_budget("export_flat[songs=1400]", measured)
+
+
+async def test_reconcile_album_durations(session_maker: async_sessionmaker) -> None:
+    # 12 songs of 4:00 per album against a stored total of 40:00, every album has drifted
+    await seed_catalog(session_maker, performers_count=40, songs_count=12)
+
+    async def reconcile() -> None:
+        async with session_maker() as session:
+            report = await AlbumDurationReconcileQueryBuilder.reconcile(session, chunk_size=50)
+        assert report.drifted == 120
+
+    measured = await measure(reconcile)
+    check_budget("reconcile_album_durations[albums=120]", measured)
@@ -0,0 +1,125 @@
+"""The in-memory catalog has to answer every read it serves exactly like the database, also after writes."""
+from types import SimpleNamespace
+from typing import AsyncIterator, Dict, List
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from services.memory_catalog.modules.catalog import MemoryCatalog, load_memory_catalog, memory_catalog
+
+pytestmark = pytest.mark.anyio
+
+
+def song_payload(title: str, duration: str, genre: str = "rock") -> dict:
+    return {"title": title, "duration": duration, "genre": genre}
+
+
+def performer_payload(pseudonym: str, year: int, singles: List[dict]) -> dict:
+    return {"pseudonym": pseudonym, "biography": "Biography", "performance_type": "group",
+            "photo_url": "https://example.com/photo.png",
+            "albums": [{"title": f"{pseudonym} album", "year": year,
+                        "songs": [song_payload(f"{pseudonym} opener", "3:10"),
+                                  song_payload(f"{pseudonym} ballad", "5:45", "pop")]}],
+            "singles": singles}
+
+
+async def create_catalog(client: AsyncClient) -> Dict[str, int]:
+    ids = {}
+    for pseudonym, year, singles in (("Alpha", 1999, [song_payload("Alpha single", "2:30", "pop")]),
+                                     ("Beta", 2005, [])):
+        response = await client.post('/performers', json=performer_payload(pseudonym, year, singles))
+        assert response.status_code == 201
+        performer = response.json()
+        ids[pseudonym] = performer['id']
+        ids[f"{pseudonym} album"] = performer['albums'][0]['id']
+    return ids
+
+
+def read_paths(ids: Dict[str, int]) -> List[str]:
+    alpha, beta, album = ids["Alpha"], ids["Beta"], ids["Alpha album"]
+    return [
+        '/performers?total=exact',
+        '/performers?sort=pseudonym&order=desc',
+        '/performers/summary',
+        f'/performer_by_id/{alpha}?performer_id={alpha}',
+        f'/performer_by_id/{beta}?performer_id={beta}',
+        '/albums?total=exact&facets=year,performer_id',
+        f'/albums?performer_id={beta}',
+        f'/album_by_id/{album}?album_id={album}',
+        '/songs?total=exact&facets=genre,album_id,performer_id',
+        '/songs?sort=duration&order=desc',
+        '/songs?sort=genre',
+        '/songs?genre=pop',
+        '/songs?album_id_is_null=true',
+        f'/songs?album_id={album}&title=ballad',
+    ]
+
+
+async def get_all(client: AsyncClient, paths: List[str]) -> List[tuple]:
+    responses = [await client.get(path) for path in paths]
+    return [(path, response.status_code, response.json() if response.content else None)
+            for path, response in zip(paths, responses)]
+
+
+async def assert_memory_matches_database(client: AsyncClient, paths: List[str]) -> None:
+    assert memory_catalog.serving
+    served = await get_all(client, paths)
+    memory_catalog.serving = False
+    try:
+        expected = await get_all(client, paths)
+    finally:
+        memory_catalog.serving = True
+    assert served == expected
+
+
+@pytest.fixture
+async def loaded_catalog(session_maker: async_sessionmaker) -> AsyncIterator[MemoryCatalog]:
+    await load_memory_catalog(SimpleNamespace(session_maker=session_maker))
+    yield memory_catalog
+    memory_catalog.finish_reload([], [], [])
+    memory_catalog.serving = False
+
+
+@pytest.fixture
+async def catalog_ids(client: AsyncClient) -> Dict[str, int]:
+    return await create_catalog(client)
+
+
+async def test_loaded_catalog_matches_the_database(client: AsyncClient, catalog_ids: Dict[str, int],
+                                                   loaded_catalog: MemoryCatalog):
+    assert len(loaded_catalog.performers) == 2
+    await assert_memory_matches_database(client, read_paths(catalog_ids))
+
+
+async def test_catalog_matches_the_database_after_writes(client: AsyncClient, catalog_ids: Dict[str, int],
+                                                         loaded_catalog: MemoryCatalog):
+    alpha, beta, album = catalog_ids["Alpha"], catalog_ids["Beta"], catalog_ids["Alpha album"]
+    response = await client.post('/songs', json={**song_payload("Guest verse", "4:05", "rap"),
+                                                 "performer_id": beta, "album_id": album})
+    assert response.status_code == 201
+    song = response.json()['id']
+    assert (await client.patch(f'/songs/{song}?song_id={song}', json={"duration": "6:00"})).status_code == 200
+    assert (await client.patch(f'/albums/{album}?album_id={album}', json={"year": 2001})).status_code == 200
+    assert (await client.patch(f'/performers/{beta}?performer_id={beta}',
+                               json={"pseudonym": "Beta Band"})).status_code == 200
+    assert (await client.put('/songs', json={**song_payload("Alpha single", "2:45", "pop"),
+                                             "performer_id": alpha})).status_code == 200
+    await assert_memory_matches_database(client, read_paths(catalog_ids))
+
+
+async def test_catalog_matches_the_database_after_cascading_deletes(client: AsyncClient,
+                                                                    catalog_ids: Dict[str, int],
+                                                                    loaded_catalog: MemoryCatalog):
+    alpha, beta, album = catalog_ids["Alpha"], catalog_ids["Beta"], catalog_ids["Alpha album"]
+    beta_album = catalog_ids["Beta album"]
+    # Songs of each performer on the album of the other one
+    for performer_id, album_id in ((beta, album), (alpha, beta_album)):
+        response = await client.post('/songs', json={**song_payload(f"Guest {performer_id}", "4:05"),
+                                                     "performer_id": performer_id, "album_id": album_id})
+        assert response.status_code == 201
+
+    assert (await client.delete(f'/performers/{alpha}?performer_id={alpha}')).status_code == 204
+    await assert_memory_matches_database(client, read_paths(catalog_ids))
+    assert (await client.delete('/songs?genre=pop')).status_code == 200
+    await assert_memory_matches_database(client, read_paths(catalog_ids))
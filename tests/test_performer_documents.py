@@ -0,0 +1,95 @@
+"""Prebuilt performer documents: cleared by the writes, rebuilt like the live read and never stored stale."""
+from typing import Optional
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+import services.performers.routers.performer
+from models import Performer, PerformerDocument
+from services.performers.query_builder.document import PerformerDocumentQueryBuilder
+
+pytestmark = pytest.mark.anyio
+
+
+def performer_payload(pseudonym: str) -> dict:
+    return {"pseudonym": pseudonym, "biography": "Biography", "performance_type": "group",
+            "photo_url": "https://example.com/photo.png",
+            "albums": [{"title": f"{pseudonym} album", "year": 2000,
+                        "songs": [{"title": f"{pseudonym} song", "duration": "3:00", "genre": "rock"}]}],
+            "singles": []}
+
+
+async def create_performer(client: AsyncClient, pseudonym: str) -> dict:
+    response = await client.post('/performers', json=performer_payload(pseudonym))
+    assert response.status_code == 201
+    return response.json()
+
+
+async def get_document(session_maker: async_sessionmaker, performer_id: int) -> Optional[bytes]:
+    async with session_maker() as session:
+        return await PerformerDocumentQueryBuilder.get_document(session, performer_id)
+
+
+async def build_stale(session_maker: async_sessionmaker) -> int:
+    async with session_maker() as session:
+        return await PerformerDocumentQueryBuilder.build_stale(session, batch_size=10)
+
+
+async def assert_document_matches_the_live_read(client: AsyncClient, session_maker: async_sessionmaker,
+                                                performer_id: int, monkeypatch) -> None:
+    assert await get_document(session_maker, performer_id) is None
+    await build_stale(session_maker)
+    assert await get_document(session_maker, performer_id) is not None
+    path = f'/performer_by_id/{performer_id}?performer_id={performer_id}'
+    served = await client.get(path)
+    with monkeypatch.context() as patch:
+        patch.setattr(services.performers.routers.performer, 'PERFORMER_DOCUMENTS_ENABLED', False)
+        live = await client.get(path)
+    assert served.status_code == live.status_code == 200
+    assert served.json() == live.json()
+
+
+async def test_documents_match_the_live_read_after_every_write(client: AsyncClient,
+                                                               session_maker: async_sessionmaker, monkeypatch):
+    performer = await create_performer(client, "Documented")
+    guest_id = (await create_performer(client, "Guest"))['id']
+    performer_id, album_id = performer['id'], performer['albums'][0]['id']
+    await assert_document_matches_the_live_read(client, session_maker, performer_id, monkeypatch)
+
+    # A song of another performer on the album changes the total duration of the album
+    response = await client.post('/songs', json={"title": "Guest verse", "duration": "4:30", "genre": "rap",
+                                                 "performer_id": guest_id, "album_id": album_id})
+    assert response.status_code == 201
+    await assert_document_matches_the_live_read(client, session_maker, performer_id, monkeypatch)
+
+    response = await client.patch(f'/albums/{album_id}?album_id={album_id}', json={"year": 2001})
+    assert response.status_code == 200
+    await assert_document_matches_the_live_read(client, session_maker, performer_id, monkeypatch)
+
+    response = await client.patch(f'/performers/{performer_id}?performer_id={performer_id}',
+                                  json={"pseudonym": "Renamed"})
+    assert response.status_code == 200
+    await assert_document_matches_the_live_read(client, session_maker, performer_id, monkeypatch)
+
+
+async def test_build_is_discarded_when_the_performer_is_written_before_the_store(
+        client: AsyncClient, session_maker: async_sessionmaker, monkeypatch):
+    performer_id = (await create_performer(client, "Raced"))['id']
+    execute = AsyncSession.execute
+
+    async def write_before_the_store(session, statement, params=None, *args, **kwargs):
+        if params is not None and getattr(statement, 'table', None) is PerformerDocument.__table__:
+            # A write of the performer committed after it was read for the build, before its document is stored
+            await execute(session, update(Performer).where(Performer.id == performer_id).values(pseudonym="New"))
+            await PerformerDocumentQueryBuilder.invalidate(session, [performer_id])
+        return await execute(session, statement, params, *args, **kwargs)
+
+    with monkeypatch.context() as patch:
+        patch.setattr(AsyncSession, 'execute', write_before_the_store)
+        await build_stale(session_maker)
+    # The document of the old pseudonym was not stored
+    assert await get_document(session_maker, performer_id) is None
+    await build_stale(session_maker)
+    assert b'"pseudonym":"New"' in await get_document(session_maker, performer_id)
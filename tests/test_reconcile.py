@@ -0,0 +1,72 @@
+"""Reconciliation of the album total durations, one bounded chunk of album ids per call of the endpoint."""
+from typing import AsyncIterator, List
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlmodel import select
+
+from main import app
+from models import Album
+from services.users.modules.manager import current_superuser
+from tests.conftest import TEST_USER
+
+pytestmark = pytest.mark.anyio
+
+
+def performer_payload(albums_count: int) -> dict:
+    return {"pseudonym": "Reconciled", "biography": "Biography", "performance_type": "group",
+            "photo_url": "https://example.com/photo.png",
+            "albums": [{"title": f"Album {i}", "year": 2000 + i,
+                        "songs": [{"title": f"Song {i}", "duration": "4:00", "genre": "rock"}]}
+                       for i in range(albums_count)],
+            "singles": []}
+
+
+@pytest.fixture
+async def superuser_client(client: AsyncClient) -> AsyncIterator[AsyncClient]:
+    app.dependency_overrides[current_superuser] = lambda: TEST_USER
+    yield client
+
+
+async def drifted_album_ids(client: AsyncClient, session_maker: async_sessionmaker) -> List[int]:
+    response = await client.post('/performers', json=performer_payload(albums_count=5))
+    assert response.status_code == 201
+    album_ids = sorted(album['id'] for album in response.json()['albums'])
+    async with session_maker() as session:
+        await session.execute(update(Album).where(Album.id.in_(album_ids)).values(total_duration="40:00"))
+        await session.commit()
+    return album_ids
+
+
+async def test_each_call_reconciles_one_chunk_and_returns_the_next_cursor(superuser_client: AsyncClient,
+                                                                        session_maker: async_sessionmaker):
+    album_ids = await drifted_album_ids(superuser_client, session_maker)
+    after, reconciled = album_ids[0] - 1, []
+    while after is not None:
+        response = await superuser_client.post('/admin/reconcile/album_durations',
+                                               params={'dry_run': 'false', 'after': after, 'chunk_size': 2})
+        assert response.status_code == 200
+        report = response.json()
+        assert report['drifted'] == len(report['items']) <= 2
+        reconciled += [album['album_id'] for album in report['items']]
+        after = report['next_after']
+    assert reconciled == album_ids
+
+    async with session_maker() as session:
+        durations = (await session.execute(select(Album.total_duration).where(Album.id.in_(album_ids)))).scalars()
+        assert set(durations) == {"4:00"}
+
+
+async def test_dry_run_only_reports_the_drift(superuser_client: AsyncClient, session_maker: async_sessionmaker):
+    album_ids = await drifted_album_ids(superuser_client, session_maker)
+    response = await superuser_client.post('/admin/reconcile/album_durations',
+                                           params={'after': album_ids[0] - 1, 'chunk_size': 10})
+    assert response.status_code == 200
+    report = response.json()
+    assert (report['dry_run'], report['drifted'], report['next_after']) == (True, 5, None)
+    assert {album['total_duration'] for album in report['items']} == {"40:00"}
+
+    async with session_maker() as session:
+        assert await session.scalar(select(Album.total_duration).where(Album.id == album_ids[0])) == "40:00"
@@ -0,0 +1,166 @@
+"""Coalescing of identical concurrent reads."""
+import asyncio
+import time
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import event, literal, select
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
+
+from common.deadlines import request_deadline
+from common.singleflight import SingleFlight, coalesced_read
+from services.albums.errors import AlbumNotFound
+from services.albums.query_builder.album import AlbumQueryBuilder
+from services.albums.schemas.album import AlbumResponseSchema
+from services.songs.errors import SongNotFound
+from services.songs.query_builder.song import SongQueryBuilder
+
+pytestmark = pytest.mark.anyio
+
+
+class Read:
+    """A read that blocks until released and counts its executions."""
+
+    def __init__(self, result=None, error: Exception = None):
+        self.result = result
+        self.error = error
+        self.calls = 0
+        self.cancelled = False
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+async def test_concurrent_calls_with_the_same_key_share_one_execution():
+    flights, read = SingleFlight(), Read(result=[1, 2])
+    waiting = [asyncio.create_task(flights.do('key', read)) for _ in range(3)]
+    await asyncio.sleep(0)
+    assert len(flights) == 1
+
+    read.release.set()
+    assert await asyncio.gather(*waiting) == [[1, 2]] * 3
+    assert read.calls == 1
+    # Nothing is cached, the next call reads again
+    assert len(flights) == 0
+    assert await flights.do('key', read) == [1, 2]
+    assert read.calls == 2
+
+
+async def test_calls_with_different_keys_are_not_coalesced():
+    flights, read = SingleFlight(), Read(result='row')
+    read.release.set()
+    assert await asyncio.gather(flights.do('first', read), flights.do('second', read)) == ['row', 'row']
+    assert read.calls == 2
+
+
+async def test_every_waiter_gets_the_error():
+    flights, read = SingleFlight(), Read(error=LookupError('missing'))
+    waiting = [asyncio.create_task(flights.do('key', read)) for _ in range(2)]
+    await asyncio.sleep(0)
+
+    read.release.set()
+    results = await asyncio.gather(*waiting, return_exceptions=True)
+    assert [type(result) for result in results] == [LookupError, LookupError]
+    assert read.calls == 1
+
+
+async def test_cancelled_waiter_does_not_cancel_the_read_of_the_others():
+    flights, read = SingleFlight(), Read(result='row')
+    first = asyncio.create_task(flights.do('key', read))
+    second = asyncio.create_task(flights.do('key', read))
+    await asyncio.sleep(0)
+
+    first.cancel()
+    await asyncio.sleep(0)
+    assert first.cancelled() and not read.cancelled
+
+    read.release.set()
+    assert await second == 'row'
+
+
+async def test_read_is_cancelled_with_its_last_waiter():
+    flights, read = SingleFlight(), Read(result='row')
+    waiting = asyncio.create_task(flights.do('key', read))
+    await asyncio.sleep(0)
+
+    waiting.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiting
+    await asyncio.sleep(0)
+    assert read.cancelled
+    assert len(flights) == 0
+
+
+async def test_identical_reads_of_requests_share_one_query(session_maker: async_sessionmaker):
+    executions = []
+
+    async def read_value(session, value):
+        executions.append(value)
+        await asyncio.sleep(0.01)
+        return await session.scalar(select(literal(value)))
+
+    async with session_maker() as first, session_maker() as second:
+        results = await asyncio.gather(coalesced_read(first, read_value, 7, serialize=str),
+                                       coalesced_read(second, read_value, 7, serialize=str))
+        assert results == ['7', '7']
+        assert await coalesced_read(first, read_value, 8, serialize=str) == '8'
+    assert executions == [7, 8]
+
+
+async def test_not_found_reaches_every_coalesced_request(session_maker: async_sessionmaker):
+    async with session_maker() as session:
+        results = await asyncio.gather(*(coalesced_read(session, SongQueryBuilder.get_song_by_id, 0, serialize=str)
+                                         for _ in range(2)), return_exceptions=True)
+    assert [type(result) for result in results] == [SongNotFound, SongNotFound]
+
+
+async def test_identical_album_reads_share_one_query(client: AsyncClient, engine: AsyncEngine,
+                                                     session_maker: async_sessionmaker):
+    response = await client.post('/albums', json={"title": "Shared", "year": 2000, "songs": [
+        {"title": "Shared song", "duration": "3:00", "genre": "rock"}]})
+    assert response.status_code == 201
+    album_id = response.json()['id']
+    statements = []
+
+    def count_album_reads(connection, cursor, statement, *args) -> None:
+        if statement.lstrip().startswith('SELECT') and 'FROM albums' in statement:
+            statements.append(statement)
+
+    event.listen(engine.sync_engine, 'before_cursor_execute', count_album_reads)
+    try:
+        async with session_maker() as first, session_maker() as second:
+            results = await asyncio.gather(*(coalesced_read(session, AlbumQueryBuilder.get_album_by_id, album_id,
+                                                            serialize=AlbumResponseSchema.model_validate)
+                                             for session in (first, second)))
+            missing = await asyncio.gather(*(coalesced_read(session, AlbumQueryBuilder.get_album_by_id, 0,
+                                                            serialize=AlbumResponseSchema.model_validate)
+                                             for session in (first, second)), return_exceptions=True)
+    finally:
+        event.remove(engine.sync_engine, 'before_cursor_execute', count_album_reads)
+    assert results[0] is results[1]
+    assert [song.title for song in results[0].songs] == ["Shared song"]
+    assert [type(result) for result in missing] == [AlbumNotFound, AlbumNotFound]
+    assert len(statements) == 2  # One read of the album and one of the missing album
+
+
+async def test_shared_read_runs_without_the_deadline_of_the_first_request(session_maker: async_sessionmaker):
+    async def read_deadline(session, value):
+        return value, request_deadline.get()
+
+    token = request_deadline.set(time.monotonic() + 1)
+    try:
+        async with session_maker() as session:
+            result = await coalesced_read(session, read_deadline, 'value', serialize=lambda row: row)
+        assert request_deadline.get() is not None
+    finally:
+        request_deadline.reset(token)
+    assert result == ('value', None)